@@ -0,0 +1,560 @@
+"""Operation of the energy system over a full year, coupled or day by day."""
+
+import os
+import time
+import resource
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from Assignment_1_Classes.Parameters import Parameters
+from Assignment_1_Classes.Backend_model import Backend_model
+
+# Hourly inputs that change from day to day
+DAILY_SERIES = ["import_price", "export_price", "pv_max", "desired_load"]
+
+# Gurobi environment of the current worker process, created by _init_worker.
+# gurobipy and Optimization_model are imported by the daily models only, so
+# the coupled LP with the HiGHS backend runs without gurobipy.
+_worker_env = None
+
+
+def repeat_days(parameters: Parameters, days: int, **series) -> Parameters:
+    """Extend daily parameters to a horizon of several days.
+
+    Args:
+        parameters (Parameters): Parameters of one day.
+        days (int): Number of days.
+        **series: Hourly values over all days for some of DAILY_SERIES. The
+            others repeat the daily profiles of the parameters.
+
+    Returns:
+        Parameters: Copy with a horizon of days * T hours. The minimum
+            combined load is required over the whole horizon, so it scales
+            with the number of days.
+    """
+    T = parameters.T * days
+    overrides = {"T": T}
+    for name in DAILY_SERIES + ["electricity_price"]:
+        if name == "desired_load" and not parameters.desired_load_exists:
+            continue
+        values = series.get(name)
+        if values is None:
+            values = np.tile(getattr(parameters, name), days)
+        elif len(values) != T:
+            raise ValueError(f"{name} must have {T} values, got {len(values)}.")
+        overrides[name] = np.asarray(values, dtype=float)
+    if parameters.min_combined_load_exists:
+        overrides["min_combined_load"] = parameters.min_combined_load * days
+    return parameters.copy(**overrides)
+
+
+def peak_memory_mb() -> float:
+    # Peak resident memory of this process so far
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _init_worker(threads: int) -> None:
+    import gurobipy as gp
+
+    global _worker_env
+    _worker_env = gp.Env(params={"Threads": threads, "OutputFlag": 0})
+
+
+def _day_model(parameters: Parameters, scaling: float, env):
+    # Daily model with the battery scaling as a variable fixed to scaling, so
+    # its reduced cost is the derivative of the daily cost by the scaling
+    from Assignment_1_Classes.Optimization_model import Optimization_model
+
+    model = Optimization_model(env=env)
+    model.parameters = parameters.copy(
+        battery_size_variable=parameters.storage_exists, battery_cost=0
+    )
+    model.create_model()
+    model.model.Params.OutputFlag = 0
+    if parameters.storage_exists:
+        model.var["battery_scaling"].LB = scaling
+        model.var["battery_scaling"].UB = scaling
+    return model
+
+
+def _release_final_soc(model, released: bool) -> None:
+    # A released final SOC constraint is the empty row 0 = 0
+    T = model.parameters.T
+    model.model.chgCoeff(
+        model.constr["final_soc"], model.var["SOC"][T - 1], 0 if released else 1
+    )
+
+
+def _add_handover(model, chained: bool) -> dict:
+    # The SOC after the charge and discharge of the last hour of a day, which
+    # is the SOC of the first hour of the next day. Chained days limit it by
+    # the capacity as the coupled model does, independent days hand over the
+    # initial SOC that the next day starts at.
+    from gurobipy import GRB
+
+    parameters = model.parameters
+    last = parameters.T - 1
+    scaling = model.var["battery_scaling"]
+    soc = (
+        model.var["SOC"][last]
+        + parameters.charging_efficiency * model.var["charge"][last]
+        - (1 / parameters.discharging_efficiency) * model.var["discharge"][last]
+    )
+    if chained:
+        limits = [
+            model.model.addLConstr(soc, GRB.GREATER_EQUAL, 0, name="handover_min"),
+            model.model.addLConstr(
+                soc - parameters.storage_capacity * scaling,
+                GRB.LESS_EQUAL,
+                0,
+                name="handover_max",
+            ),
+        ]
+    else:
+        limits = [
+            model.model.addLConstr(
+                soc - parameters.initial_soc * scaling, GRB.EQUAL, 0, name="handover"
+            )
+        ]
+    return {"soc": soc, "limits": limits}
+
+
+def _run_days(
+    model,
+    windows: dict,
+    chained: bool,
+    final_soc: float = None,
+    handovers: int = None,
+) -> dict:
+    # Solve the days of the windows one after another on the same model. The
+    # first handovers days (all but the last if None) hand their SOC over to
+    # the day after them, the others end at their final SOC.
+    parameters = model.parameters
+    storage = parameters.storage_exists
+    scaling = model.var["battery_scaling"].LB if storage else 1
+    days = len(next(iter(windows.values())))
+    if handovers is None:
+        handovers = days - 1
+    runs = {
+        "objective_value": np.zeros(days),
+        "gradient": np.zeros(days),
+        "runtime": np.zeros(days),
+    }
+    handover = _add_handover(model, chained) if storage and handovers else None
+    if chained and storage:
+        _release_final_soc(model, True)
+        model.update_parameters(final_soc=0)
+    for day in range(days):
+        overrides = {name: values[day] for name, values in windows.items()}
+        if handover is not None and day == handovers:
+            model.model.remove(handover["limits"])
+        if chained and storage and day == days - 1:
+            _release_final_soc(model, False)
+            overrides["final_soc"] = final_soc
+        model.update_parameters(**overrides)
+        model.optimize()
+        results = model.get_results(duals=False)
+        runs["objective_value"][day] = results["objective_value"]
+        runs["runtime"][day] = model.model.Runtime
+        if storage:
+            runs["gradient"][day] = model.var["battery_scaling"].RC
+        for name in model.result_series:
+            runs.setdefault(name, np.zeros((days, parameters.T)))[day] = results[name]
+        if chained and storage and day < days - 1:
+            # The SOC after the last hour is the initial SOC of the next day
+            carried = handover["soc"].getValue()
+            model.update_parameters(initial_soc=carried / scaling if scaling else 0)
+    return runs
+
+
+def _solve_days(
+    parameters: Parameters, windows: dict, scaling: float, handovers: int
+) -> dict:
+    model = _day_model(parameters, scaling, _worker_env)
+    runs = _run_days(model, windows, chained=False, handovers=handovers)
+    runs["peak_rss_mb"] = peak_memory_mb()
+    return runs
+
+
+def worker_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process pool for solve_independent() that can be reused between calls."""
+    return ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(1,)
+    )
+
+
+def solve_independent(
+    parameters: Parameters,
+    windows: dict,
+    battery_scaling: float,
+    max_workers: int,
+    executor: ProcessPoolExecutor = None,
+    consecutive: bool = False,
+) -> dict:
+    """Solve each row of the windows as an independent LP in parallel.
+
+    The rows are split into contiguous blocks, one per process, and each
+    block is solved on one model that is updated in place from row to row.
+    Rows of consecutive days end, after the charge and discharge of their
+    last hour, at the initial SOC that the next day starts at, except the
+    last day.
+
+    Args:
+        parameters (Parameters): Parameters of one row.
+        windows (dict): Arrays with one row of hourly values per LP for some
+            of DAILY_SERIES.
+        battery_scaling (float): Fixed battery size as a multiple of the size
+            in the parameters.
+        max_workers (int): Number of processes.
+        executor (ProcessPoolExecutor): Pool of worker_pool() to solve in, a
+            new pool if None.
+        consecutive (bool): The rows are consecutive days of one run rather
+            than independent scenarios.
+
+    Returns:
+        dict: Objective value, Gurobi runtime and derivative of the objective
+            value by the battery scaling of each row, the hourly series of
+            get_results() as one row per LP and the peak resident memory of
+            all processes in MB.
+    """
+    if executor is None:
+        with worker_pool(max_workers) as executor:
+            return solve_independent(
+                parameters, windows, battery_scaling, max_workers, executor, consecutive
+            )
+    rows = len(next(iter(windows.values())))
+    blocks = np.array_split(np.arange(rows), max_workers)
+    blocks = [block for block in blocks if len(block)]
+    # The read-only dataset cannot be pickled and the models do not need it
+    parameters = parameters.copy(data=None)
+    futures = [
+        executor.submit(
+            _solve_days,
+            parameters,
+            {name: values[block] for name, values in windows.items()},
+            battery_scaling,
+            # Days that hand over to a next day, also in the next block
+            (len(block) - (block[-1] == rows - 1)) if consecutive else 0,
+        )
+        for block in blocks
+    ]
+    parts = [future.result() for future in futures]
+    runs = {
+        name: np.concatenate([part[name] for part in parts])
+        for name in parts[0]
+        if name != "peak_rss_mb"
+    }
+    runs["peak_rss_mb"] = max(
+        [peak_memory_mb()] + [part["peak_rss_mb"] for part in parts]
+    )
+    return runs
+
+
+class Annual_model:
+    """Simulate a year (or any number of days) of operation.
+
+    The year can be solved as one coupled LP over all hours, or as one LP per
+    day. Days can be chained, so that the SOC at the end of a day is the
+    initial SOC of the next day, or independent, so that every day starts and
+    ends at the SOC of the dataset. Independent days are solved in parallel.
+
+    The hourly inputs of the days repeat the profiles of the dataset unless
+    yearly series are given.
+    """
+
+    def __init__(
+        self,
+        dataset_folder: str,
+        days: int = 365,
+        env=None,
+        max_workers: int = None,
+        **series,
+    ):
+        """
+        Args:
+            dataset_folder (str): Folder of a dataset with the profiles of one
+                day.
+            days (int): Number of days to simulate.
+            env (gp.Env): Gurobi environment of the daily models solved in
+                this process, the default environment if None.
+            max_workers (int): Processes for the independent days, the number
+                of cores if None.
+            **series: Hourly values over all days for some of DAILY_SERIES.
+        """
+        self.parameters = Parameters(dataset_folder)  # Parameters of one day
+        # Hour 0 of each day is limited like the other hours of the year
+        self.parameters.first_hour_storage_limits = True
+        self.days = days
+        self.env = env
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.series = series
+        repeat_days(self.parameters, days, **series)  # Check the series
+
+    def year_parameters(self) -> Parameters:
+        """Parameters of all days as one horizon, see repeat_days()."""
+        return repeat_days(self.parameters, self.days, **self.series)
+
+    def windows(self) -> dict:
+        # Hourly inputs of the year as one row per day
+        year = self.year_parameters()
+        return {
+            name: getattr(year, name).reshape(self.days, self.parameters.T)
+            for name in DAILY_SERIES
+            if name != "desired_load" or self.parameters.desired_load_exists
+        }
+
+    def run_coupled(self, battery_cost: float = None, backend: str = "gurobi") -> dict:
+        """Solve all days as one LP.
+
+        Args:
+            battery_cost (float): Cost of the battery scaling over all days.
+                The battery size is a variable if given, and fixed to the
+                dataset otherwise.
+            backend (str): Solver of Backend_model. The coupled LP of a year
+                exceeds size-limited Gurobi licenses, "highs" has no limit.
+
+        Returns:
+            dict: Results as returned by get_results() over all hours, with
+                the build and solve time, the wall time in seconds and the
+                peak resident memory in MB.
+        """
+        start = time.perf_counter()
+        parameters = self.year_parameters()
+        if battery_cost is not None:
+            if not parameters.storage_exists:
+                raise ValueError("No storage data available to size the battery.")
+            parameters = parameters.copy(
+                battery_size_variable=True, battery_cost=battery_cost
+            )
+        model = Backend_model(backend)
+        model.load_parameters(parameters)
+        model.create_model()
+        model.optimize()
+        results = model.get_results(duals=False)
+        results["build_time"] = model.build_time
+        results["solve_time"] = model.solve_time
+        results["wall_time"] = time.perf_counter() - start
+        results["peak_rss_mb"] = peak_memory_mb()
+        return results
+
+    def run_days(
+        self,
+        chained: bool = False,
+        battery_scaling: float = 1.0,
+        executor: ProcessPoolExecutor = None,
+    ) -> dict:
+        """Solve one LP per day.
+
+        Chained days are solved in order on one model. The final SOC of each
+        day is free except on the last day, and the initial SOC of the next
+        day is the SOC after the charge and discharge of the last hour of the
+        day before. Each day is operated without knowledge of the following
+        days.
+
+        Independent days start and end at the SOC of the dataset, and after
+        their last hour they reach the initial SOC that the next day starts
+        at. They are split into contiguous blocks that are solved in parallel,
+        each block on one model that is updated in place from day to day.
+
+        Both are operations of the coupled model, so their cost is at least
+        that of run_coupled().
+
+        Args:
+            chained (bool): Carry the SOC from one day to the next.
+            battery_scaling (float): Battery size as a multiple of the size in
+                the dataset.
+            executor (ProcessPoolExecutor): Pool of worker_pool() for the
+                independent days, a new pool if None.
+
+        Returns:
+            dict: Total objective value, the hourly series of get_results()
+                over all hours, the objective value, Gurobi runtime and
+                derivative of the cost by the battery scaling of each day, the
+                battery size, the wall time in seconds and the peak resident
+                memory of all processes in MB.
+        """
+        from Assignment_1_Classes.Optimization_model import Optimization_model
+
+        start = time.perf_counter()
+        windows = self.windows()
+        if chained:
+            model = _day_model(self.parameters, battery_scaling, self.env)
+            final_soc = getattr(self.parameters, "final_soc", None)
+            runs = _run_days(model, windows, chained=True, final_soc=final_soc)
+            peak = peak_memory_mb()
+        else:
+            runs = solve_independent(
+                self.parameters,
+                windows,
+                battery_scaling,
+                self.max_workers,
+                executor,
+                consecutive=True,
+            )
+            peak = runs["peak_rss_mb"]
+
+        results = {"objective_value": runs["objective_value"].sum()}
+        for name in Optimization_model.result_series:
+            results[name] = runs[name].ravel()
+        results["battery_size"] = (
+            self.parameters.storage_capacity * battery_scaling
+            if self.parameters.storage_exists
+            else 0
+        )
+        results["daily_objective_value"] = runs["objective_value"]
+        results["daily_gradient"] = runs["gradient"]
+        results["runtime"] = runs["runtime"]
+        results["wall_time"] = time.perf_counter() - start
+        results["peak_rss_mb"] = peak
+        return results
+
+    def optimize_battery_size(
+        self, battery_cost: float, tolerance: float = 1e-3, max_scaling: float = 1e3
+    ) -> dict:
+        """Find the battery scaling that minimizes the cost of independent days.
+
+        The cost of a day is convex in the battery scaling, so the yearly cost
+        battery_cost * scaling + sum of the daily costs is minimized where its
+        derivative changes sign. The derivative of each daily cost is the
+        reduced cost of the fixed scaling, so the minimum is found by
+        bisection with one parallel pass over the days per step.
+
+        Args:
+            battery_cost (float): Cost of the battery scaling over all days.
+            tolerance (float): Width of the final bracket of the scaling.
+            max_scaling (float): Largest scaling that is searched.
+
+        Returns:
+            dict: Results of run_days() at the optimal scaling, with the total
+                cost including the battery, the scaling, the number of passes
+                over the year and the wall time of the search.
+        """
+        if not self.parameters.storage_exists:
+            raise ValueError("No storage data available to size the battery.")
+        start = time.perf_counter()
+        passes = 0
+        best = None  # Evaluated results with the lowest total cost
+        executor = worker_pool(self.max_workers)
+
+        def evaluate(scaling):
+            nonlocal passes, best
+            passes += 1
+            results = self.run_days(battery_scaling=scaling, executor=executor)
+            results["battery_scaling"] = scaling
+            results["total_cost"] = results["objective_value"] + battery_cost * scaling
+            if best is None or results["total_cost"] < best["total_cost"]:
+                best = results
+            return battery_cost + results["daily_gradient"].sum()
+
+        with executor:  # One pool for all passes
+            low, high = 0.0, 1.0
+            # The reduced cost is only one subgradient where the daily LPs are
+            # degenerate, such as at a scaling of 0, so the cheapest evaluated
+            # scaling is returned rather than the end of the bracket
+            if evaluate(low) < 0:
+                # Double the upper end until the derivative is no longer negative
+                while evaluate(high) < 0:
+                    low, high = high, 2 * high
+                    if high > max_scaling:
+                        raise ValueError(
+                            f"The cost still decreases at a scaling of {max_scaling}."
+                        )
+                while high - low > tolerance:
+                    middle = (low + high) / 2
+                    if evaluate(middle) < 0:
+                        low = middle
+                    else:
+                        high = middle
+
+        results = best
+        results["passes"] = passes
+        results["wall_time"] = time.perf_counter() - start
+        return results
+
+
+# Testing
+if __name__ == "__main__":
+    import gurobipy as gp
+    from Assignment_1_Classes.Optimization_model import Optimization_model
+
+    env = gp.Env(params={"OutputFlag": 0})
+
+    # One day in any mode is the daily model of the dataset
+    reference = Optimization_model(env=env)
+    reference.load_data("question_2b")
+    reference.parameters.diff_penalty = 1.75
+    reference.parameters.first_hour_storage_limits = True
+    reference.create_model()
+    reference.optimize()
+    expected = reference.get_results()
+    annual = Annual_model("question_2b", days=1, env=env)
+    annual.parameters.diff_penalty = 1.75
+    for results in [
+        annual.run_days(),
+        annual.run_days(chained=True),
+        annual.run_coupled(backend="highs"),
+    ]:
+        assert np.isclose(results["objective_value"], expected["objective_value"])
+        assert np.allclose(results["soc"][[0, -1]], expected["soc"][[0, -1]])
+
+    # A week of prices that vary from day to day
+    days = 7
+    rng = np.random.default_rng(0)
+    factors = np.repeat(rng.uniform(0.5, 1.5, days), 24)
+    price = np.tile(reference.parameters.electricity_price, days) * factors
+    annual = Annual_model(
+        "question_2b",
+        days=days,
+        env=env,
+        max_workers=2,
+        import_price=price + 0.5,
+        export_price=price - 0.4,
+    )
+    annual.parameters.diff_penalty = 1.75
+    independent = annual.run_days()
+    chained = annual.run_days(chained=True)
+    coupled = {
+        backend: annual.run_coupled(backend=backend) for backend in ["gurobi", "highs"]
+    }
+    assert np.isclose(
+        coupled["gurobi"]["objective_value"], coupled["highs"]["objective_value"]
+    )
+    # Both daily modes operate the coupled model, and the chained days are
+    # less restricted than the independent ones
+    parameters = annual.parameters
+    for results in [independent, chained]:
+        soc = results["soc"]
+        assert np.allclose(
+            soc[1:],
+            soc[:-1]
+            + parameters.charging_efficiency * results["charge"][:-1]
+            - results["discharge"][:-1] / parameters.discharging_efficiency,
+        )
+        assert np.all(results["charge"] <= parameters.charging_capacity + 1e-6)
+        assert np.all(results["discharge"] <= parameters.discharging_capacity + 1e-6)
+    assert chained["objective_value"] >= coupled["highs"]["objective_value"] - 1e-6
+    assert independent["objective_value"] >= chained["objective_value"] - 1e-6
+    for name, results in [
+        ("independent days", independent),
+        ("chained days", chained),
+        ("coupled (HiGHS)", coupled["highs"]),
+    ]:
+        print(
+            f"{name:>17}: cost {results['objective_value']:9.3f}, "
+            f"{results['wall_time']:.3f} s, {results['peak_rss_mb']:.0f} MB"
+        )
+
+    # The battery size found by bisection is the best on a grid
+    battery_cost = 5 * days
+    best = annual.optimize_battery_size(battery_cost, tolerance=1e-4)
+    grid = np.linspace(0, 2 * max(best["battery_scaling"], 0.5), 41)
+    costs = [
+        annual.run_days(battery_scaling=s)["objective_value"] + battery_cost * s
+        for s in grid
+    ]
+    assert best["total_cost"] <= min(costs) + 1e-6
+    coupled_size = annual.run_coupled(battery_cost, backend="highs")
+    print(
+        f"Battery size over {days} days: {best['battery_size']:.3f} kWh "
+        f"(independent days, {best['passes']} passes), "
+        f"{coupled_size['battery_size']:.3f} kWh (coupled)"
+    )
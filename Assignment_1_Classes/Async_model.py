@@ -0,0 +1,240 @@
+"""Asyncio facade that builds and solves models without blocking the event loop."""
+
+import os
+import queue
+import asyncio
+import threading
+import concurrent.futures
+import gurobipy as gp
+from gurobipy import GRB
+from Assignment_1_Classes.Optimization_model import Optimization_model
+
+
+class Async_model:
+    """Build and solve Optimization_model in worker threads from coroutines.
+
+    Each request builds its own model in a thread of a bounded executor, so
+    the event loop keeps running during builds and solves. At most
+    max_concurrent requests run at once, each on its own Gurobi environment
+    with a share of the cores, and further requests wait on the event loop.
+    This keeps the Gurobi licenses and cores in use within a budget.
+
+    A request can be given a time limit, which becomes the Gurobi TimeLimit.
+    When the coroutine of a request is cancelled, a Gurobi callback
+    terminates its solve. The request keeps its slot until the worker has
+    stopped, so cancelled solves never run beyond the limit.
+    """
+
+    def __init__(self, max_concurrent: int = 1, threads: int = None, metrics=None):
+        """
+        Args:
+            max_concurrent (int): Maximum number of requests built and solved
+                at once, at most the number of Gurobi licenses available.
+            threads (int): Gurobi threads per solve, the cores divided among
+                the concurrent requests if None.
+            metrics: Callback for stage events of the models, see
+                Instrumentation.
+        """
+        if max_concurrent < 1:
+            raise ValueError("At least one concurrent request is required.")
+        if threads is None:
+            threads = max(1, (os.cpu_count() or 1) // max_concurrent)
+        self.metrics = metrics
+        self.envs = queue.Queue()
+        for _ in range(max_concurrent):
+            self.envs.put(gp.Env(params={"OutputFlag": 0, "Threads": threads}))
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_concurrent)
+        self.limiter = asyncio.Semaphore(max_concurrent)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await asyncio.to_thread(self.close)
+
+    async def solve(
+        self,
+        parameters,
+        time_limit: float = None,
+        duals: bool = True,
+        series: tuple = None,
+        **options,
+    ) -> dict:
+        """Build and solve a model in a worker thread.
+
+        Args:
+            parameters (Parameters | str): Parameters of the model, which are
+                copied, or a dataset folder that is loaded as by load_data().
+            time_limit (float): Seconds the solve may take, no limit if None.
+            duals (bool): Include the dual values of all constraints.
+            series (tuple): Names of the hourly series to return, all if None.
+            **options: Options of create_model(), such as vectorized, reduce
+                and model_cache.
+
+        Returns:
+            dict: Results as returned by Optimization_model.get_results().
+
+        Raises:
+            TimeoutError: No optimal solution was found within the time limit.
+            ValueError: The model is infeasible or unbounded.
+        """
+        cancelled = threading.Event()
+        async with self.limiter:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                self._solve,
+                parameters,
+                time_limit,
+                duals,
+                series,
+                options,
+                cancelled,
+            )
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Terminate the solve and hold the slot until the worker stops
+                cancelled.set()
+                await asyncio.wait([future])
+                if not future.cancelled():
+                    future.exception()  # Errors after cancellation are dropped
+                raise
+
+    def close(self) -> None:
+        """Wait for the running requests and free the Gurobi environments."""
+        self.executor.shutdown(wait=True)
+        while not self.envs.empty():
+            self.envs.get().dispose()
+
+    def _solve(self, parameters, time_limit, duals, series, options, cancelled):
+        # Runs in a worker thread, on an environment no other thread uses
+        env = self.envs.get()
+        try:
+            model = Optimization_model(env=env, metrics=self.metrics)
+            if isinstance(parameters, str):
+                model.load_data(parameters)
+            else:
+                model.parameters = parameters.copy()
+            model.create_model(**options)
+            try:
+                if time_limit is not None:
+                    model.model.Params.TimeLimit = time_limit
+
+                def terminate(gurobi_model, where):
+                    if cancelled.is_set():
+                        gurobi_model.terminate()
+
+                # A request cancelled during the build is terminated at once
+                model.optimize(terminate)
+                if model.model.status == GRB.INTERRUPTED:
+                    return None  # Cancelled, the result is never awaited
+                if model.model.status == GRB.TIME_LIMIT:
+                    raise TimeoutError(
+                        f"No optimal solution within the time limit of "
+                        f"{time_limit} s."
+                    )
+                return model.get_results(duals=duals, series=series)
+            finally:
+                model.model.dispose()
+        finally:
+            self.envs.put(env)
+
+
+# Testing
+if __name__ == "__main__":
+    import time
+    import numpy as np
+
+    questions = ["1a", "1b", "1c", "2b"]
+    env = gp.Env(params={"OutputFlag": 0})
+    expected = {}
+    for question in questions:
+        model = Optimization_model(env=env)
+        model.load_data(f"question_{question}")
+        expected[question] = model.solve()
+
+    async def concurrent_requests():
+        # Requests beyond the limit wait, while the event loop keeps ticking
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.001)
+                ticks += 1
+
+        async with Async_model(max_concurrent=2) as solver:
+            clock = asyncio.create_task(ticker())
+            results = await asyncio.gather(
+                *(solver.solve(f"question_{question}") for question in questions),
+                solver.solve("question_1c", vectorized=True, reduce=True),
+            )
+            clock.cancel()
+        for question, result in zip(questions + ["1c"], results):
+            assert np.isclose(
+                result["objective_value"], expected[question]["objective_value"]
+            )
+            for name in Optimization_model.result_series:
+                assert np.allclose(result[name], expected[question][name])
+            assert result["duals"].keys() == expected[question]["duals"].keys()
+        print(f"{len(results)} concurrent requests match, {ticks} event loop ticks")
+
+    async def time_limit():
+        async with Async_model() as solver:
+            try:
+                await solver.solve("question_1c", time_limit=0)
+                raise AssertionError("The time limit was not applied")
+            except TimeoutError:
+                pass
+            # Errors of the model reach the caller
+            try:
+                await solver.solve("question_1c", series=("unknown",))
+                raise AssertionError("An unknown series was accepted")
+            except ValueError:
+                pass
+        print("Time limits and errors are raised")
+
+    async def cancellation():
+        # Cancel a request while its model is built, then check that the
+        # callback terminated the solve
+        building, release = threading.Event(), threading.Event()
+        events = []
+
+        def metrics(event):
+            events.append(event)
+            if event["stage"] == "create_model":
+                building.set()
+                release.wait()
+
+        async with Async_model(metrics=metrics) as solver:
+            task = asyncio.create_task(solver.solve("question_1c"))
+            waiting = asyncio.create_task(solver.solve("question_1a"))
+            await asyncio.to_thread(building.wait)
+            task.cancel()
+            waiting.cancel()
+            await asyncio.sleep(0)  # The tasks handle their cancellation
+            start = time.perf_counter()
+            release.set()
+            for cancelled_task in [task, waiting]:
+                try:
+                    await cancelled_task
+                    raise AssertionError("The request was not cancelled")
+                except asyncio.CancelledError:
+                    pass
+            solves = [event for event in events if event["stage"] == "optimize"]
+            assert len(solves) == 1 and solves[0]["Status"] == GRB.INTERRUPTED
+            print(
+                f"Cancelled solve terminated after "
+                f"{1e3 * (time.perf_counter() - start):.1f} ms"
+            )
+            # The slot is free again
+            building.clear()
+            release.set()
+            result = await solver.solve("question_1a")
+            assert np.isclose(
+                result["objective_value"], expected["1a"]["objective_value"]
+            )
+
+    asyncio.run(concurrent_requests())
+    asyncio.run(time_limit())
+    asyncio.run(cancellation())
@@ -0,0 +1,266 @@
+"""Solver independent version of the energy system model.
+
+The model of Optimization_model is built as a linear program in matrix form,
+which is then solved with Gurobi or with the open-source HiGHS solver through
+scipy. The HiGHS backend does not need gurobipy or a Gurobi license.
+"""
+
+import time
+import numpy as np
+import scipy.sparse as sp
+from Assignment_1_Classes.Parameters import Parameters, INFINITY
+from Assignment_1_Classes.Standard_form import Standard_form, build_linear_program
+
+
+def build_standard_form(parameters: Parameters) -> Standard_form:
+    """Build the linear program of Optimization_model from its parameters.
+
+    Args:
+        parameters (Parameters): Parameters of the model.
+
+    Returns:
+        Standard_form: Linear program of build_linear_program(), the
+            formulation the matrix build of Optimization_model uses.
+    """
+    if parameters.operating_limits():
+        # Ramping, minimum power and on/off times need Optimization_model
+        raise ValueError("Operating limits of the PV or load need a MILP solver.")
+    return build_linear_program(parameters)
+
+
+class Gurobi_backend:
+    name = "gurobi"
+
+    def __init__(self, env=None):
+        self.env = env  # Gurobi environment, the default environment if None
+
+    def build(self, form: Standard_form) -> None:
+        import gurobipy as gp  # Only needed when this backend is used
+
+        self.model = gp.Model("Energy System Optimization", env=self.env)
+        self.model.Params.OutputFlag = 0
+        self.x = self.model.addMVar(form.n_vars, lb=form.lb, ub=form.ub, obj=form.obj)
+        self.constr = self.model.addMConstr(form.A, self.x, form.sense, form.rhs)
+        self.model.update()
+
+    def solve(self) -> dict:
+        from gurobipy import GRB
+
+        self.model.optimize()
+        if self.model.status != GRB.OPTIMAL:
+            return {"optimal": False}
+        return {
+            "optimal": True,
+            "objective_value": self.model.ObjVal,
+            "x": self.x.X,
+            "duals": self.constr.Pi,
+        }
+
+
+class Highs_backend:
+    name = "highs"
+
+    def build(self, form: Standard_form) -> None:
+        # linprog takes <= and = rows, >= rows are negated
+        self.form = form
+        self.equal = form.sense == "="
+        self.sign = np.where(form.sense == ">", -1.0, 1.0)
+        A = sp.diags(self.sign) @ form.A
+        self.A_eq, self.b_eq = A[self.equal], form.rhs[self.equal]
+        self.A_ub = A[~self.equal]
+        self.b_ub = (self.sign * form.rhs)[~self.equal]
+        self.bounds = np.column_stack(
+            [
+                np.where(form.lb <= -INFINITY, -np.inf, form.lb),
+                np.where(form.ub >= INFINITY, np.inf, form.ub),
+            ]
+        )
+
+    def solve(self) -> dict:
+        from scipy.optimize import linprog
+
+        result = linprog(
+            self.form.obj,
+            A_ub=self.A_ub if self.A_ub.shape[0] else None,
+            b_ub=self.b_ub if self.A_ub.shape[0] else None,
+            A_eq=self.A_eq if self.A_eq.shape[0] else None,
+            b_eq=self.b_eq if self.A_eq.shape[0] else None,
+            bounds=self.bounds,
+            method="highs",
+        )
+        if result.status != 0:
+            return {"optimal": False}
+        # Marginals are the sensitivities to the (negated) right hand sides
+        duals = np.zeros(self.form.n_constrs)
+        duals[self.equal] = result.eqlin.marginals
+        duals[~self.equal] = result.ineqlin.marginals
+        return {
+            "optimal": True,
+            "objective_value": result.fun,
+            "x": result.x,
+            "duals": self.sign * duals,
+        }
+
+
+BACKENDS = {"gurobi": Gurobi_backend, "highs": Highs_backend}
+
+
+class Backend_model:
+    """Energy system model that can be solved with different LP solvers.
+
+    Gives the same results as Optimization_model, see get_results().
+    """
+
+    def __init__(self, backend: str = "highs"):
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown backend '{backend}', use one of {list(BACKENDS)}"
+            )
+        self.backend = BACKENDS[backend]()
+        self.form = None
+        self.status = "Empty model"
+
+    def load_data(self, dataset_folder: str) -> None:
+        self.load_parameters(Parameters(dataset_folder))
+
+    def load_parameters(self, parameters: Parameters) -> None:
+        self.parameters = parameters
+        self.status = "Data loaded"
+
+    def set_battery_size_as_variable(self) -> None:
+        if not self.parameters.storage_exists:
+            raise ValueError(
+                "No storage data available to set battery size as variable."
+            )
+        self.parameters.battery_size_variable = True
+        self.parameters.battery_cost = INFINITY
+
+    def create_model(self) -> None:
+        start = time.perf_counter()
+        self.form = build_standard_form(self.parameters)
+        self.backend.build(self.form)
+        self.build_time = time.perf_counter() - start
+        self.status = "Model created"
+
+    def optimize(self) -> None:
+        start = time.perf_counter()
+        self.solution = self.backend.solve()
+        self.solve_time = time.perf_counter() - start
+        if self.solution["optimal"]:
+            self.status = "Model optimized"
+        else:
+            self.status = "Model infeasible or unbounded"
+
+    def get_results(self, duals: bool = True) -> dict:
+        """Extract the results in the format of Optimization_model.get_results."""
+        return standard_form_results(self.parameters, self.form, self.solution, duals)
+
+
+def standard_form_results(
+    parameters: Parameters, form: Standard_form, solution: dict, duals: bool = True
+) -> dict:
+    """Results of a solved standard form in the format of
+    Optimization_model.get_results.
+
+    Args:
+        parameters (Parameters): Parameters the form was built from.
+        form (Standard_form): Form of build_standard_form().
+        solution (dict): Solution of a backend, with "x" and "duals" indexed
+            like the form.
+        duals (bool): Include the dual values of all constraints.
+
+    Returns:
+        dict: Objective value, battery size, hourly series and duals.
+    """
+    if not solution["optimal"]:
+        raise ValueError("No optimal solution available.")
+    T = parameters.T
+    x = solution["x"]
+
+    def values(name: str) -> np.ndarray:
+        # Hourly values, zero in hours without the variable
+        hourly = np.zeros(T)
+        if name in form.var:  # Components that exist
+            hourly[form.var_hours[name]] = x[form.var[name]]
+        return hourly
+
+    results = {}
+    results["objective_value"] = solution["objective_value"]
+    results["load"] = values("load")
+    results["pv_prod"] = values("gen")
+    results["pv_curtailment"] = parameters.pv_max - results["pv_prod"]
+    results["import_grid"] = values("import")
+    results["export_grid"] = values("export")
+    results["charge"] = values("charge")
+    results["discharge"] = values("discharge")
+    results["soc"] = values("SOC")
+    results["battery_size"] = (
+        parameters.storage_capacity
+        * (x[form.var["battery_scaling"][0]] if parameters.battery_size_variable else 1)
+        if parameters.storage_exists
+        else 0
+    )
+    # Dual variables named as in Optimization_model
+    if duals:
+        results["duals"] = {}
+        for family, rows in form.constr.items():
+            hours = form.constr_hours[family]
+            if hours is None:  # Single constraints such as "initial_soc"
+                results["duals"][family] = solution["duals"][rows[0]]
+                continue
+            for t, row in zip(hours.tolist(), rows):
+                results["duals"][f"{family}_{t}"] = solution["duals"][row]
+
+    return results
+
+
+# Testing
+if __name__ == "__main__":
+    import itertools
+    from Assignment_1_Classes.Optimization_model import Optimization_model
+
+    # Both backends must give the results of Optimization_model, with the duals
+    # of the capacity constraints of the first hour named by their hour too
+    for question in ["1a", "1b", "1c", "2b"]:
+        for diff_penalty, first_hour in itertools.product(
+            [INFINITY, 1.75], [False, True]
+        ):
+            reference = Optimization_model()
+            reference.load_data(f"question_{question}")
+            if question == "2b":
+                reference.set_battery_size_as_variable()
+            parameters = reference.parameters.copy(
+                diff_penalty=diff_penalty,
+                battery_cost=5,
+                first_hour_storage_limits=first_hour,
+            )
+            reference.parameters = parameters
+            reference.create_model()
+            reference.model.Params.OutputFlag = 0
+            reference.optimize()
+            expected = reference.get_results()
+
+            for backend in BACKENDS:
+                model = Backend_model(backend)
+                model.load_parameters(parameters)
+                model.create_model()
+                model.optimize()
+                results = model.get_results()
+                assert np.isclose(
+                    results["objective_value"], expected["objective_value"]
+                ), (question, backend)
+                assert set(results["duals"]) == set(expected["duals"])
+                assert np.isclose(results["battery_size"], expected["battery_size"])
+                # Energy balance duals agree, except where the LP is dual
+                # degenerate: HiGHS may find other optimal duals than Gurobi
+                # where the right hand side is at an end of its range, as in
+                # questions 1c and 2b with a finite penalty
+                for t in range(parameters.T):
+                    name = f"energy_balance_{t}"
+                    if np.isclose(results["duals"][name], expected["duals"][name]):
+                        continue
+                    constr = reference.constr[name]
+                    assert np.isclose(constr.SARHSLow, constr.RHS) or np.isclose(
+                        constr.SARHSUp, constr.RHS
+                    ), (question, backend, name)
+        print(f"question_{question}: all backends match Optimization_model")
@@ -0,0 +1,305 @@
+"""Batched solves of many small scenarios as one block-diagonal linear program."""
+
+import copy
+import traceback
+import numpy as np
+import scipy.sparse as sp
+from Assignment_1_Classes.Parameters import Parameters, INFINITY
+from Assignment_1_Classes.Backend_model import (
+    BACKENDS,
+    Gurobi_backend,
+    Standard_form,
+    build_standard_form,
+    standard_form_results,
+)
+
+# Parameters that patch_form() replaces, with the form attribute, family and
+# sign of each place they enter the linear program
+PATCHABLE = {
+    "import_price": [("obj", "import", 1)],
+    "export_price": [("obj", "export", -1)],
+    "diff_penalty": [("obj", "pos_diff_load", 1), ("obj", "neg_diff_load", 1)],
+    "battery_cost": [("obj", "battery_scaling", 1)],
+    "pv_max": [("ub", "gen", 1)],
+    "desired_load": [("rhs", "pos_diff_load", -1), ("rhs", "neg_diff_load", 1)],
+}
+
+
+def patch_form(form: Standard_form, parameters: Parameters, names) -> Standard_form:
+    """Copy of a form with the values of some parameters replaced.
+
+    Only costs, bounds and right hand sides change, so the constraint matrix
+    is shared with the given form instead of being built again.
+
+    Args:
+        form (Standard_form): Form of build_standard_form().
+        parameters (Parameters): Parameters with the new values.
+        names: Names of the changed parameters, all in PATCHABLE.
+
+    Returns:
+        Standard_form: Form equal to build_standard_form(parameters).
+    """
+    patched = copy.copy(form)
+    for attribute in ["obj", "ub", "rhs"]:
+        setattr(patched, attribute, getattr(form, attribute).copy())
+    for name in names:
+        value = np.asarray(getattr(parameters, name), dtype=float)
+        for attribute, family, sign in PATCHABLE[name]:
+            families = form.constr if attribute == "rhs" else form.var
+            if family in families:  # Components that exist
+                getattr(patched, attribute)[families[family]] = sign * value
+    return patched
+
+
+def build_batch_form(forms: list) -> Standard_form:
+    """Stack the linear programs of independent scenarios block-diagonally.
+
+    Args:
+        forms (list): Forms of build_standard_form(), one per scenario.
+
+    Returns:
+        Standard_form: Linear program with the variables and constraints of
+            scenario k in columns var_offsets[k]:var_offsets[k + 1] and rows
+            constr_offsets[k]:constr_offsets[k + 1]. The families are indexed
+            by (scenario, index in the scenario) where all scenarios have
+            them with the same size.
+    """
+    form = Standard_form()
+    if all(block.A is forms[0].A for block in forms):  # Patched from one form
+        form.A = sp.kron(sp.identity(len(forms)), forms[0].A, format="csr")
+    else:
+        form.A = sp.block_diag([block.A for block in forms], format="csr")
+    for name in ["lb", "ub", "obj", "sense", "rhs"]:
+        setattr(form, name, np.concatenate([getattr(block, name) for block in forms]))
+    form.n_constrs, form.n_vars = form.A.shape
+    form.var_offsets = np.cumsum([0] + [block.n_vars for block in forms])
+    form.constr_offsets = np.cumsum([0] + [block.n_constrs for block in forms])
+    for families, offsets in [
+        ("var", form.var_offsets),
+        ("constr", form.constr_offsets),
+    ]:
+        for name, index in getattr(forms[0], families).items():
+            if all(
+                len(getattr(block, families).get(name, ())) == len(index)
+                for block in forms
+            ):
+                getattr(form, families)[name] = offsets[:-1, None] + np.stack(
+                    [getattr(block, families)[name] for block in forms]
+                )
+    return form
+
+
+class Batch_model:
+    """Solve scenarios of one dataset in batches of one linear program each.
+
+    For small models the time to create, presolve and solve a model is
+    mostly overhead, which is shared by all scenarios of a batch. The
+    scenarios of a batch are stacked into a block-diagonal linear program
+    (see build_batch_form()), which is solved once and split back into the
+    results of each scenario. If a batch has no optimal solution, its
+    scenarios are solved one at a time to find those without one.
+    """
+
+    def __init__(
+        self,
+        dataset_folder: str,
+        batch_size: int = 50,
+        backend: str = "highs",
+        env=None,
+    ):
+        """
+        Args:
+            dataset_folder (str): Dataset of the scenarios.
+            batch_size (int): Maximum number of scenarios per linear program.
+            backend (str): Solver of the batches, see Backend_model.
+            env (gp.Env): Gurobi environment of the "gurobi" backend, the
+                default environment if None.
+        """
+        if batch_size < 1:
+            raise ValueError("The batch size must be at least 1.")
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown backend '{backend}', use one of {list(BACKENDS)}"
+            )
+        self.backend = (
+            Gurobi_backend(env) if backend == "gurobi" else BACKENDS[backend]()
+        )
+        self.batch_size = batch_size
+        self.parameters = Parameters(dataset_folder)
+        self.parameters.diff_penalty = INFINITY  # As Optimization_model.load_data
+        self.form = None  # Form of the dataset, patched for most scenarios
+        self.solves = 0  # Linear programs solved
+
+    def scenario_parameters(self, overrides: dict) -> Parameters:
+        """Parameters of a scenario, see Scenario_runner.run()."""
+        overrides = dict(overrides)
+        parameters = self.parameters.copy()
+        if overrides.pop("battery_size_variable", False):
+            if not parameters.storage_exists:
+                raise ValueError(
+                    "No storage data available to set battery size as variable."
+                )
+            parameters.battery_size_variable = True
+            parameters.battery_cost = INFINITY
+        for name, value in overrides.items():
+            setattr(parameters, name, value)
+        return parameters
+
+    def run(self, scenarios: list, duals: bool = True):
+        """Solve scenarios in batches and stream their results.
+
+        Args:
+            scenarios (list): Dictionaries of Parameters attribute overrides.
+                The key "battery_size_variable" sets the battery size as a
+                variable before the other overrides are applied.
+            duals (bool): Include the dual values of all constraints.
+
+        Yields:
+            dict: Record with the scenario index, overrides, results and error
+                as in Scenario_runner.run(), in the order of the scenarios.
+        """
+        for start in range(0, len(scenarios), self.batch_size):
+            batch = scenarios[start : start + self.batch_size]
+            records, parameters, forms = [], [], []
+            for index, overrides in enumerate(batch, start):
+                record = {
+                    "scenario": index,
+                    "overrides": overrides,
+                    "results": None,
+                    "error": None,
+                }
+                try:
+                    scenario = self.scenario_parameters(overrides)
+                    form = self._form(scenario, overrides)
+                except Exception:
+                    record["error"] = traceback.format_exc()
+                else:
+                    parameters.append(scenario)
+                    forms.append(form)
+                records.append(record)
+
+            solved = [record for record in records if record["error"] is None]
+            solutions = self._solve(forms) if forms else []
+            for record, scenario, form, solution in zip(
+                solved, parameters, forms, solutions
+            ):
+                if solution["optimal"]:
+                    record["results"] = standard_form_results(
+                        scenario, form, solution, duals
+                    )
+                else:
+                    record["error"] = "Scenario infeasible or unbounded"
+            yield from records
+
+    def run_all(self, scenarios: list, duals: bool = True) -> list:
+        return list(self.run(scenarios, duals))
+
+    def _form(self, parameters: Parameters, overrides: dict) -> Standard_form:
+        # Scenarios that only change values are patched from the dataset form
+        if not set(overrides) <= set(PATCHABLE):
+            return build_standard_form(parameters)
+        if self.form is None:
+            self.form = build_standard_form(self.parameters)
+        return patch_form(self.form, parameters, overrides)
+
+    def _solve(self, forms: list) -> list:
+        # Solutions of the scenarios, from one solve of the whole batch if it
+        # is optimal, otherwise from one solve per scenario
+        form = build_batch_form(forms)
+        self.backend.build(form)
+        solution = self.backend.solve()
+        self.solves += 1
+        if not solution["optimal"]:
+            if len(forms) == 1:
+                return [solution]
+            return [self._solve([block])[0] for block in forms]
+
+        solutions = []
+        for k, block in enumerate(forms):
+            columns = slice(form.var_offsets[k], form.var_offsets[k + 1])
+            rows = slice(form.constr_offsets[k], form.constr_offsets[k + 1])
+            x = solution["x"][columns]
+            solutions.append(
+                {
+                    "optimal": True,
+                    # Variables with an infinite cost are 0 at the optimum
+                    "objective_value": block.obj[block.obj < INFINITY]
+                    @ x[block.obj < INFINITY],
+                    "x": x,
+                    "duals": solution["duals"][rows],
+                }
+            )
+        return solutions
+
+
+# Testing
+if __name__ == "__main__":
+    import gurobipy as gp
+    from Assignment_1_Classes.Optimization_model import Optimization_model
+
+    env = gp.Env(params={"OutputFlag": 0})
+    rng = np.random.default_rng(0)
+    reference = Optimization_model(env=env)
+    reference.load_data("question_1c")
+    base = reference.parameters
+    scenarios = [
+        {
+            "import_price": rng.uniform(0.5, 2) * base.import_price,
+            "export_price": rng.uniform(0.5, 2) * base.export_price,
+            "diff_penalty": rng.choice([INFINITY, rng.uniform(0.5, 3)]),
+        }
+        for _ in range(20)
+    ]
+    # A scenario that fails to build, followed by scenarios whose battery size
+    # is only right with their own parameters
+    scenarios.append({"load_min": 1.0})
+    scenarios.append({"battery_size_variable": True, "battery_cost": 5})
+    scenarios.append({"battery_size_variable": True, "battery_cost": 7})
+    scenarios.append({"min_combined_load_exists": True, "min_combined_load": 1e3})
+
+    # A patched form equals a form built from the scenario parameters
+    model = Batch_model("question_1c")
+    for overrides in scenarios[:3]:
+        parameters = model.scenario_parameters(overrides)
+        patched = model._form(parameters, overrides)
+        built = build_standard_form(parameters)
+        assert (patched.A != built.A).nnz == 0
+        for name in ["lb", "ub", "obj", "rhs"]:
+            assert np.array_equal(getattr(patched, name), getattr(built, name))
+
+    # Batches of 8 scenarios fit a size-limited Gurobi license
+    for backend, batch_size in [("highs", 50), ("highs", 7), ("gurobi", 8)]:
+        model = Batch_model("question_1c", batch_size, backend, env)
+        records = model.run_all(scenarios)
+        assert [record["scenario"] for record in records] == list(range(len(scenarios)))
+        # Only the scenario with operating limits fails to build
+        failed = [record["scenario"] for record in records[:-1] if record["error"]]
+        assert failed == [20] and records[20]["results"] is None
+        for record in records[:-1]:
+            if record["error"]:
+                continue
+            single = Optimization_model(env=env)
+            single.parameters = model.scenario_parameters(record["overrides"])
+            expected = single.solve()
+            results = record["results"]
+            assert np.isclose(results["objective_value"], expected["objective_value"])
+            assert np.isclose(results["battery_size"], expected["battery_size"])
+            assert results["duals"].keys() == expected["duals"].keys()
+            # The energy balance duals split out of the batch agree with a
+            # solve of the scenario alone, except where its LP is dual
+            # degenerate: where the right hand side is at an end of its range,
+            # as with a finite penalty, the batch may find other optimal duals
+            for t in range(single.parameters.T):
+                name = f"energy_balance_{t}"
+                if np.isclose(results["duals"][name], expected["duals"][name]):
+                    continue
+                constr = single.constr[name]
+                assert np.isclose(constr.SARHSLow, constr.RHS) or np.isclose(
+                    constr.SARHSUp, constr.RHS
+                ), (backend, record["scenario"], name)
+        # The infeasible scenario fails alone
+        assert records[-1]["results"] is None and records[-1]["error"]
+        print(
+            f"{backend} in batches of {batch_size}: {len(scenarios)} scenarios "
+            f"from {model.solves} solves match Optimization_model"
+        )
@@ -0,0 +1,344 @@
+"""Optimization model for a community of consumers with many appliances."""
+
+import numpy as np
+import scipy.sparse as sp
+import gurobipy as gp
+from gurobipy import GRB
+from Assignment_1_Classes.Parameters import Parameters
+from Assignment_1_Classes.Instrumentation import instrumented
+
+
+class Community_model:
+    """Energy system model of all consumers and appliances in a dataset.
+
+    Each consumer has its own energy balance and trades with the grid through
+    the bus it is connected to, whose import and export limits are shared by
+    all consumers on that bus. Variables are indexed by (asset, t) and the
+    model is built with the Gurobi matrix API only.
+    """
+
+    def __init__(self, env: gp.Env = None, metrics=None):
+        self.env = env  # Gurobi environment, the default environment if None
+        self.metrics = metrics  # Callback for stage events, see Instrumentation
+        self.model = None
+        self.status = "Empty model"
+
+    @instrumented("load_data")
+    def load_data(self, dataset_folder: str) -> None:
+        self.parameters = Parameters(dataset_folder)
+        self.status = "Data loaded"
+
+    @instrumented("load_parameters")
+    def load_parameters(self, parameters: Parameters) -> None:
+        self.parameters = parameters
+        self.status = "Data loaded"
+
+    def set_battery_size_as_variable(self) -> None:
+        if len(self.parameters.storages["id"]) == 0:
+            raise ValueError(
+                "No storage data available to set battery size as variable."
+            )
+        self.parameters.battery_size_variable = True
+        self.parameters.battery_cost = GRB.INFINITY
+
+    @instrumented("create_model")
+    def create_model(self) -> None:
+        self.model = gp.Model("Community Energy System Optimization", env=self.env)
+        self.status = "Model created"
+        self._add_variables()
+        self._add_objective()
+        self._add_constraints()
+
+    @instrumented("optimize")
+    def optimize(self) -> None:
+        self.model.optimize()
+        if self.model.status == GRB.OPTIMAL:
+            self.status = "Model optimized"
+        else:
+            self.status = "Model infeasible or unbounded"
+
+    @instrumented("get_results")
+    def get_results(self, duals: bool = True) -> dict:
+        """Extract the results of the optimized model.
+
+        Args:
+            duals (bool): Extract the dual values of all constraint families.
+
+        Returns:
+            dict: Objective value, per-asset series with shape (assets, T),
+                per-consumer grid exchange with shape (consumers, T), battery
+                sizes and the duals of each constraint family.
+        """
+        if self.model.status != GRB.OPTIMAL:
+            raise ValueError("No optimal solution available.")
+
+        results = {}  # Dictionary to store results
+        results["objective_value"] = self.model.objVal
+        results["load"] = self.var["load"].X
+        results["pv_prod"] = self.var["gen"].X
+        results["pv_curtailment"] = self.parameters.ders["pv_max"] - results["pv_prod"]
+        results["import_grid"] = self.var["import"].X
+        results["export_grid"] = self.var["export"].X
+        results["charge"] = self.var["charge"].X
+        results["discharge"] = self.var["discharge"].X
+        results["soc"] = self.var["SOC"].X
+        results["battery_size"] = self.parameters.storages["storage_capacity"] * (
+            self.var["battery_scaling"].X
+            if self.parameters.battery_size_variable
+            else 1
+        )
+        # Extract dual variables (shadow prices) per constraint family
+        if duals:
+            results["duals"] = {
+                name: constr.Pi.reshape(self.constr_shape[name])
+                for name, constr in self.constr.items()
+            }
+
+        return results
+
+    @instrumented("add_variables")
+    def _add_variables(self) -> None:
+        T = self.parameters.T
+        ders = self.parameters.ders
+        loads = self.parameters.loads
+        n_storage = len(self.parameters.storages["id"])
+        self.var = {}
+        self.index = {}  # Column index in the model of each variable
+
+        def add_mvar(name, shape, ub=GRB.INFINITY):
+            self.var[name] = self.model.addMVar(shape, lb=0, ub=ub, name=name)
+            start = sum(index.size for index in self.index.values())
+            self.index[name] = start + np.arange(np.prod(shape)).reshape(shape)
+
+        # Adding storage capacities as variables if specified
+        if self.parameters.battery_size_variable:
+            add_mvar("battery_scaling", n_storage)
+
+        # Basic variables
+        add_mvar(
+            "load",
+            (len(loads["id"]), T),
+            np.repeat(loads["load_max"][:, None], T, axis=1),
+        )
+        add_mvar("gen", (len(ders["id"]), T), ders["pv_max"])
+        add_mvar("import", (self.parameters.N, T))
+        add_mvar("export", (self.parameters.N, T))
+
+        # Desired load variables for the loads that have a desired profile
+        n_desired = np.count_nonzero(loads["desired_load_exists"])
+        add_mvar("pos_diff_load", (n_desired, T))
+        add_mvar("neg_diff_load", (n_desired, T))
+
+        # Storage variables
+        add_mvar("discharge", (n_storage, T))
+        add_mvar("charge", (n_storage, T))
+        add_mvar("SOC", (n_storage, T))
+
+        # Update model to integrate new variables
+        self.model.update()
+        self.status += "\nVariables added"
+
+    @instrumented("add_objective")
+    def _add_objective(self) -> None:
+        # Objective coefficients are set directly on the variables
+        bus = self.parameters.consumers["bus"]
+        self.var["import"].Obj = self.parameters.buses["import_price"][bus]
+        self.var["export"].Obj = -self.parameters.buses["export_price"][bus]
+        self.var["pos_diff_load"].Obj = self.parameters.diff_penalty
+        self.var["neg_diff_load"].Obj = self.parameters.diff_penalty
+        if self.parameters.battery_size_variable:
+            self.var["battery_scaling"].Obj = self.parameters.battery_cost
+        self.model.ModelSense = GRB.MINIMIZE
+
+        # Update model to integrate new objective
+        self.model.update()
+        self.status += "\nObjective added"
+
+    @instrumented("add_constraints")
+    def _add_constraints(self) -> None:
+        T = self.parameters.T
+        N = self.parameters.N
+        loads = self.parameters.loads
+        storages = self.parameters.storages
+        buses = self.parameters.buses
+        x = self.index
+        self.constr = {}
+        self.constr_shape = {}
+        hours = np.arange(T)
+
+        # Energy balance per consumer, summing the appliances each one owns
+        rows = np.arange(N * T).reshape(N, T)
+        self._add_rows(
+            "energy_balance",
+            (N, T),
+            [
+                (rows, x["export"], 1),
+                (rows, x["import"], -1),
+                (loads["owner"][:, None] * T + hours, x["load"], 1),
+                (self.parameters.ders["owner"][:, None] * T + hours, x["gen"], -1),
+                (storages["owner"][:, None] * T + hours, x["charge"], 1),
+                (storages["owner"][:, None] * T + hours, x["discharge"], -1),
+            ],
+            GRB.EQUAL,
+            0,
+        )
+
+        # Import and export limits shared by the consumers on each bus
+        on_bus = self.parameters.consumers["bus"][:, None] * T + hours
+        shape = (len(buses["id"]), T)
+        for name, variable, limit in [
+            ("bus_import_limit", "import", "import_max"),
+            ("bus_export_limit", "export", "export_max"),
+        ]:
+            self._add_rows(
+                name,
+                shape,
+                [(on_bus, x[variable], 1)],
+                GRB.LESS_EQUAL,
+                np.broadcast_to(buses[limit][:, None], shape),
+            )
+
+        # Minimum combined load constraints for the loads that have one
+        minimum = np.flatnonzero(loads["min_combined_load_exists"])
+        self._add_rows(
+            "minimum_combined_load",
+            len(minimum),
+            [(np.arange(len(minimum))[:, None], x["load"][minimum], 1)],
+            GRB.GREATER_EQUAL,
+            loads["min_combined_load"][minimum],
+        )
+
+        # Desired load profile constraints for the loads that have one
+        desired = np.flatnonzero(loads["desired_load_exists"])
+        rows = np.arange(len(desired) * T).reshape(len(desired), T)
+        self._add_rows(
+            "pos_diff_load",
+            rows.shape,
+            [(rows, x["pos_diff_load"], 1), (rows, x["load"][desired], -1)],
+            GRB.GREATER_EQUAL,
+            -loads["desired_load"][desired],
+        )
+        self._add_rows(
+            "neg_diff_load",
+            rows.shape,
+            [(rows, x["neg_diff_load"], 1), (rows, x["load"][desired], 1)],
+            GRB.GREATER_EQUAL,
+            loads["desired_load"][desired],
+        )
+
+        # Storage constraints, capacities scale with the battery size if it is
+        # a variable
+        n_storage = len(storages["id"])
+        variable_size = self.parameters.battery_size_variable
+        rows = np.arange(n_storage)
+        for name, t, soc in [
+            ("initial_soc", 0, "initial_soc"),
+            ("final_soc", T - 1, "final_soc"),
+        ]:
+            terms = [(rows, x["SOC"][:, t], 1)]
+            if variable_size:
+                terms.append((rows, x["battery_scaling"], -storages[soc]))
+            self._add_rows(
+                name,
+                n_storage,
+                terms,
+                GRB.EQUAL,
+                0 if variable_size else storages[soc],
+            )
+
+        rows = np.arange(n_storage * (T - 1)).reshape(n_storage, T - 1)
+        self._add_rows(
+            "soc_balance",
+            rows.shape,
+            [
+                (rows, x["SOC"][:, 1:], 1),
+                (rows, x["SOC"][:, :-1], -1),
+                (rows, x["charge"][:, :-1], -storages["charging_efficiency"][:, None]),
+                (
+                    rows,
+                    x["discharge"][:, :-1],
+                    (1 / storages["discharging_efficiency"])[:, None],
+                ),
+            ],
+            GRB.EQUAL,
+            0,
+        )
+        for name, variable, capacity in [
+            ("charge_capacity", "charge", "charging_capacity"),
+            ("discharge_capacity", "discharge", "discharging_capacity"),
+            ("soc_capacity", "SOC", "storage_capacity"),
+        ]:
+            terms = [(rows, x[variable][:, 1:], 1)]
+            if variable_size:
+                terms.append(
+                    (rows, x["battery_scaling"][:, None], -storages[capacity][:, None])
+                )
+            self._add_rows(
+                name,
+                rows.shape,
+                terms,
+                GRB.LESS_EQUAL,
+                0 if variable_size else storages[capacity][:, None],
+            )
+
+        # Update model to integrate new constraints
+        self.model.update()
+        self.status += "\nConstraints added"
+
+    def _add_rows(self, name: str, shape, terms: list, sense: str, rhs) -> None:
+        """Add a family of constraints as one sparse matrix constraint.
+
+        Args:
+            name (str): Name of the constraint family.
+            shape: Shape of the family, its rows are numbered in C order.
+            terms (list): (row, column, coefficient) triples of arrays that are
+                broadcast together. Each entry adds the coefficient of the
+                variable with the given column index to the given row.
+            sense (str): Constraint sense.
+            rhs: Right hand side, broadcast to the shape of the family.
+        """
+        shape = np.atleast_1d(shape)
+        n_rows = int(np.prod(shape))
+        if n_rows == 0:
+            return
+        rows, columns, coefficients = [], [], []
+        for row, column, coefficient in terms:
+            row, column, coefficient = np.broadcast_arrays(row, column, coefficient)
+            rows.append(row.ravel())
+            columns.append(column.ravel())
+            coefficients.append(coefficient.ravel())
+        matrix = sp.csr_matrix(
+            (
+                np.concatenate(coefficients),
+                (np.concatenate(rows), np.concatenate(columns)),
+            ),
+            shape=(n_rows, self.model.NumVars),
+        )
+        self.constr[name] = self.model.addMConstr(
+            matrix,
+            None,
+            sense,
+            np.broadcast_to(rhs, tuple(shape)).ravel(),
+            name=name,
+        )
+        self.constr_shape[name] = tuple(shape)
+
+
+# Testing
+if __name__ == "__main__":
+    from Assignment_1_Classes.Optimization_model import Optimization_model
+
+    # A single consumer community must match the single consumer model
+    for question in ["1a", "1b", "1c", "2b"]:
+        objective_values = []
+        for model in [Optimization_model(), Community_model()]:
+            model.load_data(f"question_{question}")
+            if question == "2b":
+                model.set_battery_size_as_variable()
+                model.parameters.battery_cost = 5
+            model.create_model()
+            model.model.Params.OutputFlag = 0
+            model.optimize()
+            objective_values.append(model.get_results()["objective_value"])
+        assert np.isclose(*objective_values), (question, objective_values)
+        print(f"question_{question}: community model matches single consumer model")
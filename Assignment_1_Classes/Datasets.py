@@ -0,0 +1,282 @@
+"""Cached loading and validation of the question datasets."""
+
+import os
+import json
+from types import MappingProxyType
+import numpy as np
+
+
+class Nullable:
+    def __init__(self, schema):
+        self.schema = schema
+
+
+# Schema of the dataset files. A dict lists the required keys of a record, a
+# list means a list of records of the given schema and Nullable allows null.
+NUMBER = "number"
+NUMBERS = "numbers"  # List of numbers, stored as a read-only array
+STRING = "string"
+
+DATASET_SCHEMA = {
+    "appliance_params.json": {
+        "DER": [{"DER_id": STRING, "max_power_kW": NUMBER}],
+        "load": [{"load_id": STRING, "max_load_kWh_per_hour": NUMBER}],
+    },
+    "bus_params.json": [
+        {
+            "import_tariff_DKK/kWh": NUMBER,
+            "export_tariff_DKK/kWh": NUMBER,
+            "max_import_kW": NUMBER,
+            "max_export_kW": NUMBER,
+            "energy_price_DKK_per_kWh": NUMBERS,
+        }
+    ],
+    "DER_production.json": [{"hourly_profile_ratio": NUMBERS}],
+    "usage_preferences.json": [
+        {
+            "load_preferences": [
+                {
+                    "min_total_energy_per_day_hour_equivalent": Nullable(NUMBER),
+                    "hourly_profile_ratio": Nullable(NUMBERS),
+                }
+            ],
+        }
+    ],
+}
+
+# Optional storage appliances and their preferences
+STORAGE_SCHEMA = [
+    {
+        "storage_id": STRING,
+        "storage_capacity_kWh": NUMBER,
+        "max_charging_power_ratio": NUMBER,
+        "max_discharging_power_ratio": NUMBER,
+        "charging_efficiency": NUMBER,
+        "discharging_efficiency": NUMBER,
+    }
+]
+STORAGE_PREFERENCES_SCHEMA = [{"initial_soc_ratio": NUMBER, "final_soc_ratio": NUMBER}]
+
+# Hourly profiles that can be stored as binary columns. The column of a file
+# is "<file stem>.<field>.npy", a 2-D array with one row per record (per load
+# preference for usage_preferences.json). In the JSON file a profile is then
+# replaced by a reference {"$column": "<column file>", "row": <row>}.
+PROFILE_COLUMNS = {
+    "bus_params.json": "energy_price_DKK_per_kWh",
+    "DER_production.json": "hourly_profile_ratio",
+    "usage_preferences.json": "hourly_profile_ratio",
+}
+COLUMN_REFERENCE = "$column"
+
+# Parsed datasets keyed by folder path and file modification times
+_cache = {}
+
+
+def load_dataset(dataset_folder: str) -> MappingProxyType:
+    """Load, validate and cache all datasets of a question folder.
+
+    A folder is only parsed again if one of its files was added, removed or
+    modified since the last call. The returned data is immutable: records are
+    read-only mappings, lists are tuples and numeric lists are read-only arrays.
+    Profiles stored as binary columns (see PROFILE_COLUMNS) are returned as
+    read-only rows of memory-mapped arrays, without copying.
+
+    Args:
+        dataset_folder (str): question folder name.
+
+    Returns:
+        MappingProxyType: Datasets keyed by file name.
+    """
+    base_path = os.path.abspath(os.path.join("data", dataset_folder))
+    with os.scandir(base_path) as entries:
+        files = sorted(
+            (entry.name, entry.stat().st_mtime_ns)
+            for entry in entries
+            if entry.name.endswith((".json", ".npy"))
+        )
+    key = (base_path, tuple(files))
+    if key not in _cache:
+        data = {}
+        columns = {}
+        has_columns = any(file_name.endswith(".npy") for file_name, _ in files)
+        for file_name, _ in files:
+            if file_name.endswith(".json"):
+                with open(os.path.join(base_path, file_name), "r") as f:
+                    data[file_name] = json.load(f)
+                if has_columns:
+                    data[file_name] = _resolve_columns(
+                        data[file_name], base_path, columns
+                    )
+        validate_dataset(data, dataset_folder)
+        # Drop outdated versions of the same folder
+        for cached_key in [k for k in _cache if k[0] == base_path]:
+            del _cache[cached_key]
+        _cache[key] = _freeze(data)
+    return _cache[key]
+
+
+def clear_dataset_cache() -> None:
+    _cache.clear()
+
+
+def column_file_name(file_name: str) -> str:
+    stem = os.path.splitext(file_name)[0]
+    return f"{stem}.{PROFILE_COLUMNS[file_name]}.npy"
+
+
+def convert_to_columns(dataset_folder: str, output_folder: str) -> None:
+    """Convert the hourly profiles of a JSON dataset to binary columns.
+
+    The profiles listed in PROFILE_COLUMNS are written as .npy columns and
+    replaced by references in the JSON files, all other data is copied.
+    load_dataset reads the output folder like any other dataset folder.
+
+    Args:
+        dataset_folder (str): question folder name of the JSON dataset.
+        output_folder (str): Folder of the converted dataset, created if needed.
+    """
+    base_path = os.path.join("data", dataset_folder)
+    output_path = os.path.join("data", output_folder)
+    os.makedirs(output_path, exist_ok=True)
+    for file_name in sorted(os.listdir(base_path)):
+        if not file_name.endswith(".json"):
+            continue
+        with open(os.path.join(base_path, file_name), "r") as f:
+            data = json.load(f)
+        if file_name in PROFILE_COLUMNS:
+            field = PROFILE_COLUMNS[file_name]
+            column_file = column_file_name(file_name)
+            entries = [
+                entry
+                for record in data
+                for entry in (
+                    record["load_preferences"]
+                    if file_name == "usage_preferences.json"
+                    else [record]
+                )
+            ]
+            hours = max(len(entry.get(field) or []) for entry in entries)
+            column = np.full((len(entries), hours), np.nan)
+            for row, entry in enumerate(entries):
+                if entry.get(field) is not None:
+                    column[row] = entry[field]
+                    entry[field] = {COLUMN_REFERENCE: column_file, "row": row}
+            np.save(os.path.join(output_path, column_file), column)
+        with open(os.path.join(output_path, file_name), "w") as f:
+            json.dump(data, f, indent=2)
+
+
+def _resolve_columns(value, base_path: str, columns: dict):
+    # Replace column references by read-only rows of the memory-mapped columns
+    if isinstance(value, dict):
+        if COLUMN_REFERENCE in value:
+            file_name = value[COLUMN_REFERENCE]
+            if file_name not in columns:
+                columns[file_name] = np.load(
+                    os.path.join(base_path, file_name), mmap_mode="r"
+                )
+            return columns[file_name][value["row"]]
+        return {
+            key: _resolve_columns(item, base_path, columns)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_resolve_columns(item, base_path, columns) for item in value]
+    return value
+
+
+def validate_dataset(data: dict, dataset_folder: str) -> None:
+    """Check the datasets of a folder against DATASET_SCHEMA.
+
+    Raises:
+        ValueError: If a file is missing or a record does not match the schema.
+    """
+    for file_name, schema in DATASET_SCHEMA.items():
+        if file_name not in data:
+            raise ValueError(f"{dataset_folder}: missing {file_name}")
+        _validate(data[file_name], schema, f"{dataset_folder}/{file_name}")
+
+    # Storage is optional, its preferences are checked where they are given
+    # (Parameters requires them for every storage)
+    storage = data["appliance_params.json"].get("storage")
+    if storage is not None:
+        path = f"{dataset_folder}/appliance_params.json"
+        _validate(storage, STORAGE_SCHEMA, f"{path}:storage")
+        for i, usage in enumerate(data["usage_preferences.json"]):
+            _validate(
+                usage.get("storage_preferences"),
+                Nullable(STORAGE_PREFERENCES_SCHEMA),
+                f"{dataset_folder}/usage_preferences.json[{i}]:storage_preferences",
+            )
+
+
+def _validate(value, schema, path: str) -> None:
+    if isinstance(schema, Nullable):
+        if value is not None:
+            _validate(value, schema.schema, path)
+    elif schema == NUMBER:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{path}: expected a number, got {value!r}")
+    elif schema == NUMBERS:
+        if isinstance(value, np.ndarray):  # Row of a binary column
+            if value.ndim != 1 or not np.issubdtype(value.dtype, np.number):
+                raise ValueError(f"{path}: expected a one-dimensional column row")
+        elif not isinstance(value, list) or not _is_numeric_list(value):
+            raise ValueError(f"{path}: expected a list of numbers")
+    elif schema == STRING:
+        if not isinstance(value, str):
+            raise ValueError(f"{path}: expected a string, got {value!r}")
+    elif isinstance(schema, list):
+        if not isinstance(value, list) or not value:
+            raise ValueError(f"{path}: expected a non-empty list")
+        for i, item in enumerate(value):
+            _validate(item, schema[0], f"{path}[{i}]")
+    elif isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise ValueError(f"{path}: expected an object")
+        for key, item_schema in schema.items():
+            if key not in value:
+                raise ValueError(f"{path}: missing key '{key}'")
+            _validate(value[key], item_schema, f"{path}:{key}")
+
+
+def _is_numeric_list(value: list) -> bool:
+    return all(
+        isinstance(item, (int, float)) and not isinstance(item, bool) for item in value
+    )
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        if value and _is_numeric_list(value):
+            array = np.array(value, dtype=float)
+            array.flags.writeable = False
+            return array
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# Testing
+if __name__ == "__main__":
+    import tempfile
+
+    # Converted question folders must give the same datasets
+    for question in ["1a", "1b", "1c", "2b"]:
+        with tempfile.TemporaryDirectory() as folder:
+            convert_to_columns(f"question_{question}", folder)
+            original = load_dataset(f"question_{question}")
+            converted = load_dataset(folder)
+            for file_name, field in PROFILE_COLUMNS.items():
+                records = [original[file_name], converted[file_name]]
+                if file_name == "usage_preferences.json":
+                    records = [
+                        [p for r in file for p in r["load_preferences"]]
+                        for file in records
+                    ]
+                for a, b in zip(*records):
+                    assert (a[field] is None and b[field] is None) or np.array_equal(
+                        a[field], b[field]
+                    )
+        print(f"question_{question}: binary columns match the JSON profiles")
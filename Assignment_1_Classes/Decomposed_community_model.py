@@ -0,0 +1,280 @@
+"""Community model solved by ADMM decomposition into per-consumer problems."""
+
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import gurobipy as gp
+from gurobipy import GRB
+from Assignment_1_Classes.Parameters import Parameters
+from Assignment_1_Classes.Community_model import Community_model
+
+# Gurobi environment, parameters of each consumer and built subproblems of
+# the current worker process
+_worker_env = None
+_consumers = {}
+_subproblems = {}
+
+
+def _init_worker(threads: int) -> None:
+    global _worker_env
+    _worker_env = gp.Env(params={"Threads": threads, "OutputFlag": 0})
+
+
+def _solve_subproblem(
+    run_id: str,
+    dataset_folder: str,
+    overrides: dict,
+    consumer: int,
+    target: np.ndarray,
+    rho: float,
+) -> tuple:
+    # Subproblems are built once per run and worker, later iterations only
+    # replace the quadratic ADMM term of the objective. The dataset is loaded
+    # and split into its consumers once per run and worker.
+    key = (run_id, consumer)
+    if key not in _subproblems:
+        if run_id not in _consumers:
+            _consumers.clear()
+            for old_key in [k for k in _subproblems if k[0] != run_id]:
+                del _subproblems[old_key]
+            _consumers[run_id] = (
+                Parameters(dataset_folder).copy(**overrides).consumer_subsets()
+            )
+        parameters = _consumers[run_id][consumer]
+        # The shared bus limits are enforced by the coordinator
+        parameters.buses = dict(
+            parameters.buses,
+            import_max=np.full(len(parameters.buses["id"]), GRB.INFINITY),
+            export_max=np.full(len(parameters.buses["id"]), GRB.INFINITY),
+        )
+        model = Community_model(env=_worker_env)
+        model.load_parameters(parameters)
+        model.create_model()
+        # The cost from the objective coefficients of the variables. Gurobi
+        # reads infinite coefficients, such as an infinite diff_penalty, back
+        # as inf, which an expression does not accept.
+        variables = model.model.getVars()
+        costs = np.clip(
+            model.model.getAttr("Obj", variables), -GRB.INFINITY, GRB.INFINITY
+        )
+        _subproblems[key] = (model, gp.LinExpr(costs.tolist(), variables))
+
+    model, cost = _subproblems[key]
+    import_deviation = model.var["import"][0] - target[0]
+    export_deviation = model.var["export"][0] - target[1]
+    model.model.setObjective(
+        cost
+        + rho
+        / 2
+        * (import_deviation @ import_deviation + export_deviation @ export_deviation)
+    )
+    model.optimize()
+    if model.model.status != GRB.OPTIMAL:
+        raise ValueError(f"Subproblem of consumer {consumer} has no optimal solution.")
+    exchange = np.array([model.var["import"].X[0], model.var["export"].X[0]])
+    return exchange, cost.getValue()
+
+
+class Decomposed_community_model:
+    """Community model solved as one subproblem per consumer.
+
+    The bus import and export limits are the only constraints coupling the
+    consumers. They are relaxed with the sharing form of ADMM: each consumer
+    solves its own model with a quadratic penalty on its import and export, the
+    subproblems run in parallel worker processes, and the coordinator updates
+    the scaled price signal of each bus until the residuals converge.
+    """
+
+    def __init__(
+        self,
+        rho: float = 1.0,
+        tolerance: float = 1e-4,
+        max_iterations: int = 1000,
+        max_workers: int = None,
+        threads_per_worker: int = 1,
+    ):
+        self.rho = rho  # ADMM penalty parameter
+        self.tolerance = tolerance  # Residual norms at convergence (kW)
+        self.max_iterations = max_iterations
+        self.threads_per_worker = threads_per_worker
+        # Do not start more Gurobi threads in total than there are cores
+        self.max_workers = max_workers or max(
+            1, (os.cpu_count() or 1) // threads_per_worker
+        )
+        self.status = "Empty model"
+
+    def load_data(self, dataset_folder: str, **overrides) -> None:
+        """Load the dataset and the parameter overrides used by all consumers.
+
+        Args:
+            dataset_folder (str): question folder name.
+            **overrides: Parameters attributes to replace, for example
+                diff_penalty or battery_size_variable and battery_cost.
+        """
+        self.dataset_folder = dataset_folder
+        self.overrides = overrides
+        self.parameters = Parameters(dataset_folder).copy(**overrides)
+        self.status = "Data loaded"
+
+    def optimize(self) -> None:
+        parameters = self.parameters
+        buses = parameters.buses
+        bus = parameters.consumers["bus"]
+        consumers_on_bus = np.maximum(np.bincount(bus, minlength=len(buses["id"])), 1)
+        scale = np.sqrt(consumers_on_bus)[:, None, None]
+        # Largest average import and export per consumer on each bus
+        limit = np.stack([buses["import_max"], buses["export_max"]], axis=1)
+        limit = (limit / consumers_on_bus[:, None])[:, :, None]
+
+        # Import and export of each consumer (axis 1), their averages per bus,
+        # the feasible averages per bus and the scaled price signals per bus
+        x = np.zeros((parameters.N, 2, parameters.T))
+        x_bar = np.zeros((len(buses["id"]), 2, parameters.T))
+        z_bar = np.zeros_like(x_bar)
+        u = np.zeros_like(x_bar)
+
+        rho = self.rho
+        run_id = uuid.uuid4().hex
+        self.history = []
+        self.status = "Model not converged"
+        with ProcessPoolExecutor(
+            max_workers=min(self.max_workers, parameters.N),
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker,),
+        ) as executor:
+            for iteration in range(1, self.max_iterations + 1):
+                targets = x - x_bar[bus] + z_bar[bus] - u[bus]
+                solutions = list(
+                    executor.map(
+                        _solve_subproblem,
+                        [run_id] * parameters.N,
+                        [self.dataset_folder] * parameters.N,
+                        [self.overrides] * parameters.N,
+                        range(parameters.N),
+                        targets,
+                        [rho] * parameters.N,
+                        chunksize=max(1, parameters.N // (4 * self.max_workers)),
+                    )
+                )
+                x = np.array([exchange for exchange, _ in solutions])
+                costs = np.array([cost for _, cost in solutions])
+
+                # Coordinator update of the bus averages and price signals
+                x_bar = np.zeros_like(x_bar)
+                np.add.at(x_bar, bus, x)
+                x_bar /= consumers_on_bus[:, None, None]
+                z_old = z_bar
+                z_bar = np.minimum(x_bar + u, limit)
+                u = u + x_bar - z_bar
+
+                primal_residual = np.linalg.norm(scale * (x_bar - z_bar))
+                dual_residual = rho * np.linalg.norm(scale * (z_bar - z_old))
+                self.history.append(
+                    {
+                        "iteration": iteration,
+                        "objective_value": costs.sum(),
+                        "primal_residual": primal_residual,
+                        "dual_residual": dual_residual,
+                        "rho": rho,
+                        "max_bus_price": np.max(rho * u),
+                    }
+                )
+                if primal_residual < self.tolerance and dual_residual < self.tolerance:
+                    self.status = "Model optimized"
+                    break
+
+                # Residual balancing, the scaled prices are rescaled so that
+                # the price signals themselves do not change
+                if primal_residual > 10 * dual_residual:
+                    rho, u = 2 * rho, u / 2
+                elif dual_residual > 10 * primal_residual:
+                    rho, u = rho / 2, 2 * u
+
+        self.exchange = x
+        self.costs = costs
+        self.bus_price = rho * u
+
+    def get_results(self) -> dict:
+        """Results of the decomposed solve.
+
+        Returns:
+            dict: Objective value, import and export per consumer with shape
+                (consumers, T), cost per consumer, import and export coupling
+                prices per bus with shape (buses, T),
+                convergence flag and the history of the convergence metrics.
+        """
+        return {
+            "objective_value": self.costs.sum(),
+            "import_grid": self.exchange[:, 0],
+            "export_grid": self.exchange[:, 1],
+            "consumer_cost": self.costs,
+            "bus_import_price": self.bus_price[:, 0],
+            "bus_export_price": self.bus_price[:, 1],
+            "converged": self.status == "Model optimized",
+            "iterations": len(self.history),
+            "history": self.history,
+        }
+
+
+# Testing
+if __name__ == "__main__":
+    import tempfile
+    from Assignment_1_Classes.Synthetic_data import write_synthetic_dataset
+
+    # The subproblems of a worker split the dataset in one pass, which gives
+    # the subset of each consumer
+    with tempfile.TemporaryDirectory() as folder:
+        mix = {"pv": 0.7, "storage": 0.5, "loads_per_consumer": 2}
+        write_synthetic_dataset(folder, consumers=200, buses=3, mix=mix)
+        parameters = Parameters(folder)
+        for consumer, subset in enumerate(parameters.consumer_subsets()):
+            expected = parameters.consumer_subset(consumer)
+            assert subset.N == expected.N == 1
+            for name in ["consumers", "ders", "loads", "storages"]:
+                table, expected_table = getattr(subset, name), getattr(expected, name)
+                assert table.keys() == expected_table.keys()
+                for key, values in table.items():
+                    assert np.array_equal(values, expected_table[key]), (name, key)
+    print("Consumer subsets of one pass match consumer_subset()")
+
+    # The decomposed solve must match the monolithic community model
+    for question, overrides in [
+        ("1a", {}),
+        ("1b", {"diff_penalty": 1.75}),
+        ("1c", {"diff_penalty": 1.75}),
+        ("2b", {"battery_size_variable": True, "battery_cost": 5}),
+    ]:
+        monolithic = Community_model()
+        monolithic.load_parameters(Parameters(f"question_{question}").copy(**overrides))
+        monolithic.create_model()
+        monolithic.model.Params.OutputFlag = 0
+        monolithic.optimize()
+        expected = monolithic.get_results()["objective_value"]
+
+        decomposed = Decomposed_community_model(max_workers=1)
+        decomposed.load_data(f"question_{question}", **overrides)
+        try:
+            decomposed.optimize()
+        except gp.GurobiError as error:
+            # Size-limited licenses solve models with quadratic terms of at
+            # most 200 variables. The subproblems with storage (1c, 2b) have
+            # more, so they only run with a full license.
+            if error.errno != GRB.Error.SIZE_LIMIT_EXCEEDED:
+                raise
+            print(
+                f"question_{question}: skipped, the subproblems exceed the "
+                f"size-limited Gurobi license for quadratic models"
+            )
+            continue
+        results = decomposed.get_results()
+        assert results["converged"]
+        assert np.isclose(results["objective_value"], expected, rtol=1e-4), (
+            question,
+            results["objective_value"],
+            expected,
+        )
+        print(
+            f"question_{question}: decomposed solve matches monolithic solve "
+            f"after {results['iterations']} iterations"
+        )
@@ -0,0 +1,153 @@
+"""Timers and solver statistics for the stages of the models."""
+
+import json
+import time
+import functools
+
+# Gurobi attributes reported after each optimize
+SOLVER_STATISTICS = [
+    "Status",
+    "Runtime",
+    "IterCount",
+    "BarIterCount",
+    "NumVars",
+    "NumConstrs",
+    "NumNZs",
+]
+
+
+def instrumented(stage: str):
+    """Decorator that reports a model method as a stage to self.metrics.
+
+    If self.metrics is None the method is called directly. Otherwise
+    self.metrics is called with an event dict after the method returns or
+    raises: "model", "stage", "start" (Unix time), "seconds", "error" (None or
+    the exception) and, for "optimize", the SOLVER_STATISTICS of the model.
+
+    Args:
+        stage (str): Name of the stage.
+    """
+
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.metrics is None:
+                return method(self, *args, **kwargs)
+            start = time.time()
+            timer = time.perf_counter()
+            event = {"model": type(self).__name__, "stage": stage, "start": start}
+            try:
+                result = method(self, *args, **kwargs)
+                event["error"] = None
+                return result
+            except Exception as error:
+                event["error"] = repr(error)
+                raise
+            finally:
+                event["seconds"] = time.perf_counter() - timer
+                if stage == "optimize" and event["error"] is None:
+                    event.update(solver_statistics(self.model))
+                self.metrics(event)
+
+        return wrapper
+
+    return decorate
+
+
+def solver_statistics(model) -> dict:
+    values = {}
+    for attribute in SOLVER_STATISTICS:
+        try:
+            values[attribute] = model.getAttr(attribute)
+        except Exception:  # Not available, e.g. BarIterCount of a simplex solve
+            values[attribute] = None
+    return values
+
+
+class Jsonl_exporter:
+    """Metrics callback that appends each event as one JSON line to a file."""
+
+    def __init__(self, path: str):
+        self.file = open(path, "a", buffering=1)
+
+    def __call__(self, event: dict) -> None:
+        self.file.write(json.dumps(event) + "\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "Jsonl_exporter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Metrics_summary:
+    """Metrics callback that counts calls and sums times per stage.
+
+    Events can be forwarded to another callback, such as a Jsonl_exporter.
+    """
+
+    def __init__(self, forward=None):
+        self.forward = forward
+        self.stages = {}  # Calls, errors and total seconds of each stage
+        self.solver = {"Runtime": 0.0, "IterCount": 0.0, "BarIterCount": 0}
+
+    def __call__(self, event: dict) -> None:
+        stage = self.stages.setdefault(
+            event["stage"], {"calls": 0, "errors": 0, "seconds": 0.0}
+        )
+        stage["calls"] += 1
+        stage["errors"] += event["error"] is not None
+        stage["seconds"] += event["seconds"]
+        for attribute in self.solver:
+            self.solver[attribute] += event.get(attribute) or 0
+        if self.forward is not None:
+            self.forward(event)
+
+    def report(self) -> str:
+        lines = [f"{'stage':<28} {'calls':>7} {'seconds':>10}"]
+        for name, stage in self.stages.items():
+            lines.append(f"{name:<28} {stage['calls']:>7} {stage['seconds']:10.4f}")
+        lines.append(
+            "Gurobi: "
+            + ", ".join(f"{key} {value:g}" for key, value in self.solver.items())
+        )
+        return "\n".join(lines)
+
+
+# Testing
+if __name__ == "__main__":
+    import os
+    import timeit
+    import tempfile
+    import gurobipy as gp
+    from Assignment_1_Classes.Optimization_model import Optimization_model
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "metrics.jsonl")
+        with Jsonl_exporter(path) as exporter:
+            summary = Metrics_summary(forward=exporter)
+            model = Optimization_model(
+                env=gp.Env(params={"OutputFlag": 0}), metrics=summary
+            )
+            model.load_data("question_1c")
+            model.parameters.diff_penalty = 1.75
+            model.sweep([{"diff_penalty": penalty} for penalty in [0.5, 1.0, 1.5]])
+        with open(path) as f:
+            events = [json.loads(line) for line in f]
+        print(summary.report())
+        print("Last solve:", [e for e in events if e["stage"] == "optimize"][-1])
+        assert summary.stages["optimize"]["calls"] == 3
+
+    # Overhead of a stage without metrics compared to the plain method
+    model.metrics = None
+    plain = Optimization_model.get_duals.__wrapped__
+    repeats = 20000
+    wrapped_time = timeit.timeit(lambda: model.get_duals(["final_soc"]), number=repeats)
+    plain_time = timeit.timeit(lambda: plain(model, ["final_soc"]), number=repeats)
+    print(
+        f"Overhead without metrics: {1e9 * (wrapped_time - plain_time) / repeats:.0f} "
+        "ns per call"
+    )
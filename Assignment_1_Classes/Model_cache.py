@@ -0,0 +1,249 @@
+"""On-disk cache of built Gurobi models, read back instead of built in Python."""
+
+import os
+import glob
+import json
+import hashlib
+import threading
+import numpy as np
+import gurobipy as gp
+from Assignment_1_Classes.Result_cache import _update_hash
+
+# Increase when the layout of the cached models changes
+MODEL_CACHE_VERSION = 1
+
+
+class Model_cache:
+    """Size-bounded on-disk cache of the Gurobi models of Optimization_model.
+
+    A built model is written as an MPS file, next to a JSON layout with the
+    column of every variable handle, the row of every constraint handle and
+    the values of the updatable parameters (see update_parameters()) it was
+    built with. Entries are keyed by a hash of all other parameter values,
+    which covers the dataset and the structural flags (storage_exists,
+    desired_load_exists, battery_size_variable, ...), and of the model
+    reduction. A model that is read back gets its handles re-bound by index
+    and only the updatable parameters that differ are patched. When the
+    files exceed max_bytes, the least recently used entries are removed.
+    """
+
+    def __init__(self, folder: str, max_bytes: int = 1024 * 2**20):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, model) -> str:
+        """Hash the parameters that determine the structure of a model.
+
+        Args:
+            model (Optimization_model): Model with its parameters and
+                reduction set.
+
+        Returns:
+            str: Hexadecimal key.
+        """
+        digest = hashlib.sha256(
+            f"{MODEL_CACHE_VERSION}:{type(model).__name__}".encode()
+        )
+        _update_hash(
+            digest,
+            {
+                name: value
+                for name, value in vars(model.parameters).items()
+                if name != "data" and name not in model._updatable_parameters
+            },
+        )
+        _update_hash(digest, vars(model.reduction))
+        return digest.hexdigest()
+
+    def load(self, key: str, model) -> bool:
+        """Read the model stored under key into an Optimization_model.
+
+        Args:
+            key (str): Key of the entry.
+            model (Optimization_model): Model with the parameters the key was
+                computed from. Its Gurobi model and handles are replaced.
+
+        Returns:
+            bool: Whether the entry was found.
+        """
+        try:
+            with open(self._path(key, "json")) as file:
+                layout = json.load(file)
+            gurobi_model = gp.read(self._path(key, "mps"), env=model.env)
+        except (FileNotFoundError, gp.GurobiError):
+            self.misses += 1
+            return False
+        os.utime(self._path(key, "mps"))  # Mark as recently used
+        self.hits += 1
+
+        # Re-bind the handles by index
+        variables = gurobi_model.getVars()
+        constrs = gurobi_model.getConstrs()
+        model.model = gurobi_model
+        model.var = {}
+        for name, index in layout["var"].items():
+            if isinstance(index, int):
+                model.var[name] = variables[index]
+            else:
+                model.var[name] = {hour: variables[i] for hour, i in index}
+        model.constr = {name: constrs[i] for name, i in layout["constr"]}
+
+        # Patch the coefficients of the updatable parameters that changed
+        changed = {}
+        for name, stored in layout["values"].items():
+            value = getattr(model.parameters, name, None)
+            if value is None or stored is None:
+                continue  # Components that do not exist
+            if not np.array_equal(np.asarray(value, dtype=float), stored):
+                changed[name] = value
+        if changed:
+            model.update_parameters(**changed)
+        return True
+
+    def put(self, key: str, model) -> None:
+        """Store the built model of an Optimization_model under key."""
+        layout = {"var": {}, "constr": [], "values": {}}
+        for name, handles in model.var.items():
+            if isinstance(handles, dict):
+                layout["var"][name] = [
+                    [int(hour), var.index] for hour, var in handles.items()
+                ]
+            else:
+                layout["var"][name] = handles.index
+        layout["constr"] = [
+            [name, constr.index] for name, constr in model.constr.items()
+        ]
+        for name in type(model)._updatable_parameters:
+            value = getattr(model.parameters, name, None)
+            layout["values"][name] = (
+                None if value is None else np.asarray(value, dtype=float).tolist()
+            )
+
+        # Write to temporary files first, so that other processes and threads
+        # never read a partial entry. The layout is written last and marks the
+        # entry done.
+        for extension in ["mps", "json"]:
+            path = self._path(key, extension)
+            temporary = self._path(
+                f"{key}.{os.getpid()}.{threading.get_ident()}", extension
+            )
+            if extension == "mps":
+                model.model.write(temporary)
+            else:
+                with open(temporary, "w") as file:
+                    json.dump(layout, file)
+            os.replace(temporary, path)
+        self._evict()
+
+    def clear(self) -> None:
+        for path in glob.glob(os.path.join(self.folder, "*.mps")) + glob.glob(
+            os.path.join(self.folder, "*.json")
+        ):
+            os.remove(path)
+
+    def stats(self) -> dict:
+        sizes = [
+            os.path.getsize(path) + os.path.getsize(path[: -len("mps")] + "json")
+            for path in self._paths()
+        ]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+        }
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.folder, f"{key}.{extension}")
+
+    def _paths(self) -> list:
+        # Model files of complete entries
+        return [
+            path
+            for path in glob.glob(os.path.join(self.folder, "*.mps"))
+            if os.path.exists(path[: -len("mps")] + "json")
+        ]
+
+    def _evict(self) -> None:
+        # Remove the least recently used entries until the cache fits
+        entries = sorted(
+            (
+                os.stat(path).st_mtime_ns,
+                os.path.getsize(path) + os.path.getsize(path[: -len("mps")] + "json"),
+                path,
+            )
+            for path in self._paths()
+        )
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path[: -len("mps")] + "json")
+            os.remove(path)
+            total -= size
+
+
+# Testing
+if __name__ == "__main__":
+    import time
+    import tempfile
+    from Assignment_1_Classes.Optimization_model import Optimization_model
+
+    env = gp.Env(params={"OutputFlag": 0})
+
+    def build(question: str, cache: Model_cache, factor: float = 1.0, **options):
+        model = Optimization_model(env=env)
+        model.load_data(f"question_{question}")
+        if question == "2b":
+            model.set_battery_size_as_variable()
+            model.parameters.battery_cost = 5
+        model.parameters.diff_penalty = 1.75
+        model.parameters.import_price = factor * model.parameters.import_price
+        start = time.perf_counter()
+        model.create_model(model_cache=cache, **options)
+        model.build_time = time.perf_counter() - start
+        model.model.Params.OutputFlag = 0
+        return model
+
+    with tempfile.TemporaryDirectory() as folder:
+        cache = Model_cache(folder)
+        for question, options in [
+            ("1a", {}),
+            ("1c", {}),
+            ("1c", {"reduce": True}),
+            ("2b", {"vectorized": True}),
+        ]:
+            cold = build(question, cache, **options)
+            # A hit with other prices is patched to the model of those prices
+            hit = build(question, cache, 1.5, **options)
+            assert "Model loaded from cache" in hit.status
+            expected = build(question, None, 1.5, **options)
+            results, expected = hit.solve(), expected.solve()
+            assert np.isclose(results["objective_value"], expected["objective_value"])
+            for name in Optimization_model.result_series:
+                assert np.allclose(results[name], expected[name])
+            assert results["duals"].keys() == expected["duals"].keys()
+            assert list(hit.constr) == list(cold.constr)
+            print(
+                f"question_{question} {options}: cold build "
+                f"{1e3 * cold.build_time:.1f} ms, cache hit "
+                f"{1e3 * hit.build_time:.1f} ms"
+            )
+        assert cache.stats()["entries"] == 4 and cache.stats()["hits"] == 4
+
+        # Updates of a cached model work as on a built one
+        hit.update_parameters(battery_cost=7)
+        expected = build("2b", None, 1.5, vectorized=True)
+        expected.update_parameters(battery_cost=7)
+        assert np.isclose(
+            hit.solve()["objective_value"], expected.solve()["objective_value"]
+        )
+
+        # The least recently used entries are removed beyond max_bytes
+        small = Model_cache(os.path.join(folder, "small"), max_bytes=1)
+        build("1a", small)
+        assert small.stats()["entries"] == 0
+        print("Cache:", cache.stats())
@@ -0,0 +1,129 @@
+"""Reduction of Optimization_model, decided from the parameters before the build."""
+
+import numpy as np
+from Assignment_1_Classes.Parameters import Parameters, INFINITY
+
+
+class Model_reduction:
+    """Variables and constraints of the model that carry no information.
+
+    - PV production is fixed at zero in hours with pv_max = 0, so its
+      variables are left out.
+    - With an infinite diff_penalty the load must equal the desired load. The
+      load is substituted by the desired load and the deviation variables and
+      their constraints are left out. The minimum combined load constraint
+      is then a constant and is left out as well. This is only done if the
+      desired load is feasible.
+    - With a fixed battery size the initial SOC, final SOC and capacity
+      constraints have a single variable, so they become variable bounds.
+
+    Variables and constraints with operating limits (see
+    Parameters.operating_limits()) are kept. An inactive reduction keeps
+    everything and gives the full model.
+    """
+
+    def __init__(self, parameters: Parameters, active: bool = True):
+        """
+        Args:
+            parameters (Parameters): Parameters the model is built from.
+            active (bool): Reduce the model, otherwise keep everything.
+        """
+        T = parameters.T
+        limits = parameters.operating_limits() if active else {}
+        self.active = active
+
+        # Hours with a PV production variable
+        if active and "gen" not in limits:
+            self.gen_hours = np.flatnonzero(np.asarray(parameters.pv_max) > 0)
+        else:
+            self.gen_hours = np.arange(T)
+
+        # Load substituted by the desired load
+        self.fixed_load = (
+            active
+            and parameters.desired_load_exists
+            and parameters.diff_penalty >= INFINITY
+            and "load" not in limits
+            and np.all(parameters.desired_load >= 0)
+            and np.all(parameters.desired_load <= parameters.load_max)
+            and (
+                not parameters.min_combined_load_exists
+                or parameters.desired_load.sum() >= parameters.min_combined_load
+            )
+        )
+
+        # Single variable storage constraints as bounds
+        self.storage_bounds = (
+            active
+            and parameters.storage_exists
+            and not parameters.battery_size_variable
+        )
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, Model_reduction)
+            and self.active == other.active
+            and np.array_equal(self.gen_hours, other.gen_hours)
+            and self.fixed_load == other.fixed_load
+            and self.storage_bounds == other.storage_bounds
+        )
+
+    def deviations(self, parameters: Parameters) -> bool:
+        """Whether the model has the load deviation variables."""
+        return parameters.desired_load_exists and not self.fixed_load
+
+    def bounds(self, parameters: Parameters, name: str) -> tuple:
+        """Hourly bounds of a storage variable, with the storage constraints
+        that become bounds.
+
+        Args:
+            parameters (Parameters): Parameters the model is built from.
+            name (str): "charge", "discharge" or "SOC".
+
+        Returns:
+            tuple: Lower and upper bounds, arrays over the hours.
+        """
+        T = parameters.T
+        lb, ub = np.zeros(T), np.full(T, INFINITY)
+        if not self.storage_bounds:
+            return lb, ub
+        # The capacity constraints start in the second hour, the charge and
+        # discharge capacities in the first if first_hour_storage_limits
+        first = 0 if parameters.first_hour_storage_limits else 1
+        if name == "charge":
+            ub[first:] = parameters.charging_capacity
+        elif name == "discharge":
+            ub[first:] = parameters.discharging_capacity
+        else:
+            ub[1:] = parameters.storage_capacity
+            lb[0] = ub[0] = parameters.initial_soc
+            lb[-1] = max(lb[-1], parameters.final_soc)
+            ub[-1] = min(ub[-1], parameters.final_soc)
+        return lb, ub
+
+    def removed(self, parameters: Parameters) -> dict:
+        """Number of variables and constraints left out of the full model."""
+        T = parameters.T
+        variables = T - len(self.gen_hours)
+        constraints = 0
+        if self.fixed_load:
+            variables += 3 * T  # Load and its positive and negative deviation
+            constraints += 2 * T + parameters.min_combined_load_exists
+        if self.storage_bounds:
+            constraints += 2 + 3 * (T - 1) + 2 * parameters.first_hour_storage_limits
+        return {"variables": variables, "constraints": constraints}
+
+
+# Testing
+if __name__ == "__main__":
+    for question in ["1a", "1b", "1c", "2b"]:
+        parameters = Parameters(f"question_{question}")
+        parameters.diff_penalty = INFINITY
+        reduction = Model_reduction(parameters)
+        assert reduction == Model_reduction(parameters.copy())
+        assert reduction != Model_reduction(parameters, active=False)
+        assert Model_reduction(parameters, active=False).removed(parameters) == {
+            "variables": 0,
+            "constraints": 0,
+        }
+        print(f"question_{question}: removes {reduction.removed(parameters)}")
@@ -0,0 +1,307 @@
+"""Local HTTP service that solves requests on pools of pre-built models."""
+
+import json
+import queue
+import threading
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import gurobipy as gp
+from Assignment_1_Classes.Optimization_model import Optimization_model
+
+
+class Model_pool:
+    """Pre-built models of one dataset that are borrowed one request at a time.
+
+    Each model has its own Gurobi environment, so the models of a pool can be
+    solved from several threads at once. A request gives its parameters as
+    overrides of the dataset. Parameters that the previous request on the
+    model changed, but this request does not give, are reset to the dataset
+    first, so requests do not see each other's overrides.
+    """
+
+    def __init__(
+        self, dataset_folder: str, size: int = 1, battery_size_variable: bool = False
+    ):
+        self.models = queue.Queue()
+        for _ in range(size):
+            model = Optimization_model(env=gp.Env(params={"OutputFlag": 0}))
+            model.load_data(dataset_folder)
+            if battery_size_variable:
+                model.set_battery_size_as_variable()
+            model.create_model()
+            model.changed = set()  # Parameters that differ from the dataset
+            self.models.put(model)
+        self.dataset = {
+            name: getattr(model.parameters, name, None)
+            for name in Optimization_model._updatable_parameters
+        }
+
+    def solve(self, overrides: dict = None, duals: bool = False, series=None) -> dict:
+        """Solve the dataset with some parameters replaced.
+
+        Args:
+            overrides (dict): New values of parameters that update_parameters()
+                accepts, numbers or hourly arrays.
+            duals (bool): Include the dual values of all constraints.
+            series (list): Names of the hourly series to return, all if None.
+
+        Returns:
+            dict: Results as returned by Optimization_model.get_results().
+        """
+        overrides = dict(overrides or {})
+        unknown = set(overrides) - set(self.dataset)
+        if unknown:
+            raise ValueError(f"Parameters {sorted(unknown)} cannot be updated.")
+        model = self.models.get()
+        try:
+            resets = {
+                name: self.dataset[name]
+                for name in model.changed
+                if name not in overrides
+            }
+            # Until the update succeeds, any parameter may differ from the dataset
+            model.changed = set(self.dataset)
+            model.update_parameters(**resets, **overrides)
+            model.changed = set(overrides)
+            model.optimize()
+            return model.get_results(duals=duals, series=series)
+        finally:
+            self.models.put(model)
+
+
+class Model_server:
+    """HTTP server on a local port with one Model_pool per dataset.
+
+    POST /solve takes a JSON object with "dataset", and optionally
+    "battery_size_variable", "overrides", "duals" and "series", and answers
+    with the results as JSON. GET /health lists the pools. Only the datasets
+    given when the server is created can be solved.
+    """
+
+    def __init__(
+        self,
+        datasets: list,
+        pool_size: int = 1,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        battery_size_variable: bool = False,
+    ):
+        """
+        Args:
+            datasets (list): Dataset folders to build models for.
+            pool_size (int): Models per dataset, the number of requests on a
+                dataset that are solved at the same time.
+            host (str): Address to listen on.
+            port (int): Port to listen on, a free port if 0.
+            battery_size_variable (bool): Also build pools with the battery
+                size as a variable, for datasets with storage.
+        """
+        self.pools = {}
+        for dataset in datasets:
+            self.pools[(dataset, False)] = Model_pool(dataset, pool_size)
+            pool = self.pools[(dataset, False)]
+            if battery_size_variable and pool.dataset["initial_soc"] is not None:
+                self.pools[(dataset, True)] = Model_pool(dataset, pool_size, True)
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.pools = self.pools
+        self.thread = None
+
+    @property
+    def address(self) -> tuple:
+        return self.httpd.server_address[:2]
+
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+
+    def start(self) -> None:
+        # Serve from a background thread
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self) -> "Model_server":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections open between requests
+    disable_nagle_algorithm = True  # Do not delay small responses
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            return self._reply(404, {"error": f"Unknown path {self.path}"})
+        pools = [
+            {"dataset": dataset, "battery_size_variable": variable}
+            for dataset, variable in self.server.pools
+        ]
+        self._reply(200, {"pools": pools})
+
+    def do_POST(self) -> None:
+        if self.path != "/solve":
+            return self._reply(404, {"error": f"Unknown path {self.path}"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            key = (request["dataset"], request.get("battery_size_variable", False))
+            if key not in self.server.pools:
+                raise ValueError(f"No models of {key[0]} with battery size {key[1]}.")
+            overrides = {
+                name: (
+                    np.asarray(value, dtype=float) if isinstance(value, list) else value
+                )
+                for name, value in request.get("overrides", {}).items()
+            }
+            results = self.server.pools[key].solve(
+                overrides, request.get("duals", False), request.get("series")
+            )
+        except (ValueError, KeyError, TypeError, gp.GurobiError) as error:
+            return self._reply(400, {"error": str(error)})
+        self._reply(
+            200,
+            {
+                key: value.tolist() if isinstance(value, np.ndarray) else value
+                for key, value in results.items()
+            },
+        )
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        pass  # No line per request on stderr
+
+
+class Model_client:
+    """Client of a Model_server that keeps one connection open."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000):
+        self.connection = http.client.HTTPConnection(host, port)
+
+    def solve(
+        self,
+        dataset: str,
+        overrides: dict = None,
+        duals: bool = False,
+        series: list = None,
+        battery_size_variable: bool = False,
+    ) -> dict:
+        """Solve a dataset on the server, see Model_pool.solve().
+
+        Returns:
+            dict: Results as returned by Optimization_model.get_results(),
+                with the hourly series as NumPy arrays.
+        """
+        request = {
+            "dataset": dataset,
+            "battery_size_variable": battery_size_variable,
+            "overrides": {
+                name: np.asarray(value).tolist()
+                for name, value in (overrides or {}).items()
+            },
+            "duals": duals,
+            "series": series,
+        }
+        body = self._request("POST", "/solve", json.dumps(request).encode())
+        return {
+            key: np.array(value) if isinstance(value, list) else value
+            for key, value in body.items()
+        }
+
+    def health(self) -> dict:
+        return self._request("GET", "/health")
+
+    def _request(self, method: str, path: str, body: bytes = None) -> dict:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        data = json.loads(response.read())
+        if response.status != 200:
+            raise ValueError(data["error"])
+        return data
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+# Testing
+if __name__ == "__main__":
+    import time
+
+    with Model_server(
+        ["question_1c", "question_2b"], pool_size=2, battery_size_variable=True
+    ) as server:
+        client = Model_client(*server.address)
+        print("Pools:", client.health()["pools"])
+
+        # Results match a model built for the request
+        reference = Optimization_model(env=gp.Env(params={"OutputFlag": 0}))
+        reference.load_data("question_1c")
+        reference.parameters.import_price = 1.3 * reference.parameters.import_price
+        reference.parameters.diff_penalty = 1.75
+        expected = reference.solve()
+        results = client.solve(
+            "question_1c",
+            {"import_price": reference.parameters.import_price, "diff_penalty": 1.75},
+            duals=True,
+        )
+        assert np.isclose(results["objective_value"], expected["objective_value"])
+        assert np.allclose(results["load"], expected["load"])
+        assert results["duals"].keys() == expected["duals"].keys()
+
+        # Overrides of one request do not leak into the next
+        baseline = Optimization_model(env=gp.Env(params={"OutputFlag": 0}))
+        baseline.load_data("question_1c")
+        baseline.parameters.diff_penalty = 1.75
+        for _ in range(2):  # Reach both models of the pool
+            plain = client.solve("question_1c", {"diff_penalty": 1.75})
+            assert np.isclose(
+                plain["objective_value"], baseline.solve()["objective_value"]
+            )
+
+        try:
+            client.solve("question_1c", {"T": 48})
+            raise AssertionError("Unknown parameters must be rejected")
+        except ValueError as error:
+            print("Rejected:", error)
+
+        # Latency of random price and penalty requests over one connection
+        rng = np.random.default_rng(0)
+        latency = []
+        for _ in range(1000):
+            overrides = {
+                "import_price": rng.uniform(0.5, 2) * reference.parameters.import_price,
+                "diff_penalty": rng.uniform(0.5, 3),
+            }
+            start = time.perf_counter()
+            client.solve("question_1c", overrides, series=["load", "import_grid"])
+            latency.append(time.perf_counter() - start)
+        for _ in range(200):
+            start = time.perf_counter()
+            client.solve(
+                "question_2b",
+                {"battery_cost": rng.uniform(3, 10), "diff_penalty": 1.0},
+                battery_size_variable=True,
+            )
+            latency.append(time.perf_counter() - start)
+        latency = 1e3 * np.array(latency)
+        print(
+            f"Latency (ms): median {np.median(latency):.2f}, "
+            f"p99 {np.percentile(latency, 99):.2f}, max {latency.max():.2f}"
+        )
+        client.close()
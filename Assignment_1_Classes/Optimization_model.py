@@ -3,15 +3,23 @@
 import numpy as np
 import gurobipy as gp
 from gurobipy import GRB
-import matplotlib.pyplot as plt
 from Assignment_1_Classes.Parameters import Parameters
+from Assignment_1_Classes.Model_reduction import Model_reduction
+from Assignment_1_Classes.Standard_form import Standard_form, build_linear_program
+from Assignment_1_Classes.Instrumentation import instrumented
+from Assignment_1_Classes.Results_writer import Results_writer
+from Assignment_1_Classes.Result_cache import Result_cache
+from Assignment_1_Classes.Model_cache import Model_cache
 
 
 class Optimization_model:
-    def __init__(self):
+    def __init__(self, env: gp.Env = None, metrics=None):
+        self.env = env  # Gurobi environment, the default environment if None
+        self.metrics = metrics  # Callback for stage events, see Instrumentation
         self.model = None
         self.status = "Empty model"
 
+    @instrumented("load_data")
     def load_data(self, dataset_folder: str) -> None:
         self.parameters = Parameters(
             dataset_folder
@@ -21,64 +29,138 @@ class Optimization_model:
         )  # Penalty for deviation from desired load
         self.status = "Data loaded"
 
-    def create_model(self) -> None:
-        self.model = gp.Model("Energy System Optimization")
+    @instrumented("create_model")
+    def create_model(
+        self,
+        vectorized: bool = False,
+        reduce: bool = False,
+        model_cache: Model_cache = None,
+    ) -> None:
+        """Build the Gurobi model.
+
+        Args:
+            vectorized (bool): Build the model with the matrix API from the
+                linear program of build_linear_program(), which Backend_model
+                solves as well, instead of one variable and constraint per
+                hour. Both give the same model, the matrix build scales to long
+                horizons.
+            reduce (bool): Leave out the variables and constraints that carry
+                no information, see Model_reduction. The results and duals
+                are still given for the full model.
+            model_cache (Model_cache): Cache of built models. A model with the
+                same structure is read from it and patched instead of built,
+                a built model is stored in it.
+        """
         self.status = "Model created"
-        self._add_variables()
-        self._add_objective()
-        self._add_constraints()
+        self.reduction = Model_reduction(self.parameters, active=reduce)
+        key = None if model_cache is None else model_cache.key(self)
+        if key is not None and model_cache.load(key, self):
+            self.status += "\nModel loaded from cache"
+        else:
+            self.model = gp.Model("Energy System Optimization", env=self.env)
+            if vectorized:
+                form = build_linear_program(self.parameters, self.reduction)
+                self._add_variables_matrix(form)
+                self._add_objective_matrix(form)
+                self._add_constraints_matrix(form)
+            else:
+                self._add_variables()
+                self._add_objective()
+                self._add_constraints()
+            self._add_operating_limits()
+            if key is not None:
+                model_cache.put(key, self)
+        if reduce:
+            removed = self.reduction.removed(self.parameters)
+            self.status += (
+                f"\nModel reduced by {removed['variables']} variables and "
+                f"{removed['constraints']} constraints"
+            )
 
-    def optimize(self) -> None:
-        self.model.optimize()
+    @instrumented("optimize")
+    def optimize(self, callback=None) -> None:
+        """Optimize the built model.
+
+        Args:
+            callback: Gurobi callback function(model, where), see
+                gp.Model.optimize().
+        """
+        self.model.optimize(callback)
         if self.model.status == GRB.OPTIMAL:
             self.status = "Model optimized"
+        elif self.model.status in (GRB.TIME_LIMIT, GRB.INTERRUPTED):
+            self.status = "Model optimization stopped before optimality"
         else:
             self.status = "Model infeasible or unbounded"
 
-    def get_results(self) -> dict:
+    def solve(self, cache: Result_cache = None, duals: bool = True) -> dict:
+        """Optimize the model and return get_results().
+
+        With a cache, results of earlier solves with the same parameters are
+        returned without building or solving the model. The parameters must
+        describe the model, so change them with update_parameters() once the
+        model is built.
+
+        Args:
+            cache (Result_cache): Cache of earlier results.
+            duals (bool): Include the dual values of all constraints.
+
+        Returns:
+            dict: Results as returned by get_results().
+        """
+        key = None
+        if cache is not None:
+            key = cache.key(self.parameters, namespace=type(self).__name__)
+            results = cache.get(key)
+            if results is not None:
+                if not duals:
+                    results.pop("duals")
+                self.status = "Results loaded from cache"
+                return results
+        if self.model is None:
+            self.create_model()
+        self.optimize()
+        results = self.get_results(duals=duals or key is not None)
+        if key is not None:
+            cache.put(key, results)
+            if not duals:
+                results.pop("duals")
+        return results
+
+    @instrumented("get_results")
+    def get_results(self, duals: bool = True, series: tuple = None) -> dict:
+        """Extract the results of the optimized model.
+
+        Values are read in bulk from the stored variable and constraint
+        handles and returned as NumPy arrays.
+
+        Args:
+            duals (bool): Extract the dual values of all constraints.
+            series (tuple): Names of the hourly series to extract, for example
+                ("load", "import_grid"). All series are extracted if None.
+
+        Returns:
+            dict: Objective value, battery size, hourly series and duals.
+        """
         if self.model.status != GRB.OPTIMAL:
             raise ValueError("No optimal solution available.")
+        if series is None:
+            series = self.result_series
+        unknown = set(series) - set(self.result_series)
+        if unknown:
+            raise ValueError(f"Unknown result series: {sorted(unknown)}")
 
         results = {}  # Dictionary to store results
         results["objective_value"] = self.model.objVal
-        results["load"] = [
-            self.model.getVarByName(f"load_{t}").x for t in range(self.parameters.T)
-        ]
-        results["pv_prod"] = [
-            self.model.getVarByName(f"gen_{t}").x for t in range(self.parameters.T)
-        ]
-        results["pv_curtailment"] = [
-            self.parameters.pv_max[t] - results["pv_prod"][t]
-            for t in range(self.parameters.T)
-        ]
-        results["import_grid"] = [
-            self.model.getVarByName(f"import_{t}").x for t in range(self.parameters.T)
-        ]
-        results["export_grid"] = [
-            self.model.getVarByName(f"export_{t}").x for t in range(self.parameters.T)
-        ]
-        results["charge"] = (
-            [self.model.getVarByName(f"charge_{t}").x for t in range(self.parameters.T)]
-            if self.parameters.storage_exists
-            else [0] * self.parameters.T
-        )
-        results["discharge"] = (
-            [
-                self.model.getVarByName(f"discharge_{t}").x
-                for t in range(self.parameters.T)
-            ]
-            if self.parameters.storage_exists
-            else [0] * self.parameters.T
-        )
-        results["soc"] = (
-            [self.model.getVarByName(f"SOC_{t}").x for t in range(self.parameters.T)]
-            if self.parameters.storage_exists
-            else [0] * self.parameters.T
-        )
+        for name in series:
+            if name == "pv_curtailment":
+                results[name] = self.parameters.pv_max - self._get_values("gen")
+            else:
+                results[name] = self._get_values(self.result_series[name])
         results["battery_size"] = (
             self.parameters.storage_capacity
             * (
-                self.model.getVarByName("battery_scaling").x
+                self.var["battery_scaling"].X
                 if self.parameters.battery_size_variable
                 else 1
             )
@@ -86,69 +168,497 @@ class Optimization_model:
             else 0
         )
         # Extract dual variables (shadow prices) for constraints
-        duals = {}
-        for cname, constr in self.constr.items():
-            duals[cname] = constr.Pi
-        results["duals"] = duals
+        if duals:
+            results["duals"] = dict(
+                zip(self.constr.keys(), self._pi(list(self.constr.values())))
+            )
+            results["duals"].update(self._removed_duals())
 
         return results
 
-    def plot_results(self) -> None:
-        # Extract results
-        results = self.get_results()
-
-        # Plotting
-        plt.figure()
-        plt.plot(results["load"], label="Load (kW)", color="blue")
-        plt.plot(results["pv_prod"], label="PV Production (kW)", color="orange")
-        plt.plot(results["pv_curtailment"], label="PV Curtailment (kW)", color="red")
-        plt.plot(
-            results["import_grid"],
-            label="Import from Grid (kW)",
-            color="green",
-            linestyle="--",
+    # Hourly result series and the variables they are extracted from
+    result_series = {
+        "load": "load",
+        "pv_prod": "gen",
+        "pv_curtailment": "gen",
+        "import_grid": "import",
+        "export_grid": "export",
+        "charge": "charge",
+        "discharge": "discharge",
+        "soc": "SOC",
+        "load_on": "load_on",
+        "pv_on": "gen_on",
+    }
+
+    @instrumented("get_duals")
+    def get_duals(self, families: list = None) -> dict:
+        """Extract the dual values (shadow prices) by constraint family.
+
+        Args:
+            families (list): Names of the constraint families, for example
+                ["energy_balance"]. All families are extracted if None.
+
+        Returns:
+            dict: Per family an array over the hours, NaN in hours without a
+                constraint of the family, or a number for single constraints
+                such as "initial_soc".
+        """
+        if self.model.status != GRB.OPTIMAL:
+            raise ValueError("No optimal solution available.")
+        index = self._dual_families()
+        removed = {}  # Values of the constraints left out by the reduction
+        for name, value in self._removed_duals().items():
+            family, hour = _family(name)
+            removed.setdefault(family, ([], []))
+            removed[family][0].append(hour)
+            removed[family][1].append(value)
+        if families is None:
+            families = list(index) + list(removed)
+        unknown = set(families) - set(index) - set(removed)
+        if unknown:
+            raise ValueError(f"Unknown constraint families: {sorted(unknown)}")
+
+        duals = {}
+        for family in families:
+            if family in removed:
+                hours, values = removed[family]
+                hours = None if hours[0] is None else np.array(hours)
+                values = np.array(values)
+            else:
+                hours, constrs = index[family]
+                values = np.array(self._pi(constrs))
+            if hours is None:
+                duals[family] = values[0]
+            else:
+                duals[family] = np.full(self.parameters.T, np.nan)
+                duals[family][hours] = values
+        return duals
+
+    def _dual_families(self) -> dict:
+        # Hours and constraints of each family, parsed from the constraint
+        # names ("energy_balance_3") once per built model
+        if getattr(self, "_families_model", None) is not self.model:
+            families = {}
+            for name, constr in self.constr.items():
+                family, hour = _family(name)
+                families.setdefault(family, ([], []))
+                families[family][0].append(hour)
+                families[family][1].append(constr)
+            self._families = {
+                family: (None if hours[0] is None else np.array(hours), constrs)
+                for family, (hours, constrs) in families.items()
+            }
+            self._families_model = self.model
+        return self._families
+
+    def _pi(self, constrs: list) -> list:
+        return self._dual_values("Pi", constrs)
+
+    def _dual_values(self, attr: str, handles: list) -> list:
+        # Pi of constraints or RC of variables. A MILP has no duals, use those
+        # of the LP with the integers fixed
+        if not self.model.IsMIP:
+            return self.model.getAttr(attr, handles)
+        fixed = self.model.fixed()
+        fixed.optimize()
+        fixed_handles = fixed.getConstrs() if attr == "Pi" else fixed.getVars()
+        return fixed.getAttr(attr, [fixed_handles[handle.index] for handle in handles])
+
+    def _removed_duals(self) -> dict:
+        # Duals of the constraints left out by the reduction, recovered from
+        # the duals and reduced costs of the reduced model
+        T = self.parameters.T
+        duals = {}
+        if self.reduction.fixed_load:
+            # Reduced cost the substituted load would have without its
+            # deviation constraints, which are the only ones that can price it
+            rc = -np.array(
+                self._pi([self.constr[f"energy_balance_{t}"] for t in range(T)])
+            )
+            if self.parameters.min_combined_load_exists:
+                duals["minimum_combined_load"] = 0.0
+            for t in range(T):
+                duals[f"pos_diff_load_{t}"] = max(-rc[t], 0.0)
+                duals[f"neg_diff_load_{t}"] = max(rc[t], 0.0)
+        if self.reduction.storage_bounds:
+            # A constraint that became a bound has the reduced cost of its
+            # variable as dual, while the variable is at that bound
+            rc = {
+                name: np.array(self._dual_values("RC", list(self.var[name].values())))
+                for name in ["charge", "discharge", "SOC"]
+            }
+            duals["initial_soc"] = rc["SOC"][0]
+            duals["final_soc"] = rc["SOC"][-1]
+            if self.parameters.first_hour_storage_limits:
+                duals["charge_capacity_0"] = min(rc["charge"][0], 0.0)
+                duals["discharge_capacity_0"] = min(rc["discharge"][0], 0.0)
+            for t in range(1, T):
+                duals[f"charge_capacity_{t}"] = min(rc["charge"][t], 0.0)
+                duals[f"discharge_capacity_{t}"] = min(rc["discharge"][t], 0.0)
+                duals[f"soc_capacity_{t}"] = (
+                    min(rc["SOC"][t], 0.0) if t < T - 1 else 0.0
+                )
+        return duals
+
+    def _get_values(self, name: str) -> np.ndarray:
+        if name == "load" and self.reduction.fixed_load:
+            return np.array(self.parameters.desired_load, dtype=float)
+        values = np.zeros(self.parameters.T)
+        variables = self.var.get(name)
+        if variables:  # Variables of components or hours that are left out are 0
+            values[list(variables)] = self.model.getAttr("X", list(variables.values()))
+        return values
+
+    @instrumented("update_parameters")
+    def update_parameters(self, **overrides) -> None:
+        """Update parameters of an already built model in place.
+
+        Only the affected objective coefficients, bounds and right hand sides
+        are changed, so the next call to optimize() warm starts from the
+        previous basis instead of rebuilding the model.
+
+        Args:
+            **overrides: New values for import_price, export_price,
+                diff_penalty, battery_cost, pv_max, desired_load,
+                initial_soc and/or final_soc.
+        """
+        for name in overrides:
+            if name not in self._updatable_parameters:
+                raise ValueError(f"Parameter '{name}' cannot be updated in place.")
+        if self.reduction.active:
+            reduction = Model_reduction(self.parameters.copy(**overrides))
+            if reduction != self.reduction:
+                raise ValueError(
+                    "The update changes the model reduction, create the model again."
+                )
+        for name, value in overrides.items():
+            setattr(self.parameters, name, value)
+            self._updatable_parameters[name](self)
+        self.status += "\nParameters updated"
+
+    def sweep(
+        self,
+        scenarios: list,
+        columns: tuple = ("objective_value",),
+        writer: Results_writer = None,
+    ) -> dict:
+        """Solve a sequence of scenarios on a single model.
+
+        The model is built once (if needed) and each scenario only updates the
+        changed coefficients before re-solving from the previous basis.
+
+        Args:
+            scenarios (list): Dictionaries of parameter overrides, see
+                update_parameters().
+            columns (tuple): Keys of get_results() to collect per scenario.
+                "duals" collects the duals of each family, see get_duals().
+            writer (Results_writer): Also append the overrides, all hourly
+                series and all duals of each scenario to this writer, which
+                stores them on disk in chunks.
+
+        Returns:
+            dict: Columnar table with one array per override and result column,
+                indexed by scenario. An override column holds the value in
+                effect for each scenario, also where it is not overridden. The "duals" column is a dict with one
+                (scenarios, T) array per constraint family.
+        """
+        if self.model is None:
+            self.create_model()
+
+        # Primal simplex keeps the previous basis feasible after objective
+        # changes, the method of the caller is restored afterwards
+        method = self.model.Params.Method
+        self.model.Params.Method = 0
+        table = {"scenario": np.arange(len(scenarios))}
+        rows = {column: [] for column in columns}
+        for scenario in scenarios:
+            rows.update({key: [] for key in scenario if key not in rows})
+
+        try:
+            for i, scenario in enumerate(scenarios):
+                self.update_parameters(**scenario)
+                self.optimize()
+                results = self.get_results(
+                    duals=False,
+                    series=(
+                        None
+                        if writer is not None
+                        else [key for key in columns if key in self.result_series]
+                    ),
+                )
+                if "duals" in columns or writer is not None:
+                    results["duals"] = self.get_duals()
+                if writer is not None:
+                    writer.append(i, results, scenario)
+                for key in rows:
+                    if key in scenario:
+                        rows[key].append(scenario[key])
+                    elif key in columns:
+                        rows[key].append(results[key])
+                    else:
+                        # Parameters that the scenario does not override keep
+                        # the value of an earlier scenario or of the model
+                        rows[key].append(getattr(self.parameters, key))
+        finally:
+            self.model.Params.Method = method
+
+        for key, values in rows.items():
+            if key == "duals":
+                table[key] = {
+                    family: np.array([duals[family] for duals in values])
+                    for family in (values[0] if values else {})
+                }
+            else:
+                table[key] = np.array(values)
+        return table
+
+    def parametric(
+        self,
+        parameter: str,
+        low: float,
+        high: float,
+        columns: tuple = ("objective_value",),
+    ) -> dict:
+        """Trace the optimal objective over a parameter range with LP ranging.
+
+        The objective value is piecewise linear in battery_cost, diff_penalty
+        and min_combined_load. Instead of solving on a grid, each solve reads
+        the end of the range over which the optimal basis stays optimal
+        (SAObjUp for cost parameters, SARHSUp for min_combined_load) and the
+        next solve starts just past it. One solve is needed per linear
+        piece.
+
+        Args:
+            parameter (str): battery_cost, diff_penalty or min_combined_load.
+            low (float): Start of the parameter range.
+            high (float): End of the parameter range.
+            columns (tuple): Keys of get_results() to collect per piece, taken
+                at the start of the piece. For cost parameters the primal
+                solution is constant on each piece.
+
+        Returns:
+            dict: "breakpoints" (pieces + 1 values from low to high), the exact
+                "objective_value" at each breakpoint, the "slope" of each piece,
+                the result columns per piece and the number of "solves". The
+                objective at any value in the range is
+                np.interp(value, breakpoints, objective_value).
+        """
+        if parameter not in self._parametric_parameters:
+            raise ValueError(f"No parametric analysis for parameter '{parameter}'.")
+        if low > high:
+            raise ValueError("The start of the range must not exceed its end.")
+        if self.model is None:
+            self.create_model()
+
+        original = getattr(self.parameters, parameter)
+        handle, value_attr, slope_attr, upper_attr = self._parametric_parameters[
+            parameter
+        ](self)
+        # Ranging needs an optimal basis, primal simplex warm starts from it.
+        # A tight tolerance makes the solver leave a basis just past its range.
+        # The settings of the caller are restored afterwards.
+        method = self.model.Params.Method
+        optimality_tol = self.model.Params.OptimalityTol
+        self.model.Params.Method = 0
+        self.model.Params.OptimalityTol = 1e-9
+        breakpoints, objective_values, slopes = [low], [], []
+        rows = {column: [] for column in columns if column != "objective_value"}
+        value = low  # Parameter value the current piece is solved at
+        solves = 0
+        try:
+            while True:
+                handle.setAttr(value_attr, value)
+                self.model.update()
+                self.optimize()
+                solves += 1
+                results = self.get_results(
+                    duals="duals" in rows,
+                    series=[key for key in rows if key in self.result_series],
+                )
+                slope = handle.getAttr(slope_attr)
+                upper = handle.getAttr(upper_attr)
+                if not objective_values:
+                    objective_values.append(results["objective_value"])
+                if slopes and np.isclose(slope, slopes[-1]):
+                    # Basis change without a kink, extend the previous piece
+                    breakpoints.pop()
+                    objective_values.pop()
+                else:
+                    slopes.append(slope)
+                    for key in rows:
+                        rows[key].append(results[key])
+                end = min(upper, high)
+                breakpoints.append(end)
+                objective_values.append(
+                    results["objective_value"] + (end - value) * slope
+                )
+                if upper >= high:
+                    break
+                value = max(end, value) + 1e-6 * max(1, abs(end))
+        finally:
+            self.model.Params.Method = method
+            self.model.Params.OptimalityTol = optimality_tol
+            self._parametric_restore(parameter, handle, original)
+
+        table = {
+            "breakpoints": np.array(breakpoints),
+            "objective_value": np.array(objective_values),
+            "slope": np.array(slopes),
+            "solves": solves,
+        }
+        for key, values in rows.items():
+            table[key] = np.array(values)
+        return table
+
+    def _parametric_battery_cost(self) -> tuple:
+        if not self.parameters.battery_size_variable:
+            raise ValueError("The battery size is not a variable.")
+        return self.var["battery_scaling"], "Obj", "X", "SAObjUp"
+
+    def _parametric_diff_penalty(self) -> tuple:
+        # The penalty is moved to one variable equal to the total deviation,
+        # so that the ranging of its cost covers all hours at once
+        if not self.parameters.desired_load_exists:
+            raise ValueError("No desired load profile to penalize deviations from.")
+        if self.reduction.fixed_load:
+            raise ValueError("The deviations from the desired load are reduced out.")
+        diff_vars = list(self.var["pos_diff_load"].values()) + list(
+            self.var["neg_diff_load"].values()
         )
-        plt.plot(
-            results["export_grid"],
-            label="Export to Grid (kW)",
-            color="red",
-            linestyle="--",
+        self.model.setAttr("Obj", diff_vars, [0] * len(diff_vars))
+        total_diff = self.model.addVar(name="total_diff_load")
+        self._total_diff_constr = self.model.addLConstr(
+            gp.LinExpr([1] + [-1] * len(diff_vars), [total_diff] + diff_vars),
+            GRB.EQUAL,
+            0,
+            name="total_diff_load",
         )
-        plt.plot(
-            self.parameters.electricity_price,
-            label="Electricity Price (DKK/kWh)",
-            color="purple",
-            linestyle=":",
+        return total_diff, "Obj", "X", "SAObjUp"
+
+    def _parametric_min_combined_load(self) -> tuple:
+        if not self.parameters.min_combined_load_exists:
+            raise ValueError("No minimum combined load constraint.")
+        if self.reduction.fixed_load:
+            raise ValueError("The minimum combined load constraint is reduced out.")
+        return self.constr["minimum_combined_load"], "RHS", "Pi", "SARHSUp"
+
+    # Parameters with a parametric analysis and the methods that give the
+    # handle, value, slope and upper range attributes to trace them with
+    _parametric_parameters = {
+        "battery_cost": _parametric_battery_cost,
+        "diff_penalty": _parametric_diff_penalty,
+        "min_combined_load": _parametric_min_combined_load,
+    }
+
+    def _parametric_restore(self, parameter: str, handle, original) -> None:
+        if parameter == "diff_penalty":
+            self.model.remove([handle, self._total_diff_constr])
+            del self._total_diff_constr
+        if parameter == "min_combined_load":
+            handle.RHS = original
+        else:
+            self.update_parameters(**{parameter: original})
+        self.model.update()
+
+    def _update_import_price(self) -> None:
+        self.model.setAttr(
+            "Obj", list(self.var["import"].values()), self.parameters.import_price
         )
+
+    def _update_export_price(self) -> None:
+        self.model.setAttr(
+            "Obj", list(self.var["export"].values()), -self.parameters.export_price
+        )
+
+    def _update_diff_penalty(self) -> None:
         if self.parameters.desired_load_exists:
-            plt.plot(
-                self.parameters.desired_load,
-                label="Desired Load (kW)",
-                color="brown",
-                linestyle="--",
+            diff_vars = list(self.var["pos_diff_load"].values()) + list(
+                self.var["neg_diff_load"].values()
             )
-        if self.parameters.storage_exists:
-            plt.plot(
-                results["charge"],
-                label="Storage Charge (kW)",
-                color="cyan",
-                linestyle=":",
+            self.model.setAttr(
+                "Obj", diff_vars, [self.parameters.diff_penalty] * len(diff_vars)
+            )
+
+    def _update_battery_cost(self) -> None:
+        if self.parameters.battery_size_variable:
+            self.var["battery_scaling"].Obj = self.parameters.battery_cost
+
+    def _update_pv_max(self) -> None:
+        hours = list(self.var["gen"])
+        self.model.setAttr(
+            "UB",
+            list(self.var["gen"].values()),
+            np.asarray(self.parameters.pv_max)[hours],
+        )
+
+    def _update_desired_load(self) -> None:
+        if self.reduction.fixed_load:
+            # The substituted load is on the right hand side of the balance
+            T = self.parameters.T
+            self.model.setAttr(
+                "RHS",
+                [self.constr[f"energy_balance_{t}"] for t in range(T)],
+                -self.parameters.desired_load,
             )
-            plt.plot(
-                results["discharge"],
-                label="Storage Discharge (kW)",
-                color="magenta",
-                linestyle=":",
+        elif self.parameters.desired_load_exists:
+            T = self.parameters.T
+            self.model.setAttr(
+                "RHS",
+                [self.constr[f"pos_diff_load_{t}"] for t in range(T)],
+                -self.parameters.desired_load,
             )
-            plt.plot(
-                results["soc"], label="Storage SOC (kWh)", color="gray", linestyle="--"
+            self.model.setAttr(
+                "RHS",
+                [self.constr[f"neg_diff_load_{t}"] for t in range(T)],
+                self.parameters.desired_load,
             )
-        plt.legend()
-        plt.xlabel("Time (hours)")
-        plt.ylabel("Power (kW) / Energy (kWh) / Price (DKK/kWh)")
-        plt.title("Energy System Optimization Results")
-        plt.grid()
-        plt.show()
+
+    def _update_soc(self, name: str) -> None:
+        # The SOC is proportional to the battery size if that is a variable
+        if self.reduction.storage_bounds:
+            # The initial and final SOC are bounds of the SOC
+            lb, ub = self.reduction.bounds(self.parameters, "SOC")
+            soc = list(self.var["SOC"].values())
+            self.model.setAttr("LB", soc, lb)
+            self.model.setAttr("UB", soc, ub)
+        elif self.parameters.storage_exists:
+            value = getattr(self.parameters, name)
+            if self.parameters.battery_size_variable:
+                self.model.chgCoeff(
+                    self.constr[name], self.var["battery_scaling"], -value
+                )
+            else:
+                self.constr[name].RHS = value
+
+    def _update_initial_soc(self) -> None:
+        self._update_soc("initial_soc")
+
+    def _update_final_soc(self) -> None:
+        self._update_soc("final_soc")
+
+    # Parameters that can be changed on a built model and their update methods
+    _updatable_parameters = {
+        "import_price": _update_import_price,
+        "export_price": _update_export_price,
+        "diff_penalty": _update_diff_penalty,
+        "battery_cost": _update_battery_cost,
+        "pv_max": _update_pv_max,
+        "desired_load": _update_desired_load,
+        "initial_soc": _update_initial_soc,
+        "final_soc": _update_final_soc,
+    }
+
+    def plot_results(self, report=None) -> None:
+        """Plot the hourly results, see Reporting.Report.results().
+
+        Args:
+            report (Report): Report to draw in, one that shows the figure if
+                None.
+        """
+        # Imported here, so that solving alone never imports matplotlib
+        from Assignment_1_Classes.Reporting import Report
+
+        (report or Report()).results(self.get_results(), self.parameters)
 
     def set_battery_size_as_variable(self) -> None:
         if not self.parameters.storage_exists:
@@ -158,6 +668,7 @@ class Optimization_model:
         self.parameters.battery_size_variable = True
         self.parameters.battery_cost = GRB.INFINITY
 
+    @instrumented("add_variables")
     def _add_variables(self) -> None:
         # Initialize variable dictionaries
         self.var = {}
@@ -178,15 +689,27 @@ class Optimization_model:
                 name="battery_scaling", lb=0, ub=GRB.INFINITY
             )
 
+        # Variables and bounds that the reduction leaves out or changes
+        reduction = self.reduction
+        gen_hours = set(reduction.gen_hours)
+        deviations = reduction.deviations(self.parameters)
+        if self.parameters.storage_exists:
+            bounds = {
+                name: reduction.bounds(self.parameters, name)
+                for name in ["discharge", "charge", "SOC"]
+            }
+
         # Add variables for each time step
         for t in range(self.parameters.T):
             # Basic variables
-            self.var["load"][t] = self.model.addVar(
-                name=f"load_{t}", lb=0, ub=self.parameters.load_max
-            )
-            self.var["gen"][t] = self.model.addVar(
-                name=f"gen_{t}", lb=0, ub=self.parameters.pv_max[t]
-            )
+            if not reduction.fixed_load:
+                self.var["load"][t] = self.model.addVar(
+                    name=f"load_{t}", lb=0, ub=self.parameters.load_max
+                )
+            if t in gen_hours:
+                self.var["gen"][t] = self.model.addVar(
+                    name=f"gen_{t}", lb=0, ub=self.parameters.pv_max[t]
+                )
             self.var["import"][t] = self.model.addVar(
                 name=f"import_{t}", lb=0, ub=self.parameters.import_max
             )
@@ -195,7 +718,7 @@ class Optimization_model:
             )
 
             # Desired load variables if relevant
-            if self.parameters.desired_load_exists:
+            if deviations:
                 self.var["pos_diff_load"][t] = self.model.addVar(
                     name=f"pos_diff_load_{t}", lb=0
                 )
@@ -205,23 +728,18 @@ class Optimization_model:
 
             # Storage variables if relevant
             if self.parameters.storage_exists:
-                self.var["discharge"][t] = self.model.addVar(
-                    name=f"discharge_{t}",
-                    lb=0,
-                )
-                self.var["charge"][t] = self.model.addVar(
-                    name=f"charge_{t}",
-                    lb=0,
-                )
-                self.var["SOC"][t] = self.model.addVar(
-                    name=f"SOC_{t}",
-                    lb=0,
-                )
+                for name in ["discharge", "charge", "SOC"]:
+                    self.var[name][t] = self.model.addVar(
+                        name=f"{name}_{t}",
+                        lb=bounds[name][0][t],
+                        ub=bounds[name][1][t],
+                    )
 
         # Update model to integrate new variables
         self.model.update()
         self.status += "\nVariables added"
 
+    @instrumented("add_objective")
     def _add_objective(self) -> None:
         # Setting the objective function
         self.obj = self.model.setObjective(
@@ -231,7 +749,7 @@ class Optimization_model:
                 + (
                     self.parameters.diff_penalty
                     * (self.var["pos_diff_load"][t] + self.var["neg_diff_load"][t])
-                    if self.parameters.desired_load_exists
+                    if self.reduction.deviations(self.parameters)
                     else 0
                 )
                 for t in range(self.parameters.T)
@@ -248,25 +766,34 @@ class Optimization_model:
         self.model.update()
         self.status += "\nObjective added"
 
+    @instrumented("add_constraints")
     def _add_constraints(self) -> None:
         # Initialize constraint dictionary
         self.constr = {}
 
-        # Energy balance constraint
+        reduction = self.reduction
+        deviations = reduction.deviations(self.parameters)
+
+        # Energy balance constraint, with the desired load if it is substituted
+        # and without PV production in hours without it
         for t in range(self.parameters.T):
             self.constr[f"energy_balance_{t}"] = self.model.addLConstr(
-                self.var["load"][t]
+                (
+                    self.parameters.desired_load[t]
+                    if reduction.fixed_load
+                    else self.var["load"][t]
+                )
                 + self.var["export"][t]
                 + (self.var["charge"][t] if self.parameters.storage_exists else 0),
                 GRB.EQUAL,
-                self.var["gen"][t]
+                self.var["gen"].get(t, 0)
                 + self.var["import"][t]
                 + (self.var["discharge"][t] if self.parameters.storage_exists else 0),
                 name=f"energy_balance_{t}",
             )
 
         # Minimum combined load constraint if relevant
-        if self.parameters.min_combined_load_exists:
+        if self.parameters.min_combined_load_exists and not reduction.fixed_load:
             self.constr["minimum_combined_load"] = self.model.addLConstr(
                 gp.quicksum(self.var["load"][t] for t in range(self.parameters.T)),
                 GRB.GREATER_EQUAL,
@@ -275,7 +802,7 @@ class Optimization_model:
             )
 
         # Desired load profile constraints if relevant
-        if self.parameters.desired_load_exists:
+        if deviations:
             for t in range(self.parameters.T):
                 self.constr[f"pos_diff_load_{t}"] = self.model.addLConstr(
                     self.var["pos_diff_load"][t],
@@ -292,29 +819,49 @@ class Optimization_model:
 
         # Storage constraints if relevant
         if self.parameters.storage_exists:
-            # Initial and final SOC constraints
-            self.constr["initial_soc"] = self.model.addLConstr(
-                self.var["SOC"][0],
-                GRB.EQUAL,
-                self.parameters.initial_soc
-                * (
-                    self.var["battery_scaling"]
-                    if self.parameters.battery_size_variable
-                    else 1
-                ),
-                name="initial_soc",
-            )
-            self.constr["final_soc"] = self.model.addLConstr(
-                self.var["SOC"][self.parameters.T - 1],
-                GRB.EQUAL,
-                self.parameters.final_soc
-                * (
-                    self.var["battery_scaling"]
-                    if self.parameters.battery_size_variable
-                    else 1
-                ),
-                name="final_soc",
-            )
+            # Initial and final SOC constraints, bounds of the SOC if the
+            # battery size is fixed and the model is reduced
+            if not reduction.storage_bounds:
+                self.constr["initial_soc"] = self.model.addLConstr(
+                    self.var["SOC"][0],
+                    GRB.EQUAL,
+                    self.parameters.initial_soc
+                    * (
+                        self.var["battery_scaling"]
+                        if self.parameters.battery_size_variable
+                        else 1
+                    ),
+                    name="initial_soc",
+                )
+                self.constr["final_soc"] = self.model.addLConstr(
+                    self.var["SOC"][self.parameters.T - 1],
+                    GRB.EQUAL,
+                    self.parameters.final_soc
+                    * (
+                        self.var["battery_scaling"]
+                        if self.parameters.battery_size_variable
+                        else 1
+                    ),
+                    name="final_soc",
+                )
+
+                # Charge and discharge capacity constraints of the first hour
+                if self.parameters.first_hour_storage_limits:
+                    for name, capacity in [
+                        ("charge", self.parameters.charging_capacity),
+                        ("discharge", self.parameters.discharging_capacity),
+                    ]:
+                        self.constr[f"{name}_capacity_0"] = self.model.addLConstr(
+                            self.var[name][0],
+                            GRB.LESS_EQUAL,
+                            capacity
+                            * (
+                                self.var["battery_scaling"]
+                                if self.parameters.battery_size_variable
+                                else 1
+                            ),
+                            name=f"{name}_capacity_0",
+                        )
 
             for t in range(1, self.parameters.T):
                 # SOC balance constraint
@@ -328,6 +875,9 @@ class Optimization_model:
                     name=f"soc_balance_{t}",
                 )
 
+                if reduction.storage_bounds:
+                    continue  # Capacities are bounds of the variables
+
                 # Charge and discharge capacity constraints
                 self.constr[f"charge_capacity_{t}"] = self.model.addLConstr(
                     self.var["charge"][t],
@@ -369,10 +919,409 @@ class Optimization_model:
         self.model.update()
         self.status += "\nConstraints added"
 
+    @instrumented("add_variables")
+    def _add_variables_matrix(self, form: Standard_form) -> None:
+        self.model.addMVar(form.n_vars, lb=form.lb, ub=form.ub, name=form.var_names())
+
+        # Update model to integrate new variables
+        self.model.update()
+
+        # Expose the same per-hour variable handles as the per-hour build
+        variables = self.model.getVars()
+        self.var = {}
+        for name in [
+            "load",
+            "gen",
+            "import",
+            "export",
+            "pos_diff_load",
+            "neg_diff_load",
+            "discharge",
+            "charge",
+            "SOC",
+        ]:
+            self.var[name] = (
+                {
+                    t: variables[i]
+                    for t, i in zip(
+                        form.var_hours[name].tolist(), form.var[name].tolist()
+                    )
+                }
+                if name in form.var
+                else {}
+            )
+        if self.parameters.battery_size_variable:
+            self.var["battery_scaling"] = variables[form.var["battery_scaling"][0]]
+        self.status += "\nVariables added"
+
+    @instrumented("add_objective")
+    def _add_objective_matrix(self, form: Standard_form) -> None:
+        self.model.setMObjective(None, form.obj, 0.0, sense=GRB.MINIMIZE)
+
+        # Update model to integrate new objective
+        self.model.update()
+        self.status += "\nObjective added"
+
+    @instrumented("add_constraints")
+    def _add_constraints_matrix(self, form: Standard_form) -> None:
+        constrs = self.model.addMConstr(
+            form.A, None, form.sense, form.rhs, name=form.constr_names()
+        ).tolist()
+
+        # Constraint dictionary in the same order as the per-hour build, which
+        # adds each group of families hour by hour
+        self.constr = {}
+        for group in [
+            ["energy_balance"],
+            ["minimum_combined_load"],
+            ["pos_diff_load", "neg_diff_load"],
+            ["initial_soc", "final_soc"],
+            ["soc_balance", "charge_capacity", "discharge_capacity", "soc_capacity"],
+        ]:
+            entries = []  # (hour, position in the group, name, row)
+            for position, family in enumerate(group):
+                if family not in form.constr:
+                    continue
+                rows = form.constr[family].tolist()
+                if form.constr_hours[family] is None:
+                    entries.append((-1, position, family, rows[0]))
+                else:
+                    hours = form.constr_hours[family].tolist()
+                    entries += [
+                        (t, position, f"{family}_{t}", row)
+                        for t, row in zip(hours, rows)
+                    ]
+            for _, _, name, row in sorted(entries):
+                self.constr[name] = constrs[row]
+
+        # Update model to integrate new constraints
+        self.model.update()
+        self.status += "\nConstraints added"
+
+    @instrumented("add_operating_limits")
+    def _add_operating_limits(self) -> None:
+        """Add the ramping, minimum power and minimum on/off time constraints.
+
+        Minimum power and minimum on/off times need an on/off decision per
+        hour (binary "<name>_on"). The "tight" formulation adds start-up and
+        shut-down indicators and bounds the starts (stops) within the minimum
+        on (off) time before each hour by the on (off) state. The "naive"
+        formulation instead forces the on/off state after each switch with a
+        big-M style sum and relaxes the ramp, start-up and shut-down limits by
+        the rated power when they do not apply. Both give the same optimum, but the LP
+        relaxation of the tight one is much stronger.
+        """
+        formulation = self.parameters.commitment_formulation
+        if formulation not in ["tight", "naive"]:
+            raise ValueError(f"Unknown commitment formulation '{formulation}'")
+        T = self.parameters.T
+        for name, limit in self.parameters.operating_limits().items():
+            p = self.var[name]
+            p_min, p_max = limit["min_power"], limit["max_power"]
+            ramp_up, ramp_down = limit["ramp_up"], limit["ramp_down"]
+            min_on, min_off = limit["min_on_time"], limit["min_off_time"]
+            ramping = ramp_up < p_max or ramp_down < p_max
+
+            if p_min <= 0 and min_on <= 1 and min_off <= 1:
+                # Ramping alone needs no on/off decisions
+                for t in range(1, T):
+                    self.constr[f"{name}_ramp_up_{t}"] = self.model.addLConstr(
+                        p[t] - p[t - 1], GRB.LESS_EQUAL, ramp_up, f"{name}_ramp_up_{t}"
+                    )
+                    self.constr[f"{name}_ramp_down_{t}"] = self.model.addLConstr(
+                        p[t - 1] - p[t],
+                        GRB.LESS_EQUAL,
+                        ramp_down,
+                        f"{name}_ramp_down_{t}",
+                    )
+                continue
+
+            u = {
+                t: self.model.addVar(vtype=GRB.BINARY, name=f"{name}_on[{t}]")
+                for t in range(T)
+            }
+            self.var[f"{name}_on"] = u
+            constrs = {}  # Constraints of the appliance by name
+            for t in range(T):
+                constrs[f"{name}_max_power_{t}"] = p[t] <= p_max * u[t]
+                if p_min > 0:
+                    constrs[f"{name}_min_power_{t}"] = p[t] >= p_min * u[t]
+
+            if formulation == "tight":
+                start = {
+                    t: self.model.addVar(vtype=GRB.BINARY, name=f"{name}_start[{t}]")
+                    for t in range(1, T)
+                }
+                stop = {
+                    t: self.model.addVar(vtype=GRB.BINARY, name=f"{name}_stop[{t}]")
+                    for t in range(1, T)
+                }
+                for t in range(1, T):
+                    constrs[f"{name}_switch_{t}"] = (
+                        u[t] - u[t - 1] == start[t] - stop[t]
+                    )
+                    constrs[f"{name}_start_or_stop_{t}"] = start[t] + stop[t] <= 1
+                    if min_on > 1:
+                        constrs[f"{name}_min_on_{t}"] = (
+                            gp.quicksum(
+                                start[k] for k in range(max(1, t - min_on + 1), t + 1)
+                            )
+                            <= u[t]
+                        )
+                    if min_off > 1:
+                        constrs[f"{name}_min_off_{t}"] = (
+                            gp.quicksum(
+                                stop[k] for k in range(max(1, t - min_off + 1), t + 1)
+                            )
+                            <= 1 - u[t]
+                        )
+                    if ramping:
+                        # A start (stop) may jump to (from) the minimum power
+                        constrs[f"{name}_ramp_up_{t}"] = (
+                            p[t] - p[t - 1]
+                            <= ramp_up * u[t - 1] + max(p_min, ramp_up) * start[t]
+                        )
+                        constrs[f"{name}_ramp_down_{t}"] = (
+                            p[t - 1] - p[t]
+                            <= ramp_down * u[t] + max(p_min, ramp_down) * stop[t]
+                        )
+            else:
+                for t in range(1, T):
+                    # After a start (stop) the next hours are on (off)
+                    on_hours = range(t, min(T, t + max(min_on, 1)))
+                    off_hours = range(t, min(T, t + max(min_off, 1)))
+                    if min_on > 1:
+                        constrs[f"{name}_min_on_{t}"] = gp.quicksum(
+                            u[k] for k in on_hours
+                        ) >= len(on_hours) * (u[t] - u[t - 1])
+                    if min_off > 1:
+                        constrs[f"{name}_min_off_{t}"] = gp.quicksum(
+                            1 - u[k] for k in off_hours
+                        ) >= len(off_hours) * (u[t - 1] - u[t])
+                    if ramping:
+                        # Ramp limits while on, relaxed by the rated power
+                        constrs[f"{name}_ramp_up_{t}"] = p[t] - p[
+                            t - 1
+                        ] <= ramp_up + p_max * (1 - u[t - 1])
+                        constrs[f"{name}_ramp_down_{t}"] = p[t - 1] - p[
+                            t
+                        ] <= ramp_down + p_max * (1 - u[t])
+                        # Start-up and shut-down limits, relaxed unless switching
+                        constrs[f"{name}_start_up_{t}"] = p[t] <= max(
+                            p_min, ramp_up
+                        ) + p_max * (1 - u[t] + u[t - 1])
+                        constrs[f"{name}_shut_down_{t}"] = p[t - 1] <= max(
+                            p_min, ramp_down
+                        ) + p_max * (1 - u[t - 1] + u[t])
+
+            for constr_name, constr in constrs.items():
+                self.constr[constr_name] = self.model.addLConstr(
+                    constr, name=constr_name
+                )
+
+        # Update model to integrate new constraints
+        self.model.update()
+
+
+def _family(name: str) -> tuple:
+    # Family and hour of a constraint name ("energy_balance_3"), the hour is
+    # None for single constraints such as "initial_soc"
+    family, _, hour = name.rpartition("_")
+    if not hour.isdigit():
+        return name, None
+    return family, int(hour)
+
 
 # Testing
 if __name__ == "__main__":
+    import itertools
+
     model = Optimization_model()
     print(model.status)
     model.load_data("question_1a")
     print(model.status)
+
+    # The vectorized build must give the same model as the per-hour build
+    def model_structure(model: gp.Model) -> tuple:
+        variables = {var.VarName: (var.LB, var.UB, var.Obj) for var in model.getVars()}
+        constraints = {}
+        for constr in model.getConstrs():
+            row = model.getRow(constr)
+            constraints[constr.ConstrName] = (
+                {row.getVar(i).VarName: row.getCoeff(i) for i in range(row.size())},
+                constr.Sense,
+                constr.RHS,
+            )
+        return variables, constraints
+
+    for question in ["1a", "1b", "1c", "2b"]:
+        for diff_penalty, reduce, first_hour in itertools.product(
+            [GRB.INFINITY, 1.75], [False, True], [False, True]
+        ):
+            builds = []
+            for vectorized in [False, True]:
+                model = Optimization_model()
+                model.load_data(f"question_{question}")
+                if question == "2b":
+                    model.set_battery_size_as_variable()
+                    model.parameters.battery_cost = 5
+                model.parameters.diff_penalty = diff_penalty
+                model.parameters.first_hour_storage_limits = first_hour
+                model.create_model(vectorized=vectorized, reduce=reduce)
+                model.model.Params.OutputFlag = 0
+                model.optimize()
+                builds.append(model)
+            per_hour, matrix = builds
+            assert model_structure(per_hour.model) == model_structure(matrix.model)
+            assert list(per_hour.constr) == list(matrix.constr)
+            assert np.isclose(per_hour.model.ObjVal, matrix.model.ObjVal)
+        print(f"question_{question}: vectorized build matches per-hour build")
+
+    # The parametric analysis must give the objective of a grid of solves and
+    # leave the model as it was
+    for question, parameter, low, high in [
+        ("1b", "diff_penalty", 0, 5),
+        ("2b", "battery_cost", 3, 10),
+    ]:
+        model = Optimization_model()
+        model.load_data(f"question_{question}")
+        if question == "2b":
+            model.set_battery_size_as_variable()
+            model.parameters.battery_cost = 5
+        model.create_model(vectorized=True)
+        model.model.Params.OutputFlag = 0
+        model.optimize()
+        objective_value = model.model.ObjVal
+        model.model.Params.OptimalityTol = 1e-7
+        curve = model.parametric(parameter, low, high)
+        assert model.model.Params.OptimalityTol == 1e-7
+        grid = np.linspace(low, high, 50)
+        model.optimize()
+        assert np.isclose(model.model.ObjVal, objective_value)
+        model.model.Params.Method = 1  # Solver settings of the caller are kept
+        table = model.sweep([{parameter: value} for value in grid])
+        assert model.model.Params.Method == 1
+        assert np.allclose(
+            np.interp(grid, curve["breakpoints"], curve["objective_value"]),
+            table["objective_value"],
+        )
+        print(
+            f"question_{question}: {parameter} curve has {len(curve['slope'])} "
+            f"pieces from {curve['solves']} solves"
+        )
+
+    # Scenarios may override different parameters, the table holds the values
+    # in effect for each scenario
+    model = Optimization_model()
+    model.load_data("question_1b")
+    model.create_model()
+    model.model.Params.OutputFlag = 0
+    price = model.parameters.import_price
+    table = model.sweep([{"diff_penalty": 1.0}, {"import_price": 2 * price}])
+    assert np.array_equal(table["diff_penalty"], [1.0, 1.0])
+    assert np.array_equal(table["import_price"], [price, 2 * price])
+    expected = Optimization_model()
+    expected.load_data("question_1b")
+    expected.parameters = expected.parameters.copy(
+        diff_penalty=1.0, import_price=2 * price
+    )
+    expected.create_model()
+    expected.model.Params.OutputFlag = 0
+    assert np.isclose(table["objective_value"][1], expected.solve()["objective_value"])
+    print("question_1b: sweep over scenarios with different overrides")
+
+    # The reduced model gives the results and duals of the full model
+    for question, diff_penalty, first_hour in itertools.product(
+        ["1a", "1b", "1c", "2b"], [GRB.INFINITY, 1.75], [False, True]
+    ):
+        models, results = [], []
+        for reduce in [False, True]:
+            model = Optimization_model()
+            model.load_data(f"question_{question}")
+            model.parameters.diff_penalty = diff_penalty
+            model.parameters.first_hour_storage_limits = first_hour
+            model.create_model(reduce=reduce)
+            model.model.Params.OutputFlag = 0
+            models.append(model)
+            results.append(model.solve())
+        full, reduced = results
+        removed = models[1].reduction.removed(models[1].parameters)
+        assert models[0].model.NumVars - models[1].model.NumVars == removed["variables"]
+        assert (
+            models[0].model.NumConstrs - models[1].model.NumConstrs
+            == removed["constraints"]
+        )
+        assert np.isclose(full["objective_value"], reduced["objective_value"])
+        for name in Optimization_model.result_series:
+            assert np.allclose(full[name], reduced[name])
+        assert full["duals"].keys() == reduced["duals"].keys()
+        assert np.allclose(
+            [full["duals"][name] for name in full["duals"]],
+            [reduced["duals"][name] for name in full["duals"]],
+        )
+        duals = models[1].get_duals()
+        assert duals.keys() == models[0].get_duals().keys()
+    print(
+        f"question_{question}: reduced model removes {removed['variables']} variables "
+        f"and {removed['constraints']} constraints with the same results and duals"
+    )
+
+    # Updates of a reduced model match a full model built with the new values,
+    # updates that change the reduction are rejected
+    reduced = Optimization_model()
+    reduced.load_data("question_2b")
+    reduced.create_model(reduce=True)
+    reduced.model.Params.OutputFlag = 0
+    updates = {
+        "import_price": 1.2 * reduced.parameters.import_price,
+        "desired_load": 0.9 * reduced.parameters.desired_load,
+        "initial_soc": 0.5 * reduced.parameters.initial_soc,
+        "final_soc": 0.5 * reduced.parameters.final_soc,
+    }
+    reduced.update_parameters(**updates)
+    full = Optimization_model()
+    full.parameters = reduced.parameters.copy()
+    full.create_model()
+    full.model.Params.OutputFlag = 0
+    assert np.isclose(
+        reduced.solve()["objective_value"], full.solve()["objective_value"]
+    )
+    try:
+        reduced.update_parameters(pv_max=reduced.parameters.pv_max + 0.1)
+        raise AssertionError("Updates that change the reduction must be rejected")
+    except ValueError as error:
+        print("Rejected:", error)
+
+    # The tight and naive commitment formulations give the same optimum, and
+    # the LP relaxation of the tight one is at least as strong
+    bounds = {}
+    for formulation in ["tight", "naive"]:
+        model = Optimization_model()
+        model.load_data("question_1c")
+        model.parameters.diff_penalty = 1.75
+        model.parameters.load_min = 0.4 * model.parameters.load_max
+        model.parameters.load_ramp_up = 0.3 * model.parameters.load_max
+        model.parameters.load_ramp_down = 0.3 * model.parameters.load_max
+        model.parameters.min_on_time = 3
+        model.parameters.min_off_time = 3
+        model.parameters.pv_min_power = 0.2 * model.parameters.pv_capacity
+        model.parameters.commitment_formulation = formulation
+        for vectorized in [False, True]:
+            model.create_model(vectorized=vectorized)
+            model.model.Params.OutputFlag = 0
+            results = model.solve()
+            relaxation = model.model.relax()
+            relaxation.optimize()
+            bounds.setdefault(
+                formulation, (results["objective_value"], relaxation.ObjVal)
+            )
+        on = results["load_on"] > 0.5
+        assert np.all(results["load"][~on] < 1e-6)
+        assert np.all(results["load"][on] >= model.parameters.load_min - 1e-6)
+    assert np.isclose(bounds["tight"][0], bounds["naive"][0])
+    assert bounds["tight"][1] >= bounds["naive"][1] - 1e-9
+    print(
+        f"question_1c with operating limits: objective {bounds['tight'][0]:.4f}, "
+        f"LP relaxation {bounds['tight'][1]:.4f} (tight) "
+        f"and {bounds['naive'][1]:.4f} (naive)"
+    )
@@ -1,7 +1,9 @@
-import os
-import json
-from gurobipy import GRB
+import copy
 import numpy as np
+from Assignment_1_Classes.Datasets import load_dataset
+
+# Value treated as infinite by the solvers, equal to gurobipy's GRB.INFINITY
+INFINITY = 1e100
 
 
 class Parameters:
@@ -14,6 +16,9 @@ class Parameters:
         self.min_combined_load_exists = False
         self.desired_load_exists = False
         self.battery_size_variable = False
+        # Limit charge and discharge by their capacities from the first hour,
+        # the assignment formulation limits them from the second hour
+        self.first_hour_storage_limits = False
 
         # Extract parameter selections from the data
         pv_data = self.data["appliance_params.json"]["DER"][0]
@@ -33,6 +38,27 @@ class Parameters:
         self.import_max = bus_data["max_import_kW"]  # Max import power
         self.export_max = bus_data["max_export_kW"]  # Max export power
 
+        # Operating limits of the PV and load, optional in the datasets
+        self.pv_capacity = pv_data["max_power_kW"]  # Rated PV power
+        self.pv_min_power = _optional(pv_data, "min_power_ratio", 0) * self.pv_capacity
+        self.pv_ramp_up = (
+            _optional(pv_data, "max_ramp_rate_up_ratio", 1) * self.pv_capacity
+        )  # Max increase of the PV production from one hour to the next
+        self.pv_ramp_down = (
+            _optional(pv_data, "max_ramp_rate_down_ratio", 1) * self.pv_capacity
+        )
+        self.load_min = _optional(load_data, "min_load_ratio", 0) * self.load_max
+        self.load_ramp_up = (
+            _optional(load_data, "max_ramp_rate_up_ratio", 1) * self.load_max
+        )
+        self.load_ramp_down = (
+            _optional(load_data, "max_ramp_rate_down_ratio", 1) * self.load_max
+        )
+        self.min_on_time = _optional(load_data, "min_on_time_h", 0)  # Hours
+        self.min_off_time = _optional(load_data, "min_off_time_h", 0)  # Hours
+        # Unit commitment constraints of the on/off decisions, "tight" or "naive"
+        self.commitment_formulation = "tight"
+
         # Price parameters
         self.electricity_price = np.array(bus_data["energy_price_DKK_per_kWh"])
         self.import_price = (
@@ -43,7 +69,7 @@ class Parameters:
         )  # Revenue for export
 
         # Desired load structure parameters
-        self.diff_penalty = GRB.INFINITY  # Penalty for deviation from desired load
+        self.diff_penalty = INFINITY  # Penalty for deviation from desired load
         load_preferences = usage_data["load_preferences"][0]
         if load_preferences["min_total_energy_per_day_hour_equivalent"] is not None:
             self.min_combined_load_exists = True
@@ -81,22 +107,338 @@ class Parameters:
                     * self.storage_capacity
                 )
 
+        # Per-asset parameters of all consumers and appliances
+        self._load_assets()
+
+        # Arrays are shared between copies of the parameters, so keep them read-only
+        for value in vars(self).values():
+            for array in value.values() if isinstance(value, dict) else [value]:
+                if isinstance(array, np.ndarray):
+                    array.flags.writeable = False
+
+    def _load_assets(self) -> None:
+        """Extract all consumers, buses and appliances as per-asset arrays.
+
+        The scalar parameters above only describe the first appliance of each
+        type. The tables below cover every consumer and appliance in the
+        dataset, each one a dict of arrays indexed by asset (and time step).
+        """
+        appliances = self.data["appliance_params.json"]
+        buses = self.data["bus_params.json"]
+        usage = {
+            _consumer_id(record): record
+            for record in self.data["usage_preferences.json"]
+        }
+
+        # Consumers and the appliances they own
+        if "consumer_params.json" in self.data:
+            consumers = self.data["consumer_params.json"]
+        else:  # A single consumer owning all appliances on the first bus
+            consumers = [
+                {
+                    "consumer_id": _consumer_id(self.data["usage_preferences.json"][0]),
+                    "connection_bus": buses[0].get("bus_ID"),
+                    "list_appliances": [
+                        appliance[f"{kind}_id"]
+                        for kind in ["DER", "load", "storage"]
+                        for appliance in appliances.get(kind) or []
+                    ],
+                }
+            ]
+        owners = {}
+        for c, consumer in enumerate(consumers):
+            for entry in consumer["list_appliances"]:
+                for appliance_id in entry.split(","):  # Tolerate "A,B" entries
+                    owners[appliance_id.strip()] = c
+
+        def owner(appliance_id: str) -> int:
+            if appliance_id in owners:
+                return owners[appliance_id]
+            if len(consumers) == 1:
+                return 0
+            raise ValueError(f"Appliance '{appliance_id}' has no owner")
+
+        bus_index = {bus.get("bus_ID"): b for b, bus in enumerate(buses)}
+        self.consumers = {
+            "id": np.array([_consumer_id(consumer) for consumer in consumers]),
+            "bus": np.array(
+                [bus_index[consumer["connection_bus"]] for consumer in consumers],
+                dtype=int,
+            ),
+        }
+        self.N = len(consumers)  # Number of consumers
+
+        # Buses with their limits and prices
+        electricity_price = np.array(
+            [bus["energy_price_DKK_per_kWh"] for bus in buses], dtype=float
+        )
+        self.buses = {
+            "id": np.array([bus.get("bus_ID") for bus in buses]),
+            "import_max": np.array([bus["max_import_kW"] for bus in buses], float),
+            "export_max": np.array([bus["max_export_kW"] for bus in buses], float),
+            "import_price": electricity_price
+            + np.array([[bus["import_tariff_DKK/kWh"]] for bus in buses]),
+            "export_price": electricity_price
+            - np.array([[bus["export_tariff_DKK/kWh"]] for bus in buses]),
+        }
+
+        # DERs with their production profiles
+        production = {}
+        for record in self.data["DER_production.json"]:
+            production.setdefault(_consumer_id(record), []).append(record)
+        der_list = appliances["DER"]
+        der_owner = np.array([owner(der["DER_id"]) for der in der_list], dtype=int)
+        self.ders = {
+            "id": np.array([der["DER_id"] for der in der_list]),
+            "owner": der_owner,
+            "pv_max": np.array(
+                [
+                    der["max_power_kW"]
+                    * _production_profile(
+                        production.get(self.consumers["id"][c], []), der
+                    )
+                    for der, c in zip(der_list, der_owner)
+                ]
+            ).reshape(len(der_list), self.T),
+        }
+
+        # Loads with their usage preferences
+        load_list = appliances["load"]
+        load_owner = np.array([owner(load["load_id"]) for load in load_list], int)
+        load_max = np.array([load["max_load_kWh_per_hour"] for load in load_list])
+        preferences = [
+            _find(
+                usage[self.consumers["id"][c]]["load_preferences"],
+                "load_id",
+                load["load_id"],
+            )
+            for load, c in zip(load_list, load_owner)
+        ]
+        min_energy = [
+            preference and preference["min_total_energy_per_day_hour_equivalent"]
+            for preference in preferences
+        ]
+        profiles = [
+            preference and preference["hourly_profile_ratio"]
+            for preference in preferences
+        ]
+        self.loads = {
+            "id": np.array([load["load_id"] for load in load_list]),
+            "owner": load_owner,
+            "load_max": load_max,
+            "min_combined_load_exists": np.array([e is not None for e in min_energy]),
+            "min_combined_load": np.array([0.0 if e is None else e for e in min_energy])
+            * load_max,
+            "desired_load_exists": np.array([p is not None for p in profiles]),
+            "desired_load": np.array(
+                [np.zeros(self.T) if p is None else p for p in profiles], dtype=float
+            ).reshape(len(load_list), self.T)
+            * load_max[:, None],
+        }
+
+        # Storages with their initial and final state of charge
+        storage_list = appliances.get("storage") or []
+        storage_owner = np.array([owner(s["storage_id"]) for s in storage_list], int)
+        soc_preferences = [
+            _find(
+                usage[self.consumers["id"][c]]["storage_preferences"],
+                "storage_id",
+                storage["storage_id"],
+            )
+            for storage, c in zip(storage_list, storage_owner)
+        ]
+        if None in soc_preferences:
+            raise ValueError("Every storage needs storage preferences")
+        capacity = np.array(
+            [storage["storage_capacity_kWh"] for storage in storage_list], dtype=float
+        )
+
+        def storage_values(key: str) -> np.ndarray:
+            return np.array([storage[key] for storage in storage_list], dtype=float)
+
+        self.storages = {
+            "id": np.array([storage["storage_id"] for storage in storage_list]),
+            "owner": storage_owner,
+            "storage_capacity": capacity,
+            "charging_efficiency": storage_values("charging_efficiency"),
+            "discharging_efficiency": storage_values("discharging_efficiency"),
+            "charging_capacity": storage_values("max_charging_power_ratio") * capacity,
+            "discharging_capacity": storage_values("max_discharging_power_ratio")
+            * capacity,
+            "initial_soc": np.array(
+                [p["initial_soc_ratio"] for p in soc_preferences], dtype=float
+            )
+            * capacity,
+            "final_soc": np.array(
+                [p["final_soc_ratio"] for p in soc_preferences], dtype=float
+            )
+            * capacity,
+        }
+
+    def operating_limits(self) -> dict:
+        """Operating limits that constrain the dispatch of the PV and load.
+
+        Returns:
+            dict: For "gen" (PV) and "load", if they have any limit that can
+                bind, a dict with "min_power", "max_power", "ramp_up",
+                "ramp_down" (kW and kW per hour), "min_on_time" and
+                "min_off_time" (hours).
+        """
+        limits = {
+            "gen": {
+                "min_power": self.pv_min_power,
+                "max_power": self.pv_capacity,
+                "ramp_up": self.pv_ramp_up,
+                "ramp_down": self.pv_ramp_down,
+                "min_on_time": 0,
+                "min_off_time": 0,
+            },
+            "load": {
+                "min_power": self.load_min,
+                "max_power": self.load_max,
+                "ramp_up": self.load_ramp_up,
+                "ramp_down": self.load_ramp_down,
+                "min_on_time": self.min_on_time,
+                "min_off_time": self.min_off_time,
+            },
+        }
+        return {
+            name: limit
+            for name, limit in limits.items()
+            if limit["min_power"] > 0
+            or limit["ramp_up"] < limit["max_power"]
+            or limit["ramp_down"] < limit["max_power"]
+            or limit["min_on_time"] > 1
+            or limit["min_off_time"] > 1
+        }
+
+    def consumer_subset(self, consumers) -> "Parameters":
+        """Create a copy of the parameters with only some of the consumers.
+
+        Only the appliances owned by the selected consumers are kept, all
+        buses are kept. The scalar parameters of the first appliances are not
+        changed.
+
+        Args:
+            consumers: Index or indices of the consumers to keep.
+
+        Returns:
+            Parameters: The copy restricted to the selected consumers.
+        """
+        consumers = np.atleast_1d(consumers)
+        new_index = np.full(self.N, -1)
+        new_index[consumers] = np.arange(len(consumers))
+
+        def subset(table: dict) -> dict:
+            keep = new_index[table["owner"]] >= 0
+            table = {key: value[keep] for key, value in table.items()}
+            table["owner"] = new_index[table["owner"]]
+            return table
+
+        return self.copy(
+            N=len(consumers),
+            consumers={key: value[consumers] for key, value in self.consumers.items()},
+            ders=subset(self.ders),
+            loads=subset(self.loads),
+            storages=subset(self.storages),
+        )
+
+    def consumer_subsets(self) -> list:
+        """Create one copy of the parameters per consumer.
+
+        Gives consumer_subset(k) for every consumer k, but the appliance
+        tables are sorted by owner once instead of being scanned for every
+        consumer, so the split scales to many consumers.
+
+        Returns:
+            list: Parameters restricted to each consumer, in consumer order.
+        """
+        tables = {}
+        for name in ["ders", "loads", "storages"]:
+            table = getattr(self, name)
+            order = np.argsort(table["owner"], kind="stable")
+            # Rows of consumer k are order[bounds[k] : bounds[k + 1]]
+            bounds = np.searchsorted(table["owner"][order], np.arange(self.N + 1))
+            tables[name] = (table, order, bounds)
+
+        subsets = []
+        for k in range(self.N):
+            overrides = {}
+            for name, (table, order, bounds) in tables.items():
+                rows = order[bounds[k] : bounds[k + 1]]
+                overrides[name] = {key: value[rows] for key, value in table.items()}
+                overrides[name]["owner"] = np.zeros(len(rows), dtype=int)
+            subsets.append(
+                self.copy(
+                    N=1,
+                    consumers={
+                        key: value[[k]] for key, value in self.consumers.items()
+                    },
+                    **overrides,
+                )
+            )
+        return subsets
+
     def load_datasets(self, dataset_folder: str) -> dict:
         """Load and combine all datasets for a given question.
 
+        Datasets are parsed and validated once per folder and then served from
+        a cache until one of the files changes, see Datasets.load_dataset.
+        Hourly profiles can be stored as memory-mapped binary columns instead
+        of JSON lists, see Datasets.convert_to_columns.
+
         Args:
             dataset_folder (str): question folder name.
 
         Returns:
             dict: Combined datasets from the specified question folder.
         """
-        base_path = os.path.join("data", dataset_folder)
-        data = {}
+        return load_dataset(dataset_folder)
+
+    def copy(self, **overrides) -> "Parameters":
+        """Create a shallow copy of the parameters with some values replaced.
+
+        The dataset and all arrays are shared with the original, so the copy is
+        cheap compared to loading the parameters again.
+
+        Args:
+            **overrides: New values for attributes of the parameters.
+
+        Returns:
+            Parameters: The copy with the overrides applied.
+        """
+        parameters = copy.copy(self)
+        for name, value in overrides.items():
+            setattr(parameters, name, value)
+        return parameters
+
+
+def _consumer_id(record) -> str:
+    # The datasets use both spellings of the consumer id key
+    return record.get("consumer_id", record.get("consumer_ID"))
+
+
+def _optional(record, key: str, default: float) -> float:
+    # Value of an optional field, the default if it is missing or null
+    value = record.get(key)
+    return default if value is None else value
+
+
+def _find(records, key: str, value: str):
+    # Record with the given id, or None if there are no such records
+    for record in records or []:
+        if record.get(key) == value:
+            return record
+    return None
 
-        for file_path in os.listdir(base_path):
-            full_path = os.path.join(base_path, file_path)
-            if file_path.endswith(".json"):
-                with open(full_path, "r") as f:
-                    data[file_path] = json.load(f)
 
-        return data
+def _production_profile(candidates: list, der) -> np.ndarray:
+    # Production profile of a DER among the profiles of its consumer, matched
+    # by DER id, then by DER type, and finally the only profile given
+    for key, value in [("DER_id", der["DER_id"]), ("DER_type", der.get("DER_type"))]:
+        matches = [r for r in candidates if r.get(key) == value]
+        if matches:
+            return np.asarray(matches[0]["hourly_profile_ratio"])
+    if len(candidates) == 1:
+        return np.asarray(candidates[0]["hourly_profile_ratio"])
+    raise ValueError(f"No production profile for DER '{der['DER_id']}'")
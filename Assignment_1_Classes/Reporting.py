@@ -0,0 +1,202 @@
+"""Figures of the results, with matplotlib imported only when drawing one."""
+
+import os
+
+# Show figures in a window, write them to files or skip them
+MODES = ["show", "files", "off"]
+
+
+class Report:
+    """Draw the figures of the analysis.
+
+    matplotlib is imported when the first figure is drawn, so a report in
+    "off" mode never imports it. In "files" mode the figures are written to
+    numbered PNG files with the non-interactive Agg backend, which needs no
+    display.
+    """
+
+    def __init__(self, mode: str = "show", folder: str = "figures"):
+        """
+        Args:
+            mode (str): One of MODES.
+            folder (str): Output folder of the "files" mode.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown report mode '{mode}', use one of {MODES}")
+        self.mode = mode
+        self.folder = folder
+        self.files = []  # Paths of the written figures
+
+    def results(self, results: dict, parameters, name: str = "results") -> None:
+        """Hourly dispatch of get_results() with the price and desired load."""
+        if self.mode == "off":
+            return
+        plt = self._pyplot()
+        fig = plt.figure()
+        plt.plot(results["load"], label="Load (kW)", color="blue")
+        plt.plot(results["pv_prod"], label="PV Production (kW)", color="orange")
+        plt.plot(results["pv_curtailment"], label="PV Curtailment (kW)", color="red")
+        plt.plot(
+            results["import_grid"],
+            label="Import from Grid (kW)",
+            color="green",
+            linestyle="--",
+        )
+        plt.plot(
+            results["export_grid"],
+            label="Export to Grid (kW)",
+            color="red",
+            linestyle="--",
+        )
+        plt.plot(
+            parameters.electricity_price,
+            label="Electricity Price (DKK/kWh)",
+            color="purple",
+            linestyle=":",
+        )
+        if parameters.desired_load_exists:
+            plt.plot(
+                parameters.desired_load,
+                label="Desired Load (kW)",
+                color="brown",
+                linestyle="--",
+            )
+        if parameters.storage_exists:
+            plt.plot(
+                results["charge"],
+                label="Storage Charge (kW)",
+                color="cyan",
+                linestyle=":",
+            )
+            plt.plot(
+                results["discharge"],
+                label="Storage Discharge (kW)",
+                color="magenta",
+                linestyle=":",
+            )
+            plt.plot(
+                results["soc"], label="Storage SOC (kWh)", color="gray", linestyle="--"
+            )
+        plt.legend()
+        plt.xlabel("Time (hours)")
+        plt.ylabel("Power (kW) / Energy (kWh) / Price (DKK/kWh)")
+        plt.title("Energy System Optimization Results")
+        plt.grid()
+        self._finish(fig, name)
+
+    def hourly(self, series: dict, ylabel: str, title: str, name: str) -> None:
+        """One line per labelled hourly series, for example duals."""
+        if self.mode == "off":
+            return
+        plt = self._pyplot()
+        fig = plt.figure()
+        for label, values in series.items():
+            plt.plot(values, label=label)
+        plt.xlabel("Time (hours)")
+        plt.ylabel(ylabel)
+        plt.title(title)
+        plt.legend()
+        plt.grid()
+        self._finish(fig, name)
+
+    def curves(
+        self, curves: dict, xlabel: str, ylabel: str, title: str, name: str
+    ) -> None:
+        """One line per label of (x, y) values."""
+        if self.mode == "off":
+            return
+        plt = self._pyplot()
+        fig = plt.figure()
+        for label, (x, y) in curves.items():
+            plt.plot(x, y, label=label)
+        plt.xlabel(xlabel)
+        plt.ylabel(ylabel)
+        plt.title(title)
+        plt.grid()
+        plt.legend()
+        self._finish(fig, name)
+
+    def battery_curve(self, curve: dict, title: str, name: str) -> None:
+        """Battery size and objective value of parametric("battery_cost")."""
+        if self.mode == "off":
+            return
+        plt = self._pyplot()
+        fig, ax1 = plt.subplots()
+
+        color = "tab:blue"
+        ax1.set_xlabel("Battery Price")
+        ax1.set_ylabel("Battery Size", color=color)
+        ax1.stairs(
+            curve["battery_size"],
+            curve["breakpoints"],
+            color=color,
+            label="Battery Size",
+        )
+        ax1.tick_params(axis="y", labelcolor=color)
+
+        ax2 = ax1.twinx()
+        color = "tab:red"
+        ax2.set_ylabel("Objective Value", color=color)
+        ax2.plot(
+            curve["breakpoints"],
+            curve["objective_value"],
+            color=color,
+            label="Objective Value",
+        )
+        ax2.tick_params(axis="y", labelcolor=color)
+
+        fig.tight_layout()
+        plt.title(title)
+        self._finish(fig, name)
+
+    def _pyplot(self):
+        import matplotlib
+
+        if self.mode == "files":
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        return plt
+
+    def _finish(self, fig, name: str) -> None:
+        plt = self._pyplot()
+        if self.mode == "show":
+            plt.show()
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f"{len(self.files) + 1:02d}_{name}.png")
+        fig.savefig(path)
+        plt.close(fig)
+        self.files.append(path)
+
+
+# Testing
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    from Assignment_1_Classes.Optimization_model import Optimization_model
+
+    model = Optimization_model()
+    model.load_data("question_2b")
+    model.set_battery_size_as_variable()
+    model.parameters.battery_cost = 5
+    model.create_model()
+    model.model.Params.OutputFlag = 0
+    model.optimize()
+
+    # Solving and an "off" report do not import matplotlib
+    model.plot_results(Report("off"))
+    assert "matplotlib" not in sys.modules
+
+    with tempfile.TemporaryDirectory() as folder:
+        report = Report("files", folder)
+        model.plot_results(report)
+        report.battery_curve(
+            model.parametric(
+                "battery_cost", 3, 10, columns=("objective_value", "battery_size")
+            ),
+            "Battery Size and Objective Value vs Battery Price",
+            "battery_price",
+        )
+        assert sorted(os.listdir(folder)) == ["01_results.png", "02_battery_price.png"]
+        print("Figures written:", [os.path.basename(path) for path in report.files])
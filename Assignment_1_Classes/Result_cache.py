@@ -0,0 +1,259 @@
+"""Persistent cache of solve results keyed by a hash of the model inputs."""
+
+import os
+import glob
+import zipfile
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Increase when the format of the cached results changes
+CACHE_VERSION = 1
+
+
+class Result_cache:
+    """Size-bounded on-disk cache of get_results() dictionaries.
+
+    Entries are keyed by a SHA-256 hash of all parameter values (arrays by
+    dtype, shape and content) and stored as one .npz file each. Files are
+    written to a temporary file and renamed, so other processes never read a
+    partial entry, and an entry that cannot be read is removed and counted as
+    a miss. When the files exceed max_bytes, the least recently used entries
+    are removed. The most recently used entries are also kept in memory.
+    """
+
+    def __init__(
+        self, folder: str, max_bytes: int = 256 * 2**20, memory_entries: int = 128
+    ):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()  # Most recently used results in memory
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def key(self, parameters, namespace: str = "") -> str:
+        """Hash the effective parameters of a model.
+
+        Args:
+            parameters (Parameters): Parameters of the model.
+            namespace (str): Name of the model, so that different models with
+                the same parameters get different keys.
+
+        Returns:
+            str: Hexadecimal key.
+        """
+        digest = hashlib.sha256(f"{CACHE_VERSION}:{namespace}".encode())
+        _update_hash(
+            digest,
+            {name: value for name, value in vars(parameters).items() if name != "data"},
+        )
+        return digest.hexdigest()
+
+    def get(self, key: str) -> dict:
+        """Results stored under key, or None. Arrays are read-only."""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return _copy(self.memory[key])
+        path = self._path(key)
+        try:
+            with np.load(path) as stored:
+                results = _unflatten(stored)
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:  # Not stored, or removed by another process
+            self.misses += 1
+            return None
+        except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+            # A corrupt entry, for example of a writer that crashed before
+            # entries were renamed into place
+            _remove(path)
+            self.misses += 1
+            return None
+        self._remember(key, results)
+        self.hits += 1
+        return _copy(results)
+
+    def put(self, key: str, results: dict) -> None:
+        # Write to a temporary file first, so that other processes and threads
+        # never read a partial entry
+        temporary = os.path.join(
+            self.folder, f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with open(temporary, "wb") as file:
+            np.savez(file, **_flatten(results))
+        os.replace(temporary, self._path(key))
+        self._remember(key, _unflatten(_flatten(results)))
+        self._evict()
+
+    def clear(self) -> None:
+        for path in glob.glob(os.path.join(self.folder, "*.npz")) + glob.glob(
+            os.path.join(self.folder, "*.tmp")
+        ):
+            _remove(path)
+        self.memory.clear()
+
+    def stats(self) -> dict:
+        sizes = [os.path.getsize(path) for path in self._paths()]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, f"{key}.npz")
+
+    def _paths(self) -> list:
+        return glob.glob(os.path.join(self.folder, "*.npz"))
+
+    def _remember(self, key: str, results: dict) -> None:
+        self.memory[key] = results
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        # Remove the least recently used files until the cache fits
+        entries = []
+        for path in self._paths():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # Removed by another process
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            self.memory.pop(os.path.basename(path)[: -len(".npz")], None)
+            total -= size
+
+
+def _remove(path: str) -> None:
+    # Remove a file that another process may have removed already
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _update_hash(digest, value) -> None:
+    # Canonical encoding of parameter values, tagged by type
+    if isinstance(value, dict) or hasattr(value, "keys"):
+        digest.update(b"{")
+        for key in sorted(value):
+            digest.update(repr(key).encode())
+            _update_hash(digest, value[key])
+        digest.update(b"}")
+    elif isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        digest.update(f"array:{array.dtype.str}:{array.shape}:".encode())
+        digest.update(array.tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"[")
+        for item in value:
+            _update_hash(digest, item)
+        digest.update(b"]")
+    else:
+        if isinstance(value, np.generic):
+            value = value.item()
+        digest.update(f"{type(value).__name__}:{value!r};".encode())
+
+
+def _copy(results: dict) -> dict:
+    # New dictionaries around the shared read-only arrays
+    return {
+        key: dict(value) if key == "duals" else value for key, value in results.items()
+    }
+
+
+def _flatten(results: dict) -> dict:
+    # Results as named arrays, duals as parallel arrays of names and values
+    arrays = {}
+    for key, value in results.items():
+        if key == "duals":
+            arrays["duals.names"] = np.array(list(value), dtype=str)
+            arrays["duals.values"] = np.array(list(value.values()), dtype=float)
+        else:
+            arrays[key] = np.asarray(value)
+    return arrays
+
+
+def _unflatten(arrays) -> dict:
+    results = {}
+    for key in arrays.keys():
+        if key == "duals.names":
+            results["duals"] = dict(
+                zip(arrays["duals.names"].tolist(), arrays["duals.values"].tolist())
+            )
+        elif key != "duals.values":
+            value = arrays[key]
+            if value.ndim == 0:
+                results[key] = value.item()
+            else:
+                value.flags.writeable = False
+                results[key] = value
+    return results
+
+
+# Testing
+if __name__ == "__main__":
+    import time
+    import tempfile
+    import gurobipy as gp
+    from Assignment_1_Classes.Optimization_model import Optimization_model
+
+    env = gp.Env(params={"OutputFlag": 0})
+    with tempfile.TemporaryDirectory() as folder:
+        cache = Result_cache(folder)
+        for factor in [1.0, 1.5, 1.0]:
+            model = Optimization_model(env=env)
+            model.load_data("question_1c")
+            model.parameters.import_price = factor * model.parameters.import_price
+            start = time.perf_counter()
+            results = model.solve(cache)
+            print(
+                f"Price factor {factor}: {model.status.splitlines()[-1]} "
+                f"in {1e6 * (time.perf_counter() - start):.0f} us"
+            )
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+        print("Cache:", cache.stats())
+
+        # Hits survive a new cache on the same folder
+        model = Optimization_model(env=env)
+        model.load_data("question_1c")
+        model.parameters.import_price = 1.5 * model.parameters.import_price
+        cached = Result_cache(folder).get(
+            cache.key(model.parameters, "Optimization_model")
+        )
+        expected = model.solve()
+        assert np.isclose(cached["objective_value"], expected["objective_value"])
+        assert np.array_equal(cached["load"], expected["load"])
+        assert cached["duals"] == expected["duals"]
+
+        # Corrupt entries, such as a partial file of a writer that crashed, are
+        # removed and counted as misses
+        key = cache.key(model.parameters, "Optimization_model")
+        with open(cache._path(key), "rb") as file:
+            stored = file.read()
+        for corrupt in [stored[: len(stored) // 2], b"", b"not an npz file"]:
+            reader = Result_cache(folder)
+            with open(reader._path(key), "wb") as file:
+                file.write(corrupt)
+            assert reader.get(key) is None and reader.stats()["misses"] == 1
+            assert not os.path.exists(reader._path(key))
+            reader.put(key, expected)
+            assert Result_cache(folder).get(key)["duals"] == expected["duals"]
+        assert not glob.glob(os.path.join(folder, "*.tmp"))
+
+        # The least recently used entries are removed beyond max_bytes
+        small = Result_cache(folder, max_bytes=1)
+        small.put("x", expected)
+        assert small.stats()["entries"] == 0
+        print("Cached results match a new solve")
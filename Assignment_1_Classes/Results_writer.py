@@ -0,0 +1,169 @@
+"""Columnar on-disk storage of the results of many scenarios."""
+
+import os
+import glob
+import numpy as np
+
+# Tables of the store: one row per scenario, and one row per scenario and hour
+TABLES = ["scenarios", "hourly"]
+
+
+class Results_writer:
+    """Append scenario results as rows of two typed columnar tables.
+
+    The "scenarios" table has one row per scenario with the objective value,
+    the battery size, scalar overrides and the duals of single constraints.
+    The "hourly" table has one row per scenario and hour (columns "scenario"
+    and "t") with the hourly series, hourly overrides and the duals of each
+    hourly constraint family ("dual_<family>", NaN in hours without one).
+
+    Rows are buffered and written as numbered .npz chunks once the buffer
+    holds chunk_rows hourly rows, so memory use does not grow with the number
+    of scenarios. Read the tables back with read_results().
+    """
+
+    def __init__(self, folder: str, chunk_rows: int = 100000):
+        self.folder = folder
+        self.chunk_rows = chunk_rows
+        os.makedirs(folder, exist_ok=True)
+        if glob.glob(os.path.join(folder, "*.npz")):
+            raise ValueError(f"{folder} already holds results.")
+        self.buffer = {table: {} for table in TABLES}
+        self.schema = {table: None for table in TABLES}  # Columns of each table
+        self.buffered_rows = 0
+        self.chunks = 0
+        self.rows = 0
+
+    def __enter__(self) -> "Results_writer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def append(self, scenario: int, results: dict, overrides: dict = None) -> None:
+        """Append the results of one scenario.
+
+        Args:
+            scenario (int): Scenario id.
+            results (dict): Output of get_results(), with the "duals" of each
+                family as given by get_duals().
+            overrides (dict): Parameter overrides of the scenario, numbers or
+                hourly arrays.
+        """
+        T = len(results["load"])
+        scalars = {"scenario": scenario}
+        hourly = {"scenario": np.full(T, scenario), "t": np.arange(T)}
+        values = {
+            key: value
+            for key, value in results.items()
+            if key not in ["duals", "objective_value", "battery_size"]
+        }
+        values.update(overrides or {})
+        values.update(
+            {f"dual_{family}": dual for family, dual in results["duals"].items()}
+            if "duals" in results
+            else {}
+        )
+        scalars["objective_value"] = results["objective_value"]
+        scalars["battery_size"] = results["battery_size"]
+        for key, value in values.items():
+            if np.ndim(value) == 0:
+                scalars[key] = value
+            elif len(value) == T:
+                hourly[key] = value
+            else:
+                raise ValueError(f"Column '{key}' is neither a number nor hourly.")
+
+        for table, row in [("scenarios", scalars), ("hourly", hourly)]:
+            if self.schema[table] is None:
+                self.schema[table] = list(row)
+                self.buffer[table] = {key: [] for key in row}
+            elif set(row) != set(self.schema[table]):
+                raise ValueError(f"Scenario {scenario} has other {table} columns.")
+            for key, value in row.items():
+                self.buffer[table][key].append(np.atleast_1d(value))
+        self.buffered_rows += T
+        self.rows += 1
+        if self.buffered_rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        # Write the buffered rows of both tables as the next chunk
+        if self.buffered_rows == 0:
+            return
+        for table in TABLES:
+            np.savez(
+                os.path.join(self.folder, f"{table}-{self.chunks:05d}.npz"),
+                **{
+                    key: np.concatenate(values)
+                    for key, values in self.buffer[table].items()
+                },
+            )
+            for values in self.buffer[table].values():
+                values.clear()
+        self.chunks += 1
+        self.buffered_rows = 0
+
+    def close(self) -> None:
+        self.flush()
+
+
+def read_results(folder: str, table: str = "hourly", columns: list = None) -> dict:
+    """Read a table written by Results_writer.
+
+    Args:
+        folder (str): Folder of the results.
+        table (str): "scenarios" or "hourly".
+        columns (list): Columns to read, all columns if None.
+
+    Returns:
+        dict: One array per column over all rows of the table.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table '{table}', use one of {TABLES}")
+    chunks = [
+        np.load(path)
+        for path in sorted(glob.glob(os.path.join(folder, f"{table}-*.npz")))
+    ]
+    if not chunks:
+        return {}
+    if columns is None:
+        columns = chunks[0].files
+    return {
+        column: np.concatenate([chunk[column] for chunk in chunks])
+        for column in columns
+    }
+
+
+# Testing
+if __name__ == "__main__":
+    import tempfile
+    from Assignment_1_Classes.Optimization_model import Optimization_model
+
+    # A sweep written in small chunks must read back as the in-memory table
+    model = Optimization_model()
+    model.load_data("question_1c")
+    model.create_model()
+    model.model.Params.OutputFlag = 0
+    price = model.parameters.import_price
+    scenarios = [{"import_price": f * price} for f in np.linspace(0.5, 2, 7)]
+    with tempfile.TemporaryDirectory() as folder:
+        with Results_writer(folder, chunk_rows=50) as writer:
+            table = model.sweep(
+                scenarios, columns=("objective_value", "load", "duals"), writer=writer
+            )
+        scenario_table = read_results(folder, "scenarios")
+        hourly = read_results(
+            folder, "hourly", ["scenario", "t", "load", "dual_energy_balance"]
+        )
+        assert writer.chunks > 1
+        assert np.allclose(scenario_table["objective_value"], table["objective_value"])
+        assert np.allclose(hourly["load"].reshape(7, -1), table["load"])
+        assert np.allclose(
+            hourly["dual_energy_balance"].reshape(7, -1),
+            table["duals"]["energy_balance"],
+        )
+        print(
+            f"{writer.rows} scenarios in {writer.chunks} chunks, "
+            f"hourly columns: {sorted(read_results(folder).keys())}"
+        )
@@ -0,0 +1,136 @@
+"""Rolling horizon operation of the energy system on a single live model."""
+
+import time
+import numpy as np
+import gurobipy as gp
+from Assignment_1_Classes.Optimization_model import Optimization_model
+
+
+class Rolling_horizon:
+    """Re-plan the energy system every hour over a window that moves forward.
+
+    One Optimization_model with a horizon of the window length is built once.
+    At every step only the prices, PV bounds, desired load and the initial SOC
+    of the window are updated in place and the model is re-solved from the
+    previous basis. The first hour of each plan is executed and the SOC at the
+    end of that hour becomes the initial SOC of the next window. As that hour
+    is executed, its charge and discharge are limited by their capacities.
+    """
+
+    def __init__(self, dataset_folder: str, env: gp.Env = None):
+        self.model = Optimization_model(env=env)
+        self.model.load_data(dataset_folder)
+        self.model.parameters.first_hour_storage_limits = True
+        self.T = self.model.parameters.T  # Window length (hours)
+
+    def run(
+        self,
+        steps: int,
+        import_price: np.ndarray = None,
+        export_price: np.ndarray = None,
+        pv_max: np.ndarray = None,
+        desired_load: np.ndarray = None,
+    ) -> dict:
+        """Run the rolling horizon for a number of hourly steps.
+
+        The series must cover at least steps + T - 1 hours, where T is the
+        window length. Series that are not given repeat the daily profiles of
+        the dataset.
+
+        Args:
+            steps (int): Number of re-plans (executed hours).
+            import_price (np.ndarray): Import price per hour.
+            export_price (np.ndarray): Export price per hour.
+            pv_max (np.ndarray): PV forecast per hour.
+            desired_load (np.ndarray): Desired load per hour.
+
+        Returns:
+            dict: Executed hourly series, the objective value of every plan and
+                the latency of every re-plan in seconds (update, solve and
+                result extraction) together with the Gurobi runtime.
+        """
+        parameters = self.model.parameters
+        length = steps + self.T - 1
+        series = {
+            "import_price": import_price,
+            "export_price": export_price,
+            "pv_max": pv_max,
+        }
+        if parameters.desired_load_exists:
+            series["desired_load"] = desired_load
+        for name, values in series.items():
+            if values is None:  # Repeat the profile of the dataset
+                values = np.resize(getattr(parameters, name), length)
+            if len(values) < length:
+                raise ValueError(f"{name} must cover at least {length} hours.")
+            series[name] = np.asarray(values, dtype=float)
+
+        if self.model.model is None:
+            self.model.create_model()
+            self.model.model.Params.OutputFlag = 0
+
+        executed = {
+            name: np.zeros(steps)
+            for name in [
+                "load",
+                "pv_prod",
+                "import_grid",
+                "export_grid",
+                "charge",
+                "discharge",
+                "soc",
+            ]
+        }
+        objective_values = np.zeros(steps)
+        latency = np.zeros(steps)
+        runtime = np.zeros(steps)
+        soc = parameters.initial_soc if parameters.storage_exists else 0
+
+        for step in range(steps):
+            start = time.perf_counter()
+            window = {
+                name: values[step : step + self.T] for name, values in series.items()
+            }
+            if parameters.storage_exists:
+                window["initial_soc"] = soc
+            self.model.update_parameters(**window)
+            self.model.optimize()
+            results = self.model.get_results(duals=False)
+            latency[step] = time.perf_counter() - start
+            runtime[step] = self.model.model.Runtime
+
+            # Execute the first hour of the plan
+            objective_values[step] = results["objective_value"]
+            for name in executed:
+                executed[name][step] = results[name][0]
+            if parameters.storage_exists:
+                soc = results["soc"][1]
+
+        return dict(
+            executed,
+            objective_value=objective_values,
+            latency=latency,
+            runtime=runtime,
+        )
+
+
+# Testing
+if __name__ == "__main__":
+    rolling_horizon = Rolling_horizon("question_2b")
+    rolling_horizon.model.parameters.diff_penalty = 1.75
+    results = rolling_horizon.run(steps=48)
+
+    # The executed schedule respects the storage capacities
+    parameters = rolling_horizon.model.parameters
+    tolerance = 1e-6
+    assert np.all(results["charge"] <= parameters.charging_capacity + tolerance)
+    assert np.all(results["discharge"] <= parameters.discharging_capacity + tolerance)
+    assert np.all(results["soc"] >= -tolerance)
+    assert np.all(results["soc"] <= parameters.storage_capacity + tolerance)
+    print("Executed import (kWh):", results["import_grid"].sum())
+    print("Executed SOC (kWh):", np.round(results["soc"], 3))
+    print(
+        "Re-plan latency (ms): "
+        f"median {1e3 * np.median(results['latency']):.2f}, "
+        f"max {1e3 * np.max(results['latency']):.2f}"
+    )
@@ -0,0 +1,102 @@
+"""Parallel execution of independent model scenarios using a process pool."""
+
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import gurobipy as gp
+from Assignment_1_Classes.Optimization_model import Optimization_model
+
+# Gurobi environment of the current worker process, created by _init_worker
+_worker_env = None
+
+
+def _init_worker(threads: int) -> None:
+    global _worker_env
+    _worker_env = gp.Env(params={"Threads": threads, "OutputFlag": 0})
+
+
+def _run_scenario(dataset_folder: str, overrides: dict) -> tuple:
+    try:
+        model = Optimization_model(env=_worker_env)
+        model.load_data(dataset_folder)
+        if overrides.get("battery_size_variable", False):
+            model.set_battery_size_as_variable()
+        for name, value in overrides.items():
+            setattr(model.parameters, name, value)
+        model.create_model()
+        model.optimize()
+        return model.get_results(), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+class Scenario_runner:
+    def __init__(
+        self, dataset_folder: str, max_workers: int = None, threads_per_worker: int = 1
+    ):
+        self.dataset_folder = dataset_folder
+        self.threads_per_worker = threads_per_worker
+        # Do not start more Gurobi threads in total than there are cores
+        self.max_workers = max_workers or max(
+            1, (os.cpu_count() or 1) // threads_per_worker
+        )
+
+    def run(self, scenarios: list):
+        """Solve scenarios in parallel and stream their results.
+
+        Results are yielded as soon as they are available, but always in the
+        order of the given scenarios. A scenario that fails does not stop the
+        others, its record contains the error instead of results.
+
+        Args:
+            scenarios (list): Dictionaries of Parameters attribute overrides.
+                The key "battery_size_variable" sets the battery size as a
+                variable before the other overrides are applied.
+
+        Yields:
+            dict: Record with the scenario index, overrides, results and error.
+        """
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker,),
+        ) as executor:
+            futures = {
+                executor.submit(_run_scenario, self.dataset_folder, overrides): index
+                for index, overrides in enumerate(scenarios)
+            }
+            finished = {}
+            next_index = 0
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results, error = future.result()
+                except Exception:  # The worker process itself failed
+                    results, error = None, traceback.format_exc()
+                finished[index] = {
+                    "scenario": index,
+                    "overrides": scenarios[index],
+                    "results": results,
+                    "error": error,
+                }
+                # Release all records that are next in line
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+
+    def run_all(self, scenarios: list) -> list:
+        return list(self.run(scenarios))
+
+
+# Testing
+if __name__ == "__main__":
+    runner = Scenario_runner("question_2b", threads_per_worker=1)
+    scenarios = [
+        {"battery_size_variable": True, "battery_cost": cost} for cost in (3, 5, 7, 9)
+    ]
+    for record in runner.run(scenarios):
+        print(
+            record["scenario"],
+            record["overrides"],
+            record["error"] or record["results"]["battery_size"],
+        )
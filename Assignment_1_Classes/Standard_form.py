@@ -0,0 +1,281 @@
+"""Linear program of the energy system model in matrix form, built without a solver."""
+
+import numpy as np
+import scipy.sparse as sp
+from Assignment_1_Classes.Parameters import Parameters, INFINITY
+from Assignment_1_Classes.Model_reduction import Model_reduction
+
+
+class Standard_form:
+    """Linear program min c @ x subject to A @ x (sense) b and lb <= x <= ub.
+
+    Variables and constraints are added per family, with the hour of each
+    variable and constraint. Each constraint family is given as (row, column,
+    coefficient) triples of arrays, which keeps the build vectorized.
+    """
+
+    def __init__(self):
+        self.var = {}  # Column indices of each variable family
+        self.constr = {}  # Row indices of each constraint family
+        self.var_hours = {}  # Hour of each column of a family, None if single
+        self.constr_hours = {}  # Hour of each row of a family, None if single
+        self.lb, self.ub, self.obj = [], [], []
+        self.rows, self.columns, self.coefficients = [], [], []
+        self.sense, self.rhs = [], []
+        self.n_vars = 0
+        self.n_constrs = 0
+
+    def add_variables(self, name: str, hours, lb=0, ub=INFINITY, obj=0) -> np.ndarray:
+        """Add a family of variables.
+
+        Args:
+            name (str): Name of the variable family.
+            hours (np.ndarray): Hour of each variable, None for a single
+                variable without an hour such as the battery scaling.
+            lb, ub, obj: Bounds and costs, broadcast to the variables.
+
+        Returns:
+            np.ndarray: Column indices of the variables.
+        """
+        n = 1 if hours is None else len(hours)
+        self.var[name] = self.n_vars + np.arange(n)
+        self.var_hours[name] = None if hours is None else np.asarray(hours)
+        self.n_vars += n
+        for values, value in [(self.lb, lb), (self.ub, ub), (self.obj, obj)]:
+            values.append(np.broadcast_to(np.asarray(value, dtype=float), n))
+        return self.var[name]
+
+    def add_constraints(
+        self, name: str, hours, terms: list, sense: str, rhs
+    ) -> np.ndarray:
+        """Add a family of constraints.
+
+        Args:
+            name (str): Name of the constraint family.
+            hours (np.ndarray): Hour of each constraint, None for a single
+                constraint without an hour such as the initial SOC.
+            terms (list): (row, column, coefficient) triples of arrays that are
+                broadcast together, with rows numbered from 0 to the number of
+                constraints - 1.
+            sense (str): "<", ">" or "=".
+            rhs: Right hand side, broadcast to the constraints.
+
+        Returns:
+            np.ndarray: Row indices of the constraints.
+        """
+        n = 1 if hours is None else len(hours)
+        for row, column, coefficient in terms:
+            row, column, coefficient = np.broadcast_arrays(row, column, coefficient)
+            self.rows.append(self.n_constrs + row.ravel())
+            self.columns.append(column.ravel())
+            self.coefficients.append(coefficient.ravel().astype(float))
+        self.constr[name] = self.n_constrs + np.arange(n)
+        self.constr_hours[name] = None if hours is None else np.asarray(hours)
+        self.sense.append(np.full(n, sense))
+        self.rhs.append(np.broadcast_to(np.asarray(rhs, dtype=float), n))
+        self.n_constrs += n
+        return self.constr[name]
+
+    def finalize(self) -> None:
+        # Concatenate all families into the arrays of the linear program
+        self.A = sp.csr_matrix(
+            (
+                np.concatenate(self.coefficients),
+                (np.concatenate(self.rows), np.concatenate(self.columns)),
+            ),
+            shape=(self.n_constrs, self.n_vars),
+        )
+        self.lb, self.ub, self.obj = (
+            np.concatenate(values) for values in [self.lb, self.ub, self.obj]
+        )
+        self.sense = np.concatenate(self.sense)
+        self.rhs = np.concatenate(self.rhs)
+
+    def var_names(self) -> list:
+        """Names of the variables in column order, "<family>_<hour>"."""
+        return _names(self.var, self.var_hours)
+
+    def constr_names(self) -> list:
+        """Names of the constraints in row order, "<family>_<hour>"."""
+        return _names(self.constr, self.constr_hours)
+
+
+def _names(families: dict, hours: dict) -> list:
+    # Families are added as consecutive indices, in the order of the dict
+    names = []
+    for name in families:
+        if hours[name] is None:
+            names.append(name)
+        else:
+            names += [f"{name}_{t}" for t in hours[name].tolist()]
+    return names
+
+
+def build_linear_program(
+    parameters: Parameters, reduction: Model_reduction = None
+) -> Standard_form:
+    """Build the linear program of the energy system model from its parameters.
+
+    This is the one formulation of the model: Optimization_model builds its
+    Gurobi model from it and Backend_model solves it with other solvers.
+    The operating limits of the PV and load (see Parameters.operating_limits())
+    are not part of it, Optimization_model adds them to its Gurobi model.
+
+    Args:
+        parameters (Parameters): Parameters of the model.
+        reduction (Model_reduction): Variables and constraints left out of the
+            model, none if None.
+
+    Returns:
+        Standard_form: Linear program with the variable and constraint
+            families of Optimization_model.
+    """
+    if reduction is None:
+        reduction = Model_reduction(parameters, active=False)
+    T = parameters.T
+    hours = np.arange(T)
+    form = Standard_form()
+
+    # Variables, with the objective as their costs
+    if parameters.battery_size_variable:
+        scaling = form.add_variables(
+            "battery_scaling", None, obj=parameters.battery_cost
+        )
+    if not reduction.fixed_load:
+        load = form.add_variables("load", hours, ub=parameters.load_max)
+    gen_hours = reduction.gen_hours
+    gen = form.add_variables(
+        "gen", gen_hours, ub=np.asarray(parameters.pv_max)[gen_hours]
+    )
+    imp = form.add_variables(
+        "import", hours, ub=parameters.import_max, obj=parameters.import_price
+    )
+    exp = form.add_variables(
+        "export", hours, ub=parameters.export_max, obj=-parameters.export_price
+    )
+    deviations = reduction.deviations(parameters)
+    if deviations:
+        pos = form.add_variables("pos_diff_load", hours, obj=parameters.diff_penalty)
+        neg = form.add_variables("neg_diff_load", hours, obj=parameters.diff_penalty)
+    if parameters.storage_exists:
+        storage = {}
+        for name in ["discharge", "charge", "SOC"]:
+            lb, ub = reduction.bounds(parameters, name)
+            storage[name] = form.add_variables(name, hours, lb=lb, ub=ub)
+        discharge, charge, soc = storage["discharge"], storage["charge"], storage["SOC"]
+
+    # Energy balance constraint, with the desired load if it is substituted
+    # and without PV production in hours without it
+    terms = [(hours, exp, 1), (gen_hours, gen, -1), (hours, imp, -1)]
+    if not reduction.fixed_load:
+        terms.append((hours, load, 1))
+    if parameters.storage_exists:
+        terms += [(hours, charge, 1), (hours, discharge, -1)]
+    form.add_constraints(
+        "energy_balance",
+        hours,
+        terms,
+        "=",
+        -parameters.desired_load if reduction.fixed_load else 0,
+    )
+
+    # Minimum combined load constraint if relevant
+    if parameters.min_combined_load_exists and not reduction.fixed_load:
+        form.add_constraints(
+            "minimum_combined_load",
+            None,
+            [(0, load, 1)],
+            ">",
+            parameters.min_combined_load,
+        )
+
+    # Desired load profile constraints if relevant
+    if deviations:
+        form.add_constraints(
+            "pos_diff_load",
+            hours,
+            [(hours, pos, 1), (hours, load, -1)],
+            ">",
+            -parameters.desired_load,
+        )
+        form.add_constraints(
+            "neg_diff_load",
+            hours,
+            [(hours, neg, 1), (hours, load, 1)],
+            ">",
+            parameters.desired_load,
+        )
+
+    # Storage constraints if relevant, capacities scale with the battery size
+    # if it is a variable. With a fixed battery size and a reduced model the
+    # single variable constraints are bounds of the variables instead.
+    if parameters.storage_exists and not reduction.storage_bounds:
+        variable_size = parameters.battery_size_variable
+        for name, t in [("initial_soc", 0), ("final_soc", T - 1)]:
+            value = getattr(parameters, name)
+            terms = [(0, soc[t], 1)]
+            if variable_size:
+                terms.append((0, scaling, -value))
+            form.add_constraints(name, None, terms, "=", 0 if variable_size else value)
+    if parameters.storage_exists:
+        steps = np.arange(T - 1)
+        form.add_constraints(
+            "soc_balance",
+            hours[1:],
+            [
+                (steps, soc[1:], 1),
+                (steps, soc[:-1], -1),
+                (steps, charge[:-1], -parameters.charging_efficiency),
+                (steps, discharge[:-1], 1 / parameters.discharging_efficiency),
+            ],
+            "=",
+            0,
+        )
+    if parameters.storage_exists and not reduction.storage_bounds:
+        # The SOC of the first hour is the initial SOC, the charge and
+        # discharge of the first hour are limited if first_hour_storage_limits
+        first = 0 if parameters.first_hour_storage_limits else 1
+        for name, variable, capacity, start in [
+            ("charge_capacity", charge, parameters.charging_capacity, first),
+            ("discharge_capacity", discharge, parameters.discharging_capacity, first),
+            ("soc_capacity", soc, parameters.storage_capacity, 1),
+        ]:
+            rows = np.arange(T - start)
+            terms = [(rows, variable[start:], 1)]
+            if variable_size:
+                terms.append((rows, scaling, -capacity))
+            form.add_constraints(
+                name, hours[start:], terms, "<", 0 if variable_size else capacity
+            )
+
+    form.finalize()
+    return form
+
+
+# Testing
+if __name__ == "__main__":
+    import sys
+    import itertools
+
+    # The reduction leaves out the variables and constraints it counts, and
+    # every variable and constraint has its own name
+    for question, diff_penalty, reduce in itertools.product(
+        ["1a", "1b", "1c", "2b"], [INFINITY, 1.75], [False, True]
+    ):
+        parameters = Parameters(f"question_{question}")
+        parameters.diff_penalty = diff_penalty
+        reduction = Model_reduction(parameters, active=reduce)
+        form = build_linear_program(parameters, reduction)
+        full = build_linear_program(parameters)
+        removed = reduction.removed(parameters)
+        assert full.n_vars - form.n_vars == removed["variables"]
+        assert full.n_constrs - form.n_constrs == removed["constraints"]
+        assert form.A.shape == (form.n_constrs, form.n_vars)
+        assert len(set(form.var_names())) == form.n_vars
+        assert len(set(form.constr_names())) == form.n_constrs
+        print(
+            f"question_{question}: {form.n_vars} variables and {form.n_constrs} "
+            f"constraints{' (reduced)' if reduce else ''}"
+        )
+    # The formulation is built without a solver
+    assert "gurobipy" not in sys.modules
@@ -0,0 +1,410 @@
+"""Two-stage stochastic battery sizing over price and PV scenarios."""
+
+import os
+import time
+import numpy as np
+import scipy.sparse as sp
+import gurobipy as gp
+from gurobipy import GRB
+from Assignment_1_Classes.Parameters import Parameters, INFINITY
+from Assignment_1_Classes.Optimization_model import Optimization_model
+from Assignment_1_Classes.Backend_model import (
+    BACKENDS,
+    Standard_form,
+    build_standard_form,
+)
+from Assignment_1_Classes.Annual_model import (
+    DAILY_SERIES,
+    peak_memory_mb,
+    solve_independent,
+    worker_pool,
+)
+
+
+def random_scenarios(
+    parameters: Parameters,
+    n: int,
+    seed: int = 0,
+    price_spread: float = 0.3,
+    pv_spread: float = 0.5,
+) -> dict:
+    """Draw price and PV scenarios around the profiles of the parameters.
+
+    Each scenario scales the energy price by a random level and hourly noise,
+    the tariffs are unchanged. The PV profile is scaled by a random
+    cloudiness, up to the rated power.
+
+    Args:
+        parameters (Parameters): Parameters with the expected profiles.
+        n (int): Number of scenarios.
+        seed (int): Seed of the random draws.
+        price_spread (float): Standard deviation of the relative price level.
+        pv_spread (float): Largest relative reduction of the PV production.
+
+    Returns:
+        dict: import_price, export_price and pv_max with one row per scenario.
+    """
+    rng = np.random.default_rng(seed)
+    T = parameters.T
+    level = rng.lognormal(0, price_spread, size=(n, 1))
+    noise = 1 + 0.1 * rng.standard_normal((n, T))
+    price = parameters.electricity_price * level * noise
+    clouds = rng.uniform(1 - pv_spread, 1, size=(n, 1))
+    return {
+        "import_price": price
+        + (parameters.import_price - parameters.electricity_price),
+        "export_price": price
+        + (parameters.export_price - parameters.electricity_price),
+        "pv_max": parameters.pv_max * clouds,
+    }
+
+
+def build_extensive_form(
+    parameters: Parameters, scenarios: dict, probabilities: np.ndarray
+) -> Standard_form:
+    """Build the deterministic equivalent of the two-stage problem.
+
+    The battery scaling is shared by all scenarios, every scenario has its
+    own copy of the dispatch variables and constraints of
+    build_standard_form(). The constraint matrix is assembled as a Kronecker
+    product, so the build is vectorized over the scenarios.
+
+    Args:
+        parameters (Parameters): Parameters with the battery size as variable.
+        scenarios (dict): One row per scenario for some of DAILY_SERIES.
+        probabilities (np.ndarray): Probability of each scenario.
+
+    Returns:
+        Standard_form: Linear program with variable and constraint families
+            indexed by (scenario, hour), and the unweighted dispatch cost of
+            each scenario per variable as "cost".
+    """
+    base = build_standard_form(parameters)
+    S = len(probabilities)
+    first = base.var["battery_scaling"]
+    second = np.setdiff1d(np.arange(base.n_vars), first)
+    position = np.full(base.n_vars, -1)  # Column of each variable in a scenario
+    position[second] = np.arange(len(second))
+
+    cost = np.tile(base.obj[second], (S, 1))
+    ub = np.tile(base.ub[second], (S, 1))
+    rhs = np.tile(base.rhs, (S, 1))
+    if "import_price" in scenarios:
+        cost[:, position[base.var["import"]]] = scenarios["import_price"]
+    if "export_price" in scenarios:
+        cost[:, position[base.var["export"]]] = -scenarios["export_price"]
+    if "pv_max" in scenarios:
+        ub[:, position[base.var["gen"]]] = scenarios["pv_max"]
+    if "desired_load" in scenarios:
+        rhs[:, base.constr["pos_diff_load"]] = -scenarios["desired_load"]
+        rhs[:, base.constr["neg_diff_load"]] = scenarios["desired_load"]
+
+    form = Standard_form()
+    form.A = sp.hstack(
+        [
+            sp.kron(np.ones((S, 1)), base.A[:, first]),
+            sp.kron(sp.identity(S), base.A[:, second]),
+        ],
+        format="csr",
+    )
+    form.obj = np.concatenate(
+        [base.obj[first], (probabilities[:, None] * cost).ravel()]
+    )
+    form.lb = np.concatenate([base.lb[first], np.tile(base.lb[second], S)])
+    form.ub = np.concatenate([base.ub[first], ub.ravel()])
+    form.sense = np.tile(base.sense, S)
+    form.rhs = rhs.ravel()
+    form.n_vars, form.n_constrs = form.A.shape[1], form.A.shape[0]
+    offsets = np.arange(S)[:, None]
+    form.var = {
+        name: len(first) + offsets * len(second) + position[columns]
+        for name, columns in base.var.items()
+        if name != "battery_scaling"
+    }
+    form.var["battery_scaling"] = np.arange(len(first))
+    form.constr = {
+        name: offsets * base.n_constrs + rows for name, rows in base.constr.items()
+    }
+    form.cost = cost
+    return form
+
+
+class Stochastic_model:
+    """Size the battery against several scenarios of prices and PV.
+
+    The battery scaling is decided before the scenario is known (first
+    stage), the dispatch is decided for each scenario (second stage). The
+    expected cost battery_cost * scaling + sum of the probability times the
+    dispatch cost of each scenario is minimized.
+    """
+
+    def __init__(self, backend: str = "highs", env: gp.Env = None):
+        """
+        Args:
+            backend (str): Solver of the extensive form, see Backend_model.
+                The extensive form quickly exceeds size-limited Gurobi
+                licenses.
+            env (gp.Env): Gurobi environment of the master problem of
+                solve_decomposed(), the default environment if None.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown backend '{backend}', use one of {list(BACKENDS)}"
+            )
+        self.backend = BACKENDS[backend]()
+        self.env = env
+        self.form = None
+        self.status = "Empty model"
+
+    def load_data(self, dataset_folder: str) -> None:
+        self.parameters = Parameters(dataset_folder)
+        if not self.parameters.storage_exists:
+            raise ValueError("No storage data available to size the battery.")
+        self.parameters.battery_size_variable = True
+        self.parameters.battery_cost = INFINITY
+        self.status = "Data loaded"
+
+    def set_scenarios(self, scenarios: dict, probabilities=None) -> None:
+        """Set the second stage scenarios.
+
+        Args:
+            scenarios (dict): Arrays with one row of hourly values per scenario
+                for some of import_price, export_price, pv_max and
+                desired_load. Series that are not given equal the dataset in
+                every scenario.
+            probabilities (array): Probability of each scenario, equal
+                probabilities if None.
+        """
+        unknown = set(scenarios) - set(DAILY_SERIES)
+        if unknown:
+            raise ValueError(f"Unknown scenario series: {sorted(unknown)}")
+        if "desired_load" in scenarios and not self.parameters.desired_load_exists:
+            raise ValueError("The dataset has no desired load to vary.")
+        S = len(next(iter(scenarios.values())))
+        for name, values in scenarios.items():
+            if np.shape(values) != (S, self.parameters.T):
+                raise ValueError(f"{name} must have shape ({S}, {self.parameters.T}).")
+        if probabilities is None:
+            probabilities = np.full(S, 1 / S)
+        probabilities = np.asarray(probabilities, dtype=float)
+        if (
+            probabilities.shape != (S,)
+            or np.any(probabilities < 0)
+            or not np.isclose(probabilities.sum(), 1)
+        ):
+            raise ValueError(
+                f"probabilities must be {S} non-negative values summing to 1."
+            )
+        self.scenarios = {
+            name: np.asarray(values, dtype=float) for name, values in scenarios.items()
+        }
+        self.probabilities = probabilities
+        self.form = None
+        self.status = "Scenarios set"
+
+    def windows(self) -> dict:
+        # Hourly inputs of all scenarios, including those that are not varied
+        S = len(self.probabilities)
+        return {
+            name: self.scenarios.get(
+                name, np.tile(getattr(self.parameters, name), (S, 1))
+            )
+            for name in DAILY_SERIES
+            if name != "desired_load" or self.parameters.desired_load_exists
+        }
+
+    def create_model(self) -> None:
+        start = time.perf_counter()
+        self.form = build_extensive_form(
+            self.parameters, self.scenarios, self.probabilities
+        )
+        self.backend.build(self.form)
+        self.build_time = time.perf_counter() - start
+        self.status = "Model created"
+
+    def optimize(self) -> None:
+        start = time.perf_counter()
+        self.solution = self.backend.solve()
+        self.solve_time = time.perf_counter() - start
+        if self.solution["optimal"]:
+            self.status = "Model optimized"
+        else:
+            self.status = "Model infeasible or unbounded"
+
+    def get_results(self) -> dict:
+        """Extract the results of the extensive form.
+
+        Returns:
+            dict: Expected total cost as objective value, the battery scaling
+                and size, the dispatch cost of each scenario, and the hourly
+                series of Optimization_model.get_results() with one row per
+                scenario.
+        """
+        if not self.solution["optimal"]:
+            raise ValueError("No optimal solution available.")
+        x = self.solution["x"]
+        S = len(self.probabilities)
+
+        def values(name: str) -> np.ndarray:
+            if name not in self.form.var:  # Components that do not exist
+                return np.zeros((S, self.parameters.T))
+            return x[self.form.var[name]]
+
+        scaling = x[self.form.var["battery_scaling"][0]]
+        results = {
+            "objective_value": self.solution["objective_value"],
+            "battery_scaling": scaling,
+            "battery_size": self.parameters.storage_capacity * scaling,
+            "scenario_cost": np.einsum(
+                "sv,sv->s",
+                self.form.cost,
+                x[len(self.form.var["battery_scaling"]) :].reshape(S, -1),
+            ),
+        }
+        for name, variable in Optimization_model.result_series.items():
+            if name == "pv_curtailment":
+                results[name] = self.windows()["pv_max"] - values("gen")
+            else:
+                results[name] = values(variable)
+        return results
+
+    def solve_decomposed(
+        self,
+        max_workers: int = None,
+        tolerance: float = 1e-6,
+        max_iterations: int = 100,
+        max_scaling: float = 1e3,
+    ) -> dict:
+        """Solve the two-stage problem by Benders decomposition (L-shaped).
+
+        A master problem over the battery scaling and the expected dispatch
+        cost proposes a scaling. All scenarios are then solved in parallel
+        with the scaling fixed, and their expected cost and its derivative by
+        the scaling (the reduced cost of the fixed scaling) add a cut to the
+        master problem. The extensive form is never built, so memory use
+        does not grow with the number of scenarios beyond the results.
+
+        Args:
+            max_workers (int): Processes for the scenarios, the number of
+                cores if None.
+            tolerance (float): Relative gap between the best solution and the
+                lower bound of the master problem at which to stop.
+            max_iterations (int): Largest number of passes over the scenarios.
+            max_scaling (float): Upper bound of the battery scaling.
+
+        Returns:
+            dict: Expected total cost, battery scaling and size, the dispatch
+                cost of each scenario at that scaling, the lower and upper
+                bound of each iteration, the wall time in seconds and the peak
+                resident memory of all processes in MB.
+        """
+        start = time.perf_counter()
+        max_workers = max_workers or os.cpu_count() or 1
+        windows = self.windows()
+        battery_cost = self.parameters.battery_cost
+
+        master = gp.Model("Benders master", env=self.env)
+        master.Params.OutputFlag = 0
+        scaling = master.addVar(lb=0, ub=max_scaling, obj=battery_cost)
+        theta = master.addVar(lb=-GRB.INFINITY, obj=1)  # Expected dispatch cost
+
+        best = {"total_cost": np.inf}
+        lower_bounds, upper_bounds = [], []
+        peak = peak_memory_mb()
+        value = 1.0  # First scaling to evaluate
+        with worker_pool(max_workers) as executor:  # One pool for all passes
+            for iteration in range(max_iterations):
+                runs = solve_independent(
+                    self.parameters, windows, value, max_workers, executor
+                )
+                peak = max(peak, runs["peak_rss_mb"])
+                expected = self.probabilities @ runs["objective_value"]
+                derivative = self.probabilities @ runs["gradient"]
+                total = battery_cost * value + expected
+                if total < best["total_cost"]:
+                    best = {
+                        "total_cost": total,
+                        "battery_scaling": value,
+                        "scenario_cost": runs["objective_value"],
+                    }
+                master.addLConstr(theta >= expected + derivative * (scaling - value))
+                master.optimize()
+                if master.Status != GRB.OPTIMAL:
+                    raise ValueError(
+                        "The Benders master problem has no optimal solution."
+                    )
+                lower_bounds.append(master.ObjVal)
+                upper_bounds.append(best["total_cost"])
+                gap = best["total_cost"] - master.ObjVal
+                if gap <= tolerance * max(1.0, abs(best["total_cost"])):
+                    break
+                value = scaling.X
+            else:
+                raise ValueError(
+                    f"Benders decomposition did not converge in {max_iterations} "
+                    "iterations."
+                )
+
+        self.status = "Model optimized by decomposition"
+        return {
+            "objective_value": best["total_cost"],
+            "battery_scaling": best["battery_scaling"],
+            "battery_size": self.parameters.storage_capacity * best["battery_scaling"],
+            "scenario_cost": best["scenario_cost"],
+            "lower_bounds": np.array(lower_bounds),
+            "upper_bounds": np.array(upper_bounds),
+            "iterations": len(lower_bounds),
+            "wall_time": time.perf_counter() - start,
+            "peak_rss_mb": peak,
+        }
+
+
+# Testing
+if __name__ == "__main__":
+    env = gp.Env(params={"OutputFlag": 0})
+
+    # A single scenario is the deterministic sizing of question 2b
+    reference = Optimization_model(env=env)
+    reference.load_data("question_2b")
+    reference.set_battery_size_as_variable()
+    reference.parameters.battery_cost = 5
+    reference.parameters.diff_penalty = 1.75
+    reference.create_model()
+    reference.optimize()
+    expected = reference.get_results(duals=False)
+    for backend in BACKENDS:
+        model = Stochastic_model(backend)
+        model.load_data("question_2b")
+        model.parameters.battery_cost = 5
+        model.parameters.diff_penalty = 1.75
+        model.set_scenarios({"pv_max": model.parameters.pv_max[None, :]})
+        model.create_model()
+        model.optimize()
+        results = model.get_results()
+        assert np.isclose(results["objective_value"], expected["objective_value"])
+        assert np.isclose(results["battery_size"], expected["battery_size"])
+
+    # The extensive form and the decomposition agree on many scenarios
+    model = Stochastic_model("highs", env=env)
+    model.load_data("question_2b")
+    model.parameters.battery_cost = 5
+    model.parameters.diff_penalty = 1.75
+    model.set_scenarios(random_scenarios(model.parameters, 50))
+    model.create_model()
+    model.optimize()
+    extensive = model.get_results()
+    decomposed = model.solve_decomposed(max_workers=2)
+    assert np.isclose(
+        extensive["objective_value"], decomposed["objective_value"], rtol=1e-6
+    )
+    assert np.isclose(
+        extensive["scenario_cost"] @ model.probabilities
+        + 5 * extensive["battery_scaling"],
+        extensive["objective_value"],
+    )
+    print(
+        f"50 scenarios: battery size {extensive['battery_size']:.3f} kWh "
+        f"(extensive form, {model.build_time + model.solve_time:.3f} s), "
+        f"{decomposed['battery_size']:.3f} kWh (Benders, "
+        f"{decomposed['iterations']} iterations, {decomposed['wall_time']:.3f} s)"
+    )
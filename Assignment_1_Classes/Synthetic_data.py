@@ -0,0 +1,348 @@
+"""Seedable generator of large synthetic datasets in the question folder format."""
+
+import os
+import json
+import numpy as np
+from Assignment_1_Classes.Datasets import (
+    COLUMN_REFERENCE,
+    PROFILE_COLUMNS,
+    column_file_name,
+)
+
+# Share of the consumers that own each kind of appliance or preference. Every
+# consumer owns at least one load and the first consumer owns one of each kind
+# present, because the single consumer parameters are read from it.
+DEFAULT_MIX = {
+    "pv": 1.0,
+    "storage": 1.0,
+    "desired_load": 1.0,
+    "min_combined_load": 0.0,
+    "loads_per_consumer": 1,
+}
+
+# Random streams of the generator, drawn from independently per consumer and
+# bus so that each file can be written in its own pass over the consumers
+_LAYOUT, _PV, _LOAD, _PRICE = range(4)
+
+
+def write_synthetic_dataset(
+    folder: str,
+    hours: int = 24,
+    consumers: int = 1,
+    buses: int = 1,
+    mix: dict = None,
+    seed: int = 0,
+    columns: bool = False,
+) -> None:
+    """Write a synthetic dataset with the files of the question folders.
+
+    Records are generated and written one at a time, so memory use does not
+    grow with the number of consumers. The same seed gives the same files.
+
+    Args:
+        folder (str): Output folder, created if needed.
+        hours (int): Number of hours of the profiles.
+        consumers (int): Number of consumers.
+        buses (int): Number of buses, the consumers are spread evenly.
+        mix (dict): Overrides of DEFAULT_MIX.
+        seed (int): Seed of the random profiles and appliance mix.
+        columns (bool): Write the hourly profiles as binary columns that the
+            JSON files refer to instead of as JSON lists, see
+            Datasets.PROFILE_COLUMNS.
+    """
+    mix = dict(DEFAULT_MIX, **(mix or {}))
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise ValueError(f"Unknown appliance mix keys: {sorted(unknown)}")
+    if hours < 1 or consumers < 1 or buses < 1:
+        raise ValueError("hours, consumers and buses must be positive.")
+    os.makedirs(folder, exist_ok=True)
+
+    def layouts():
+        return (_layout(seed, c, consumers, buses, mix) for c in range(consumers))
+
+    def path(file_name):
+        return os.path.join(folder, file_name)
+
+    _write_list(
+        path("consumer_params.json"),
+        (
+            {
+                "consumer_id": layout["id"],
+                "connection_bus": f"Bus{layout['bus'] + 1}",
+                "list_appliances": layout["appliances"],
+            }
+            for layout in layouts()
+        ),
+    )
+    counts = {}  # Number of appliances of each kind
+    with open(path("appliance_params.json"), "w") as f:
+        kinds = ["DER", "load", "storage"] if mix["storage"] > 0 else ["DER", "load"]
+        for i, kind in enumerate(kinds):
+            f.write(("{" if i == 0 else ",\n") + f'"{kind}": ')
+            counts[kind] = _write_records(
+                f, (record for layout in layouts() for record in layout[kind])
+            )
+        f.write("}\n")
+
+    # Number of records of each file with an hourly profile column
+    rows = {
+        "bus_params.json": buses,
+        "DER_production.json": counts["DER"],
+        "usage_preferences.json": counts["load"],
+    }
+    column = {
+        file_name: (
+            _open_column(folder, file_name, rows[file_name], hours) if columns else None
+        )
+        for file_name in PROFILE_COLUMNS
+    }
+    _write_list(
+        path("bus_params.json"),
+        (
+            _bus(seed, b, hours, consumers_on_bus=len(range(b, consumers, buses)))
+            for b in range(buses)
+        ),
+        column["bus_params.json"],
+        PROFILE_COLUMNS["bus_params.json"],
+    )
+    _write_list(
+        path("DER_production.json"),
+        (
+            {
+                "consumer_ID": layout["id"],
+                "DER_id": der["DER_id"],
+                "DER_type": "solar",
+                "hourly_profile_ratio": _pv_profile(seed, layout["index"], hours),
+            }
+            for layout in layouts()
+            for der in layout["DER"]
+        ),
+        column["DER_production.json"],
+        PROFILE_COLUMNS["DER_production.json"],
+    )
+    _write_list(
+        path("usage_preferences.json"),
+        (_usage_preferences(seed, layout, hours) for layout in layouts()),
+        column["usage_preferences.json"],
+        PROFILE_COLUMNS["usage_preferences.json"],
+    )
+    for values in column.values():
+        if values is not None:
+            values.flush()
+
+
+def _open_column(folder: str, file_name: str, rows: int, hours: int) -> np.memmap:
+    # Binary column of a file, NaN where a profile is missing
+    return np.lib.format.open_memmap(
+        os.path.join(folder, column_file_name(file_name)),
+        mode="w+",
+        dtype=float,
+        shape=(rows, hours),
+    )
+
+
+def _rng(seed: int, stream: int, index: int) -> np.random.Generator:
+    return np.random.default_rng([seed, stream, index])
+
+
+def _layout(seed: int, c: int, consumers: int, buses: int, mix: dict) -> dict:
+    # Appliances, preferences and ratings of one consumer
+    rng = _rng(seed, _LAYOUT, c)
+    draws = rng.random(4)
+    owns = {
+        kind: c == 0 and mix[kind] > 0 or draw < mix[kind]
+        for kind, draw in zip(
+            ["pv", "storage", "desired_load", "min_combined_load"], draws
+        )
+    }
+    width = len(str(consumers))
+    name = str(c + 1).zfill(width)
+    layout = {
+        "index": c,
+        "id": f"C{name}",
+        "bus": c % buses,
+        "DER": [],
+        "load": [],
+        "storage": [],
+        "soc_ratio": [],  # Initial and final SOC ratio of each storage
+        "owns": owns,
+    }
+    if owns["pv"]:
+        layout["DER"].append(
+            {
+                "DER_id": f"PV_{name}",
+                "DER_type": "PV",
+                "max_power_kW": round(float(rng.uniform(2.0, 6.0)), 2),
+            }
+        )
+    for i in range(mix["loads_per_consumer"]):
+        layout["load"].append(
+            {
+                "load_type": "fully flexible load",
+                "load_id": f"FFL_{name}" + (f"_{i + 1}" if i else ""),
+                "max_load_kWh_per_hour": round(float(rng.uniform(2.0, 4.0)), 2),
+            }
+        )
+    if owns["storage"]:
+        layout["storage"].append(
+            {
+                "storage_id": f"BESS_{name}",
+                "storage_capacity_kWh": round(float(rng.uniform(4.0, 12.0)), 2),
+                "max_charging_power_ratio": round(float(rng.uniform(0.15, 0.5)), 2),
+                "max_discharging_power_ratio": round(float(rng.uniform(0.15, 0.5)), 2),
+                "charging_efficiency": round(float(rng.uniform(0.85, 0.95)), 3),
+                "discharging_efficiency": round(float(rng.uniform(0.85, 0.95)), 3),
+            }
+        )
+        layout["soc_ratio"].append(round(float(rng.uniform(0.2, 0.8)), 2))
+    layout["min_energy_per_day"] = round(float(rng.uniform(2.0, 6.0)), 2)
+    layout["appliances"] = [
+        appliance[f"{kind}_id"]
+        for kind in ["DER", "load", "storage"]
+        for appliance in layout[kind]
+    ]
+    return layout
+
+
+def _bus(seed: int, b: int, hours: int, consumers_on_bus: int) -> dict:
+    # Daily price shape with a morning and an evening peak and a yearly cycle
+    rng = _rng(seed, _PRICE, b)
+    t = np.arange(hours)
+    daily = 0.3 * np.exp(-(((t % 24) - 8) ** 2) / 8) + 0.6 * np.exp(
+        -(((t % 24) - 19) ** 2) / 6
+    )
+    yearly = 0.2 * np.cos(2 * np.pi * t / 8760)
+    price = 1.0 + daily + yearly + 0.1 * rng.standard_normal(hours)
+    return {
+        "bus_ID": f"Bus{b + 1}",
+        "import_tariff_DKK/kWh": 0.5,
+        "export_tariff_DKK/kWh": 0.4,
+        "max_import_kW": 4.0 * consumers_on_bus,
+        "max_export_kW": 2.0 * consumers_on_bus,
+        "energy_price_DKK_per_kWh": _round(np.maximum(price, 0.05)),
+    }
+
+
+def _pv_profile(seed: int, c: int, hours: int) -> list:
+    # Daylight shape that scales with the season and a random cloudiness per day
+    rng = _rng(seed, _PV, c)
+    t = np.arange(hours)
+    daylight = np.clip(np.sin(np.pi * ((t % 24) - 5) / 14), 0, None)
+    season = 0.6 - 0.4 * np.cos(2 * np.pi * t / 8760)
+    clouds = rng.uniform(0.3, 1.0, size=hours // 24 + 1)[t // 24]
+    return _round(np.clip(daylight * season * clouds, 0, 1))
+
+
+def _usage_preferences(seed: int, layout: dict, hours: int) -> dict:
+    rng = _rng(seed, _LOAD, layout["index"])
+    t = np.arange(hours)
+    days = max(1, hours // 24)
+    load_preferences = []
+    for load in layout["load"]:
+        shape = 0.1 + 0.5 * np.exp(-(((t % 24) - 7) ** 2) / 3)
+        shape += 0.8 * np.exp(-(((t % 24) - 19) ** 2) / 5)
+        profile = np.clip(shape + 0.1 * rng.standard_normal(hours), 0, 1)
+        load_preferences.append(
+            {
+                "load_id": load["load_id"],
+                "min_total_energy_per_day_hour_equivalent": (
+                    layout["min_energy_per_day"] * days
+                    if layout["owns"]["min_combined_load"]
+                    else None
+                ),
+                "max_total_energy_per_day_hour_equivalent": None,
+                "hourly_profile_ratio": (
+                    _round(profile) if layout["owns"]["desired_load"] else None
+                ),
+            }
+        )
+    return {
+        "consumer_ID": layout["id"],
+        "grid_preferences": None,
+        "DER_preferences": None,
+        "load_preferences": load_preferences,
+        "storage_preferences": [
+            {
+                "storage_id": storage["storage_id"],
+                "initial_soc_ratio": soc_ratio,
+                "final_soc_ratio": soc_ratio,
+            }
+            for storage, soc_ratio in zip(layout["storage"], layout["soc_ratio"])
+        ]
+        or None,
+    }
+
+
+def _round(values: np.ndarray) -> list:
+    return np.round(values, 4).tolist()
+
+
+def _write_list(
+    path: str, records, column: np.memmap = None, field: str = None
+) -> None:
+    if column is not None:
+        records = _fill_column(records, column, field)
+    with open(path, "w") as f:
+        _write_records(f, records)
+        f.write("\n")
+
+
+def _fill_column(records, column: np.memmap, field: str):
+    # Move the profile of each record (or load preference) to the next row
+    column_file = os.path.basename(column.filename)
+    row = 0
+    for record in records:
+        for entry in record.get("load_preferences", [record]):
+            if entry[field] is None:
+                column[row] = np.nan
+            else:
+                column[row] = entry[field]
+                entry[field] = {COLUMN_REFERENCE: column_file, "row": row}
+            row += 1
+        yield record
+
+
+def _write_records(f, records) -> int:
+    # JSON list written one record at a time, returns the number of records
+    f.write("[")
+    n = 0
+    for n, record in enumerate(records, start=1):
+        f.write(("\n" if n == 1 else ",\n") + json.dumps(record))
+    f.write("\n]")
+    return n
+
+
+# Testing
+if __name__ == "__main__":
+    import tempfile
+    import filecmp
+    from Assignment_1_Classes.Parameters import Parameters
+
+    with tempfile.TemporaryDirectory() as folder:
+        mix = {"storage": 0.5, "desired_load": 0.7, "min_combined_load": 0.3}
+        for name, columns in [("a", False), ("b", False), ("columns", True)]:
+            write_synthetic_dataset(
+                os.path.join(folder, name), 48, 50, buses=2, mix=mix, columns=columns
+            )
+
+        # The same seed gives the same files
+        for file_name in PROFILE_COLUMNS:
+            assert filecmp.cmp(
+                os.path.join(folder, "a", file_name),
+                os.path.join(folder, "b", file_name),
+                shallow=False,
+            )
+
+        parameters = Parameters(os.path.join(folder, "a"))
+        assert parameters.T == 48 and parameters.N == 50
+        assert len(parameters.buses["id"]) == 2
+        print("Storages:", len(parameters.storages["id"]), "of", parameters.N)
+        print("Desired loads:", parameters.loads["desired_load_exists"].sum())
+
+        # The binary columns hold the same profiles as the JSON lists
+        columnar = Parameters(os.path.join(folder, "columns"))
+        for table in ["buses", "ders", "loads", "storages"]:
+            for key, value in getattr(parameters, table).items():
+                assert np.array_equal(getattr(columnar, table)[key], value), key
+        print("Synthetic dataset loads the same from JSON and binary columns")
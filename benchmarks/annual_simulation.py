@@ -0,0 +1,47 @@
+"""Benchmark of the coupled and day by day modes of Annual_model over a year.
+
+Run from the repository root:
+    python benchmarks/annual_simulation.py
+"""
+
+import gurobipy as gp
+from Assignment_1_Classes.Annual_model import Annual_model
+
+QUESTIONS = ["1a", "2b"]
+DAYS = 365
+BACKEND = "highs"  # The coupled year exceeds size-limited Gurobi licenses
+
+
+if __name__ == "__main__":
+    env = gp.Env(params={"OutputFlag": 0})
+    print(
+        f"{'question':>8} {'mode':>12} {'wall [s]':>9} {'solver [s]':>10} "
+        f"{'memory [MB]':>11} {'objective':>12}"
+    )
+    for question in QUESTIONS:
+        annual = Annual_model(f"question_{question}", days=DAYS, env=env)
+        annual.parameters.diff_penalty = 1.0
+        runs = {
+            "coupled": annual.run_coupled(backend=BACKEND),
+            "chained": annual.run_days(chained=True),
+            "independent": annual.run_days(),
+        }
+        for mode, results in runs.items():
+            solver_time = (
+                results["solve_time"] if mode == "coupled" else results["runtime"].sum()
+            )
+            print(
+                f"{question:>8} {mode:>12} {results['wall_time']:9.3f} "
+                f"{solver_time:10.3f} {results['peak_rss_mb']:11.1f} "
+                f"{results['objective_value']:12.3f}"
+            )
+        if annual.parameters.storage_exists:
+            battery_cost = 5.0 * DAYS
+            coupled = annual.run_coupled(battery_cost, backend=BACKEND)
+            best = annual.optimize_battery_size(battery_cost)
+            print(
+                f"{question:>8} battery size: coupled {coupled['battery_size']:.3f} "
+                f"kWh in {coupled['wall_time']:.2f} s, independent days "
+                f"{best['battery_size']:.3f} kWh in {best['wall_time']:.2f} s "
+                f"({best['passes']} passes)"
+            )
@@ -0,0 +1,87 @@
+"""Event loop stalls of blocking solves against the Async_model facade.
+
+A ticker coroutine measures how late the event loop wakes it while a batch
+of requests for question 1c over several days, with randomly scaled prices,
+is built and solved. The requests are solved directly in coroutines, which
+blocks the loop for every build and solve, and through Async_model. The
+horizons are short enough for a size-limited Gurobi license. Run from the
+repository root:
+    python benchmarks/async_solve.py
+"""
+
+import time
+import asyncio
+import numpy as np
+import gurobipy as gp
+from Assignment_1_Classes.Parameters import Parameters
+from Assignment_1_Classes.Annual_model import repeat_days
+from Assignment_1_Classes.Async_model import Async_model
+from Assignment_1_Classes.Optimization_model import Optimization_model
+
+DAYS = 7
+REQUESTS = 20
+TICK = 0.001  # Seconds between ticks of the ticker
+
+
+def requests() -> list:
+    dataset = Parameters("question_1c")
+    dataset.diff_penalty = 1.75
+    parameters = repeat_days(dataset, DAYS)
+    rng = np.random.default_rng(0)
+    return [
+        parameters.copy(import_price=rng.uniform(0.5, 2) * parameters.import_price)
+        for _ in range(REQUESTS)
+    ]
+
+
+async def measure(solve_all) -> tuple:
+    # Wall time of solve_all() and the largest delay of a tick
+    delays = []
+
+    async def ticker():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            delays.append(time.perf_counter() - start - TICK)
+
+    clock = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await solve_all()
+    seconds = time.perf_counter() - start
+    clock.cancel()
+    return seconds, max(delays, default=seconds)
+
+
+if __name__ == "__main__":
+    scenarios = requests()
+    env = gp.Env(params={"OutputFlag": 0})
+
+    async def blocking():
+        async def solve(parameters):
+            model = Optimization_model(env=env)
+            model.parameters = parameters.copy()
+            model.create_model(vectorized=True)
+            return model.solve()
+
+        await asyncio.gather(*(solve(parameters) for parameters in scenarios))
+
+    async def facade(solver):
+        await asyncio.gather(
+            *(solver.solve(parameters, vectorized=True) for parameters in scenarios)
+        )
+
+    async def main():
+        print(f"{REQUESTS} requests of {24 * DAYS} hours")
+        print(f"{'solves':>22} {'wall [ms]':>10} {'max stall [ms]':>15}")
+        seconds, stall = await measure(blocking)
+        print(f"{'blocking':>22} {1e3 * seconds:10.1f} {1e3 * stall:15.1f}")
+        for max_concurrent in [1, 2]:
+            async with Async_model(max_concurrent) as solver:
+                seconds, stall = await measure(lambda: facade(solver))
+            print(
+                f"{f'Async_model ({max_concurrent} slots)':>22} "
+                f"{1e3 * seconds:10.1f} {1e3 * stall:15.1f}"
+            )
+
+    asyncio.run(main())
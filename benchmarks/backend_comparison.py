@@ -0,0 +1,44 @@
+"""Benchmark of the Gurobi and HiGHS backends of Backend_model.
+
+The bundled questions are solved as they are and with their daily profiles
+repeated over longer horizons. Run from the repository root:
+    python benchmarks/backend_comparison.py
+"""
+
+from Assignment_1_Classes.Parameters import Parameters
+from Assignment_1_Classes.Annual_model import repeat_days
+from Assignment_1_Classes.Backend_model import Backend_model, BACKENDS
+
+QUESTIONS = ["1a", "1b", "1c", "2b"]
+DAYS = [1, 7, 30, 365]
+
+
+if __name__ == "__main__":
+    print(
+        f"{'question':>8} {'hours':>6} {'backend':>8} {'build [s]':>10} "
+        f"{'solve [s]':>10} {'objective':>12}"
+    )
+    for question in QUESTIONS:
+        parameters = Parameters(f"question_{question}")
+        parameters.diff_penalty = 1.0
+        for days in DAYS:
+            long_parameters = repeat_days(parameters, days)
+            for backend in BACKENDS:
+                model = Backend_model(backend)
+                model.load_parameters(long_parameters)
+                build_time = f"{'-':>10}"  # Unless the model is built
+                try:
+                    model.create_model()
+                    build_time = f"{model.build_time:10.3f}"
+                    model.optimize()
+                    objective = (
+                        f"{model.get_results(duals=False)['objective_value']:12.4f}"
+                    )
+                    solve_time = f"{model.solve_time:10.3f}"
+                except Exception as error:  # E.g. gurobipy's size-limited license
+                    objective, solve_time = f"{'-':>12}", f"{'-':>10}"
+                    objective += f"  ({type(error).__name__})"
+                print(
+                    f"{question:>8} {long_parameters.T:>6} {backend:>8} "
+                    f"{build_time} {solve_time} {objective}"
+                )
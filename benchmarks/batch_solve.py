@@ -0,0 +1,94 @@
+"""Batched block-diagonal solves against one solve per scenario.
+
+Random import and export price factors of question 1c are solved with a
+fresh Optimization_model per scenario, with Optimization_model.sweep() on
+one warm-started model, and with Batch_model for a range of batch sizes.
+The Gurobi batches are limited to what fits a size-limited license. Run
+from the repository root:
+    python benchmarks/batch_solve.py
+"""
+
+import time
+import numpy as np
+import gurobipy as gp
+from Assignment_1_Classes.Batch_model import Batch_model
+from Assignment_1_Classes.Optimization_model import Optimization_model
+
+SCENARIOS = 200
+REPEATS = 3  # Runs per method, the fastest is reported
+BATCH_SIZES = {"highs": [1, 5, 10, 25, 50, 100, 200], "gurobi": [1, 2, 4, 8]}
+
+
+def price_scenarios(parameters, n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "import_price": factor * parameters.import_price,
+            "export_price": factor * parameters.export_price,
+            "diff_penalty": 1.75,
+        }
+        for factor in rng.uniform(0.25, 2, n)
+    ]
+
+
+def per_model(scenarios: list, env: gp.Env) -> np.ndarray:
+    objective_values = []
+    for scenario in scenarios:
+        model = Optimization_model(env=env)
+        model.load_data("question_1c")
+        for name, value in scenario.items():
+            setattr(model.parameters, name, value)
+        objective_values.append(model.solve()["objective_value"])
+    return np.array(objective_values)
+
+
+def sweep(scenarios: list, env: gp.Env) -> np.ndarray:
+    model = Optimization_model(env=env)
+    model.load_data("question_1c")
+    model.create_model()
+    model.model.Params.OutputFlag = 0
+    return model.sweep(scenarios, columns=("objective_value", "duals"))[
+        "objective_value"
+    ]
+
+
+def batched(scenarios: list, backend: str, batch_size: int, env: gp.Env):
+    model = Batch_model("question_1c", batch_size, backend, env)
+    return np.array(
+        [record["results"]["objective_value"] for record in model.run(scenarios)]
+    )
+
+
+if __name__ == "__main__":
+    env = gp.Env(params={"OutputFlag": 0})
+    reference = Optimization_model(env=env)
+    reference.load_data("question_1c")
+    scenarios = price_scenarios(reference.parameters, SCENARIOS)
+
+    cases = [("per model", lambda: per_model(scenarios, env))]
+    cases.append(("sweep", lambda: sweep(scenarios, env)))
+    for backend, sizes in BATCH_SIZES.items():
+        for size in sizes:
+            cases.append(
+                (
+                    f"{backend} batch {size}",
+                    lambda backend=backend, size=size: batched(
+                        scenarios, backend, size, env
+                    ),
+                )
+            )
+
+    print(f"{SCENARIOS} scenarios of question_1c")
+    print(f"{'method':>16} {'total [s]':>10} {'per scenario [ms]':>18}")
+    expected = None
+    for label, run in cases:
+        run()  # Imports and caches outside of the timing
+        seconds = np.inf
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            objective_values = run()
+            seconds = min(seconds, time.perf_counter() - start)
+        if expected is None:
+            expected = objective_values
+        assert np.allclose(objective_values, expected), label
+        print(f"{label:>16} {seconds:10.3f} {1e3 * seconds / SCENARIOS:18.2f}")
@@ -0,0 +1,59 @@
+"""Cold-start time of a solve-only worker process.
+
+Each run starts a fresh Python process that imports Optimization_model,
+solves question 1c once and exits. The process wall time, the import time
+and whether matplotlib was imported are reported. Run from the repository
+root:
+    python benchmarks/cold_start.py
+"""
+
+import os
+import sys
+import time
+import subprocess
+import numpy as np
+
+RUNS = 10
+
+WORKER = """
+import sys, time
+start = time.perf_counter()
+from Assignment_1_Classes.Optimization_model import Optimization_model
+imported = time.perf_counter()
+model = Optimization_model()
+model.load_data("question_1c")
+model.parameters.diff_penalty = 1.75
+model.create_model()
+model.model.Params.OutputFlag = 0
+model.optimize()
+model.get_results()
+print(imported - start, time.perf_counter() - start, "matplotlib" in sys.modules)
+"""
+
+
+def run_worker() -> tuple:
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", WORKER],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, PYTHONPATH=os.getcwd()),
+    ).stdout.split()[-3:]
+    return (
+        time.perf_counter() - start,
+        float(output[0]),
+        float(output[1]),
+        output[2] == "True",
+    )
+
+
+if __name__ == "__main__":
+    run_worker()  # Warm the file system cache
+    runs = np.array([run_worker() for _ in range(RUNS)])
+    wall, imports, solve = (np.median(runs[:, i]) for i in range(3))
+    print(f"Median of {RUNS} fresh processes:")
+    print(f"  process wall time  {1e3 * wall:7.1f} ms")
+    print(f"  import time        {1e3 * imports:7.1f} ms")
+    print(f"  import to results  {1e3 * solve:7.1f} ms")
+    print(f"  matplotlib imported: {bool(runs[:, 3].any())}")
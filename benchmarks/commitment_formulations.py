@@ -0,0 +1,64 @@
+"""Benchmark of the tight and naive commitment formulations.
+
+Question 1c is given a minimum load, load ramp limits, minimum on and off
+times and a minimum PV production, and is solved over horizons of several
+days with randomly scaled daily prices. For both formulations the size of
+the MILP, its LP relaxation bound, the branch-and-bound nodes and the solve
+time are reported. The horizons are short enough for a size-limited Gurobi
+license. Run from the repository root:
+    python benchmarks/commitment_formulations.py
+"""
+
+import numpy as np
+import gurobipy as gp
+from Assignment_1_Classes.Parameters import Parameters
+from Assignment_1_Classes.Annual_model import repeat_days
+from Assignment_1_Classes.Optimization_model import Optimization_model
+
+DAYS = [1, 2, 3, 4]
+FORMULATIONS = ["tight", "naive"]
+
+
+def limited_parameters(days: int, seed: int = 0) -> Parameters:
+    """Question 1c with operating limits over several days."""
+    parameters = Parameters("question_1c")
+    parameters.diff_penalty = 1.75
+    parameters.load_min = 0.5 * parameters.load_max
+    parameters.load_ramp_up = 0.3 * parameters.load_max
+    parameters.load_ramp_down = 0.3 * parameters.load_max
+    parameters.min_on_time = 3
+    parameters.min_off_time = 3
+    parameters.pv_min_power = 0.2 * parameters.pv_capacity
+    scale = np.repeat(np.random.default_rng(seed).uniform(0.5, 1.5, days), 24)
+    return repeat_days(
+        parameters,
+        days,
+        import_price=scale * np.tile(parameters.import_price, days),
+        export_price=scale * np.tile(parameters.export_price, days),
+    )
+
+
+if __name__ == "__main__":
+    env = gp.Env(params={"OutputFlag": 0, "MIPGap": 1e-6})
+    print(
+        f"{'hours':>5} {'formulation':>11} {'variables':>9} {'constraints':>11} "
+        f"{'objective':>10} {'LP bound':>10} {'gap [%]':>8} {'nodes':>6} "
+        f"{'solve [s]':>9}"
+    )
+    for days in DAYS:
+        parameters = limited_parameters(days)
+        for formulation in FORMULATIONS:
+            model = Optimization_model(env=env)
+            model.parameters = parameters.copy(commitment_formulation=formulation)
+            model.create_model(vectorized=True)
+            relaxation = model.model.relax()
+            relaxation.optimize()
+            model.optimize()
+            objective = model.model.ObjVal
+            gap = 100 * (objective - relaxation.ObjVal) / abs(objective)
+            print(
+                f"{parameters.T:>5} {formulation:>11} {model.model.NumVars:>9} "
+                f"{model.model.NumConstrs:>11} {objective:10.4f} "
+                f"{relaxation.ObjVal:10.4f} {gap:8.2f} {int(model.model.NodeCount):>6} "
+                f"{model.model.Runtime:9.3f}"
+            )
@@ -0,0 +1,38 @@
+"""Benchmark of building and solving the community model for growing N.
+
+Run from the repository root:
+    python benchmarks/community_scaling.py
+"""
+
+import tempfile
+import time
+import gurobipy as gp
+from Assignment_1_Classes.Community_model import Community_model
+from Assignment_1_Classes.Synthetic_data import write_synthetic_dataset
+
+CONSUMER_COUNTS = [1, 10, 100, 1000, 10000]
+T = 24
+
+
+if __name__ == "__main__":
+    print(f"{'N':>6} {'load [s]':>10} {'build [s]':>10} {'solve [s]':>10} {'vars':>9}")
+    for n_consumers in CONSUMER_COUNTS:
+        with tempfile.TemporaryDirectory() as folder:
+            write_synthetic_dataset(folder, hours=T, consumers=n_consumers)
+            model = Community_model()
+            start = time.perf_counter()
+            model.load_data(folder)
+            model.parameters.diff_penalty = 1.0
+            loaded = time.perf_counter()
+            model.create_model()
+            built = time.perf_counter()
+            model.model.Params.OutputFlag = 0
+            try:
+                model.optimize()
+                solve_time = f"{time.perf_counter() - built:10.3f}"
+            except gp.GurobiError as error:  # E.g. a size-limited license
+                solve_time = f"{'-':>10}  ({error})"
+            print(
+                f"{n_consumers:>6} {loaded - start:10.3f} {built - loaded:10.3f} "
+                f"{solve_time} {model.model.NumVars:>9}"
+            )
@@ -0,0 +1,151 @@
+"""Benchmark of loading, building, solving and extracting results per phase.
+
+Synthetic datasets are generated for growing horizons (single consumer,
+Optimization_model) and growing fleets (Community_model). Every case runs in a
+fresh process, so its peak memory is not affected by earlier cases. The
+results are written as JSON, which can be compared with an earlier run.
+
+Run from the repository root:
+    python benchmarks/model_benchmark.py --output benchmark.json
+    python benchmarks/model_benchmark.py --compare old.json --output new.json
+"""
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import gurobipy as gp
+from Assignment_1_Classes.Optimization_model import Optimization_model
+from Assignment_1_Classes.Community_model import Community_model
+from Assignment_1_Classes.Synthetic_data import write_synthetic_dataset
+
+HOURS = [24, 96, 8760, 35040]
+CONSUMER_COUNTS = [1, 10, 100, 1000, 10000]
+QUICK_HOURS = [24, 96]
+QUICK_CONSUMER_COUNTS = [1, 10, 100]
+
+
+def run_case(case: dict) -> dict:
+    """Run one benchmark case and time each phase.
+
+    Args:
+        case (dict): "model" ("single" or "community"), "build" ("per_hour" or
+            "matrix", single consumer only), "hours" and "consumers".
+
+    Returns:
+        dict: The case with the seconds and peak resident memory (MB) after
+            each phase, the model size and the error of a failed phase.
+    """
+    phases = {}
+    result = dict(case, phases=phases, error=None)
+
+    def record(event):
+        # Stages reported by the model, see Instrumentation
+        if event["stage"] == "create_model" or event["error"] is not None:
+            return
+        phases[event["stage"]] = {
+            "seconds": event["seconds"],
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+        if event["stage"] == "optimize":
+            result["solver"] = {
+                key: event[key] for key in ["Runtime", "IterCount", "BarIterCount"]
+            }
+
+    with tempfile.TemporaryDirectory() as folder:
+        write_synthetic_dataset(
+            folder, hours=case["hours"], consumers=case["consumers"]
+        )
+        env = gp.Env(params={"OutputFlag": 0})
+        if case["model"] == "single":
+            model = Optimization_model(env=env, metrics=record)
+        else:
+            model = Community_model(env=env, metrics=record)
+
+        model.load_data(folder)
+        model.parameters.diff_penalty = 1.0
+        if case["model"] == "single":
+            model.create_model(vectorized=case["build"] == "matrix")
+        else:
+            model.create_model()
+        result["size"] = {
+            attribute: model.model.getAttr(attribute)
+            for attribute in ["NumVars", "NumConstrs", "NumNZs"]
+        }
+        try:
+            model.optimize()
+            model.get_results()
+        except (gp.GurobiError, ValueError) as error:  # E.g. a size-limited license
+            result["error"] = str(error)
+    return result
+
+
+def cases(quick: bool = False) -> list:
+    hours = QUICK_HOURS if quick else HOURS
+    consumer_counts = QUICK_CONSUMER_COUNTS if quick else CONSUMER_COUNTS
+    return [
+        {"model": "single", "build": build, "hours": T, "consumers": 1}
+        for T in hours
+        for build in ["per_hour", "matrix"]
+    ] + [
+        {"model": "community", "build": "matrix", "hours": 24, "consumers": n}
+        for n in consumer_counts
+    ]
+
+
+def case_key(case: dict) -> tuple:
+    return case["model"], case["build"], case["hours"], case["consumers"]
+
+
+def compare(old: dict, new: dict) -> None:
+    # Ratio new / old of the time of every phase that ran in both
+    old_cases = {case_key(case): case for case in old["cases"]}
+    print(f"Compared with {old['commit']}:")
+    for case in new["cases"]:
+        previous = old_cases.get(case_key(case))
+        if previous is None:
+            continue
+        ratios = [
+            f"{name} x{case['phases'][name]['seconds'] / seconds['seconds']:.2f}"
+            for name, seconds in previous["phases"].items()
+            if name in case["phases"] and seconds["seconds"] > 0
+        ]
+        print(f"  {case_key(case)}: {', '.join(ratios)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="JSON file of an earlier run")
+    parser.add_argument("--quick", action="store_true", help="small cases only")
+    args = parser.parse_args()
+
+    commit = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+    report = {
+        "commit": commit,
+        "python": platform.python_version(),
+        "gurobi": ".".join(map(str, gp.gurobi.version())),
+        "cases": [],
+    }
+    # One fresh process per case for an independent peak memory
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        for result in executor.map(run_case, cases(args.quick)):
+            report["cases"].append(result)
+            total = sum(phase["seconds"] for phase in result["phases"].values())
+            print(
+                f"{result['model']:>9} {result['build']:>8} T={result['hours']:<6} "
+                f"N={result['consumers']:<6} {total:8.3f} s "
+                f"{max(p['peak_rss_mb'] for p in result['phases'].values()):8.1f} MB"
+                + (f"  ({result['error']})" if result["error"] else "")
+            )
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
@@ -0,0 +1,66 @@
+"""Cold builds of Optimization_model against reading it from a Model_cache.
+
+Question 2b with the battery size as a variable is built over several days
+with the per-hour and the matrix build, and read from a Model_cache with new
+import prices, which are patched into the cached model. Reading a model over
+the limits of a size-limited Gurobi license works, only solving it does not.
+Run from the repository root:
+    python benchmarks/model_cache.py
+"""
+
+import time
+import tempfile
+import numpy as np
+import gurobipy as gp
+from Assignment_1_Classes.Parameters import Parameters
+from Assignment_1_Classes.Annual_model import repeat_days
+from Assignment_1_Classes.Model_cache import Model_cache
+from Assignment_1_Classes.Optimization_model import Optimization_model
+
+DAYS = [1, 7, 30, 365]
+REPEATS = 3  # Builds per case, the fastest is reported
+
+
+def build_time(parameters: Parameters, env: gp.Env, **options) -> tuple:
+    seconds = np.inf
+    for _ in range(REPEATS):
+        model = Optimization_model(env=env)
+        model.parameters = parameters.copy()
+        start = time.perf_counter()
+        model.create_model(**options)
+        seconds = min(seconds, time.perf_counter() - start)
+    return seconds, model
+
+
+if __name__ == "__main__":
+    env = gp.Env(params={"OutputFlag": 0})
+    dataset = Parameters("question_2b")
+    dataset.diff_penalty = 1.0
+    dataset.battery_size_variable = True
+    dataset.battery_cost = 5
+    print(
+        f"{'hours':>6} {'variables':>9} {'per hour [ms]':>13} {'matrix [ms]':>11} "
+        f"{'cache write [ms]':>16} {'cache hit [ms]':>14} {'file [MB]':>9}"
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        cache = Model_cache(folder)
+        for days in DAYS:
+            parameters = repeat_days(dataset, days)
+            per_hour, _ = build_time(parameters, env)
+            matrix, model = build_time(parameters, env, vectorized=True)
+
+            start = time.perf_counter()
+            cache.put(cache.key(model), model)
+            write = time.perf_counter() - start
+
+            # Hits with new prices, so that the prices are patched
+            new_prices = parameters.copy(import_price=1.1 * parameters.import_price)
+            hit, model = build_time(new_prices, env, model_cache=cache)
+            assert "Model loaded from cache" in model.status
+            size = cache.stats()["bytes"]
+            print(
+                f"{parameters.T:>6} {model.model.NumVars:>9} {1e3 * per_hour:13.1f} "
+                f"{1e3 * matrix:11.1f} {1e3 * write:16.1f} {1e3 * hit:14.1f} "
+                f"{size / 2**20:9.2f}"
+            )
+            cache.clear()
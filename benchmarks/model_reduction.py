@@ -0,0 +1,66 @@
+"""Size and time savings of the model reduction of Optimization_model.
+
+The bundled questions are built and solved as full and as reduced models,
+with the default infinite deviation penalty and their daily profiles
+repeated over several days. Longer horizons do not fit a size-limited
+Gurobi license. Run from the repository root:
+    python benchmarks/model_reduction.py
+"""
+
+import time
+import gurobipy as gp
+from Assignment_1_Classes.Parameters import Parameters
+from Assignment_1_Classes.Annual_model import repeat_days
+from Assignment_1_Classes.Optimization_model import Optimization_model
+
+QUESTIONS = ["1a", "1b", "1c", "2b"]
+DAYS = [1, 3, 7]
+REPEATS = 20  # Builds and solves per case, the median is reported
+
+
+def run_case(parameters: Parameters, reduce: bool, env: gp.Env) -> dict:
+    build_times, solve_times = [], []
+    for _ in range(REPEATS):
+        model = Optimization_model(env=env)
+        model.parameters = parameters
+        start = time.perf_counter()
+        model.create_model(vectorized=True, reduce=reduce)
+        build_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        model.optimize()
+        model.get_results()
+        solve_times.append(time.perf_counter() - start)
+    return {
+        "variables": model.model.NumVars,
+        "constraints": model.model.NumConstrs,
+        "nonzeros": model.model.NumNZs,
+        "build": sorted(build_times)[REPEATS // 2],
+        "solve": sorted(solve_times)[REPEATS // 2],
+        "objective_value": model.model.ObjVal,
+    }
+
+
+if __name__ == "__main__":
+    env = gp.Env(params={"OutputFlag": 0})
+    print(
+        f"{'question':>8} {'hours':>5} {'model':>7} {'variables':>9} "
+        f"{'constraints':>11} {'nonzeros':>8} {'build [ms]':>10} "
+        f"{'solve [ms]':>10} {'objective':>10}"
+    )
+    for question in QUESTIONS:
+        for days in DAYS:
+            parameters = repeat_days(Parameters(f"question_{question}"), days)
+            parameters.diff_penalty = gp.GRB.INFINITY
+            for reduce in [False, True]:
+                label = "reduced" if reduce else "full"
+                try:
+                    case = run_case(parameters, reduce, env)
+                except gp.GurobiError as error:  # Size-limited license
+                    print(f"{question:>8} {parameters.T:>5} {label:>7}  ({error})")
+                    continue
+                print(
+                    f"{question:>8} {parameters.T:>5} {label:>7} "
+                    f"{case['variables']:>9} {case['constraints']:>11} "
+                    f"{case['nonzeros']:>8} {1e3 * case['build']:10.2f} "
+                    f"{1e3 * case['solve']:10.2f} {case['objective_value']:10.4f}"
+                )
@@ -0,0 +1,61 @@
+"""Scaling of the two-stage battery sizing with the number of scenarios.
+
+The extensive form and the Benders decomposition of Stochastic_model are
+solved for a growing number of random scenarios of question 2b. Every case
+runs in a fresh process, so its peak memory is not affected by earlier cases.
+Run from the repository root:
+    python benchmarks/stochastic_scaling.py
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+import gurobipy as gp
+from Assignment_1_Classes.Stochastic_model import Stochastic_model, random_scenarios
+from Assignment_1_Classes.Annual_model import peak_memory_mb
+
+SCENARIO_COUNTS = [10, 30, 100, 300, 1000]
+METHODS = ["extensive", "benders"]
+
+
+def run_case(case: tuple) -> dict:
+    method, S = case
+    start = time.perf_counter()
+    model = Stochastic_model("highs", env=gp.Env(params={"OutputFlag": 0}))
+    model.load_data("question_2b")
+    model.parameters.battery_cost = 5
+    model.parameters.diff_penalty = 1.0
+    model.set_scenarios(random_scenarios(model.parameters, S))
+    if method == "extensive":
+        model.create_model()
+        model.optimize()
+        results = model.get_results()
+        results["iterations"] = 1
+        results["peak_rss_mb"] = peak_memory_mb()
+    else:
+        results = model.solve_decomposed()
+    return {
+        "method": method,
+        "scenarios": S,
+        "seconds": time.perf_counter() - start,
+        "iterations": results["iterations"],
+        "peak_rss_mb": results["peak_rss_mb"],
+        "objective_value": results["objective_value"],
+        "battery_size": results["battery_size"],
+    }
+
+
+if __name__ == "__main__":
+    print(
+        f"{'method':>9} {'S':>5} {'seconds':>8} {'iterations':>10} "
+        f"{'memory [MB]':>11} {'objective':>10} {'battery [kWh]':>13}"
+    )
+    cases = [(method, S) for S in SCENARIO_COUNTS for method in METHODS]
+    # One fresh process per case for an independent peak memory
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        for result in executor.map(run_case, cases):
+            print(
+                f"{result['method']:>9} {result['scenarios']:>5} "
+                f"{result['seconds']:8.3f} {result['iterations']:>10} "
+                f"{result['peak_rss_mb']:11.1f} {result['objective_value']:10.4f} "
+                f"{result['battery_size']:13.4f}"
+            )
@@ -1,18 +1,20 @@
 """Main function to run the analysis."""
 
 from Assignment_1_Classes.Optimization_model import Optimization_model
+from Assignment_1_Classes.Reporting import Report
 import numpy as np
-from gurobipy import GRB
-import matplotlib.pyplot as plt
 
 question = "2b"  # Change this to run different questions
+# Show the figures ("show"), write them to the figures folder ("files") or
+# skip them ("off"), the last two run without a display
+report = Report(mode="show", folder="figures")
 
 # Questions are run in general using the following structure:
 model = Optimization_model()
 model.load_data(f"question_{question}")
 model.create_model()
 model.optimize()
-model.plot_results()
+model.plot_results(report)
 results = model.get_results()
 
 # In the below different scenarios are plotted with mulitple runs of the model
@@ -25,91 +27,86 @@ if question == "1a":
     model.create_model()
     model.optimize()
     base_obj = model.get_results()["objective_value"]
-    model.plot_results()
+    model.plot_results(report)
 
     # Analyze dual variables for different price factors
     duals_dict = {}
     objective_values_factor = {}
     price_factors = np.arange(0.25, 2.25, 0.25)
-    for factor in price_factors:
-        model = Optimization_model()
-        model.load_data("question_1a")
-        model.parameters.export_price = factor * model.parameters.export_price
-        model.parameters.import_price = factor * model.parameters.import_price
-        model.create_model()
-        model.optimize()
-        results = model.get_results()
-        duals_dict[factor] = list(results["duals"].values())[:-1]
-        objective_values_factor[factor] = results["objective_value"]
-
-    plt.figure()
-    for i, (key, duals) in enumerate(duals_dict.items()):
-        plt.plot(duals, label=f"Price Factor: {key}")
-    plt.xlabel("Time (hours)")
-    plt.ylabel("Shadow Price (DKK/kWh)")
-    plt.title(
-        "Dual variables of the energy balance constraints for different price factors"
+    model = Optimization_model()
+    model.load_data("question_1a")
+    import_price = model.parameters.import_price
+    export_price = model.parameters.export_price
+    table = model.sweep(
+        [
+            {
+                "import_price": factor * import_price,
+                "export_price": factor * export_price,
+            }
+            for factor in price_factors
+        ],
+        columns=("objective_value", "duals"),
+    )
+    for i, factor in enumerate(price_factors):
+        duals_dict[factor] = table["duals"]["energy_balance"][i]
+        objective_values_factor[factor] = table["objective_value"][i]
+
+    report.hourly(
+        {f"Price Factor: {key}": duals for key, duals in duals_dict.items()},
+        "Shadow Price (DKK/kWh)",
+        "Dual variables of the energy balance constraints for different price factors",
+        "price_duals",
     )
-    plt.legend()
-    plt.grid()
-    plt.show()
 
     # Analyze dual variables for different scales of flat prices
     duals_dict = {}
     objective_values_flat_factors = {}
     price_factors = np.arange(0.25, 2.25, 0.25)
-    for factor in price_factors:
-        model = Optimization_model()
-        model.load_data("question_1a")
-        model.parameters.export_price = (
-            np.ones(model.parameters.T)
-            * np.mean(model.parameters.export_price)
-            * factor
-        )
-        model.parameters.import_price = (
-            np.ones(model.parameters.T)
-            * np.mean(model.parameters.import_price)
-            * factor
-        )
-        model.create_model()
-        model.optimize()
-        results = model.get_results()
-        duals_dict[factor] = list(results["duals"].values())[:-1]
-        objective_values_flat_factors[factor] = results["objective_value"]
-
-    plt.figure()
-    for i, (key, duals) in enumerate(duals_dict.items()):
-        plt.plot(duals, label=f"Price Factor: {key}")
-    plt.xlabel("Time (hours)")
-    plt.ylabel("Shadow Price (DKK/kWh)")
-    plt.title(
-        "Dual variables of the energy balance constraints for different flat price factors"
+    table = model.sweep(
+        [
+            {
+                "import_price": np.ones(model.parameters.T)
+                * np.mean(import_price)
+                * factor,
+                "export_price": np.ones(model.parameters.T)
+                * np.mean(export_price)
+                * factor,
+            }
+            for factor in price_factors
+        ],
+        columns=("objective_value", "duals"),
+    )
+    for i, factor in enumerate(price_factors):
+        duals_dict[factor] = table["duals"]["energy_balance"][i]
+        objective_values_flat_factors[factor] = table["objective_value"][i]
+
+    report.hourly(
+        {f"Price Factor: {key}": duals for key, duals in duals_dict.items()},
+        "Shadow Price (DKK/kWh)",
+        "Dual variables of the energy balance constraints for different flat price factors",
+        "flat_price_duals",
     )
-    plt.legend()
-    plt.grid()
-    plt.show()
 
     print("Base Objective Value:", base_obj)
     print("Objective Values (Price Factors):", objective_values_factor)
     print("Objective Values (Flat Price Factors):", objective_values_flat_factors)
 
-    plt.figure()
-    plt.plot(
-        list(objective_values_factor.keys()),
-        list(objective_values_factor.values()),
-        label="Scaled Prices",
-    )
-    plt.plot(
-        list(objective_values_flat_factors.keys()),
-        list(objective_values_flat_factors.values()),
-        label="Flat Prices",
+    report.curves(
+        {
+            "Scaled Prices": (
+                list(objective_values_factor.keys()),
+                list(objective_values_factor.values()),
+            ),
+            "Flat Prices": (
+                list(objective_values_flat_factors.keys()),
+                list(objective_values_flat_factors.values()),
+            ),
+        },
+        "Price Factor",
+        "Objective Value",
+        "Objective Values for Different Price Factors",
+        "price_factor_objective",
     )
-    plt.xlabel("Price Factor")
-    plt.ylabel("Objective Value")
-    plt.title("Objective Values for Different Price Factors")
-    plt.grid()
-    plt.legend()
-    plt.show()
 
 # %% Question 1b
 if question == "1b":
@@ -117,52 +114,47 @@ if question == "1b":
     model.load_data("question_1b")
     model.create_model()
     model.optimize()
-    model.plot_results()
-
-    diff_penalties = np.arange(0, 5, 0.01)
-    objective_values = {}
-    for penalty in diff_penalties:
-        model = Optimization_model()
-        model.load_data("question_1b")
-        model.parameters.diff_penalty = penalty
-        model.create_model()
-        model.optimize()
-        results = model.get_results()
-        objective_values[penalty] = results["objective_value"]
+    model.plot_results(report)
 
-    plt.figure()
-    plt.plot(
-        list(objective_values.keys()),
-        list(objective_values.values()),
-        label="Objective Value vs Diff Penalty",
+    # The objective is piecewise linear in the penalty, trace it exactly
+    model = Optimization_model()
+    model.load_data("question_1b")
+    curve = model.parametric("diff_penalty", 0, 5)
+    objective_values = dict(zip(curve["breakpoints"], curve["objective_value"]))
+
+    report.curves(
+        {
+            "Objective Value vs Diff Penalty": (
+                list(objective_values.keys()),
+                list(objective_values.values()),
+            )
+        },
+        "Deviation Penalty",
+        "Objective Value",
+        "Objective Value vs Differentiation Penalty",
+        "penalty_objective",
     )
-    plt.xlabel("Deviation Penalty")
-    plt.ylabel("Objective Value")
-    plt.title("Objective Value vs Differentiation Penalty")
-    plt.grid()
-    plt.legend()
-    plt.show()
 
     model = Optimization_model()
     model.load_data("question_1b")
     model.parameters.diff_penalty = 1.75
     model.create_model()
     model.optimize()
-    model.plot_results()
+    model.plot_results(report)
 
-    results = model.get_results()
     # Extract duals for pos_diff_load and neg_diff_load constraints
-    pos_diff_duals = [v for k, v in results["duals"].items() if "pos_diff_load" in k]
-    neg_diff_duals = [v for k, v in results["duals"].items() if "neg_diff_load" in k]
-    plt.figure()
-    plt.plot(pos_diff_duals, label="positive_diff_load duals")
-    plt.plot(neg_diff_duals, label="negative_diff_load duals")
-    plt.xlabel("Time (hours)")
-    plt.ylabel("Shadow Price (DKK/kWh)")
-    plt.title("Dual variables of the desired load constraints")
-    plt.grid()
-    plt.legend()
-    plt.show()
+    duals = model.get_duals(["pos_diff_load", "neg_diff_load"])
+    pos_diff_duals = duals["pos_diff_load"]
+    neg_diff_duals = duals["neg_diff_load"]
+    report.hourly(
+        {
+            "positive_diff_load duals": pos_diff_duals,
+            "negative_diff_load duals": neg_diff_duals,
+        },
+        "Shadow Price (DKK/kWh)",
+        "Dual variables of the desired load constraints",
+        "desired_load_duals",
+    )
 
 # %% Question 1c
 if question == "1c":
@@ -170,135 +162,125 @@ if question == "1c":
     model.load_data("question_1c")
     model.create_model()
     model.optimize()
-    model.plot_results()
+    model.plot_results(report)
 
     # Analyze dual variables for different price factors
     duals_dict = {}
     objective_values_factor = {}
     price_factors = np.arange(0.25, 2.25, 0.25)
-    for factor in price_factors:
-        model = Optimization_model()
-        model.load_data("question_1c")
-        model.parameters.export_price = factor * model.parameters.export_price
-        model.parameters.import_price = factor * model.parameters.import_price
-        model.create_model()
-        model.optimize()
-        results = model.get_results()
-        duals_dict[factor] = list(results["duals"].values())[:24]
-        objective_values_factor[factor] = results["objective_value"]
-
-    plt.figure()
-    for i, (key, duals) in enumerate(duals_dict.items()):
-        plt.plot(duals, label=f"Price Factor: {key}")
-    plt.xlabel("Time (hours)")
-    plt.ylabel("Shadow Price (DKK/kWh)")
-    plt.title(
-        "Dual variables of the energy balance constraints for different price factors"
+    model = Optimization_model()
+    model.load_data("question_1c")
+    import_price = model.parameters.import_price
+    export_price = model.parameters.export_price
+    table = model.sweep(
+        [
+            {
+                "import_price": factor * import_price,
+                "export_price": factor * export_price,
+            }
+            for factor in price_factors
+        ],
+        columns=("objective_value", "duals"),
+    )
+    for i, factor in enumerate(price_factors):
+        duals_dict[factor] = table["duals"]["energy_balance"][i]
+        objective_values_factor[factor] = table["objective_value"][i]
+
+    report.hourly(
+        {f"Price Factor: {key}": duals for key, duals in duals_dict.items()},
+        "Shadow Price (DKK/kWh)",
+        "Dual variables of the energy balance constraints for different price factors",
+        "price_duals",
     )
-    plt.legend()
-    plt.grid()
-    plt.show()
 
     # Analyze dual variables for different scales of flat prices
     duals_dict = {}
     objective_values_flat_factors = {}
     price_factors = np.arange(0.25, 2.25, 0.25)
-    for factor in price_factors:
-        model = Optimization_model()
-        model.load_data("question_1c")
-        model.parameters.export_price = (
-            np.ones(model.parameters.T)
-            * np.mean(model.parameters.export_price)
-            * factor
-        )
-        model.parameters.import_price = (
-            np.ones(model.parameters.T)
-            * np.mean(model.parameters.import_price)
-            * factor
-        )
-        model.create_model()
-        model.optimize()
-        results = model.get_results()
-        duals_dict[factor] = list(results["duals"].values())[:24]
-        objective_values_flat_factors[factor] = results["objective_value"]
-
-    plt.figure()
-    for i, (key, duals) in enumerate(duals_dict.items()):
-        plt.plot(duals, label=f"Price Factor: {key}")
-    plt.xlabel("Time (hours)")
-    plt.ylabel("Shadow Price (DKK/kWh)")
-    plt.title(
-        "Dual variables of the energy balance constraints for different flat price factors"
+    table = model.sweep(
+        [
+            {
+                "import_price": np.ones(model.parameters.T)
+                * np.mean(import_price)
+                * factor,
+                "export_price": np.ones(model.parameters.T)
+                * np.mean(export_price)
+                * factor,
+            }
+            for factor in price_factors
+        ],
+        columns=("objective_value", "duals"),
+    )
+    for i, factor in enumerate(price_factors):
+        duals_dict[factor] = table["duals"]["energy_balance"][i]
+        objective_values_flat_factors[factor] = table["objective_value"][i]
+
+    report.hourly(
+        {f"Price Factor: {key}": duals for key, duals in duals_dict.items()},
+        "Shadow Price (DKK/kWh)",
+        "Dual variables of the energy balance constraints for different flat price factors",
+        "flat_price_duals",
     )
-    plt.legend()
-    plt.grid()
-    plt.show()
 
     print("Objective Values (Price Factors):", objective_values_factor)
     print("Objective Values (Flat Price Factors):", objective_values_flat_factors)
 
-    plt.figure()
-    plt.plot(
-        list(objective_values_factor.keys()),
-        list(objective_values_factor.values()),
-        label="Scaled Prices",
+    report.curves(
+        {
+            "Scaled Prices": (
+                list(objective_values_factor.keys()),
+                list(objective_values_factor.values()),
+            ),
+            "Flat Prices": (
+                list(objective_values_flat_factors.keys()),
+                list(objective_values_flat_factors.values()),
+            ),
+        },
+        "Price Factor",
+        "Objective Value",
+        "Objective Values for Different Price Factors",
+        "price_factor_objective",
     )
-    plt.plot(
-        list(objective_values_flat_factors.keys()),
-        list(objective_values_flat_factors.values()),
-        label="Flat Prices",
-    )
-    plt.xlabel("Price Factor")
-    plt.ylabel("Objective Value")
-    plt.title("Objective Values for Different Price Factors")
-    plt.grid()
-    plt.legend()
-    plt.show()
-
-    diff_penalties = np.arange(0, 5, 0.01)
-    objective_values = {}
-    for penalty in diff_penalties:
-        model = Optimization_model()
-        model.load_data("question_1c")
-        model.parameters.diff_penalty = penalty
-        model.create_model()
-        model.optimize()
-        results = model.get_results()
-        objective_values[penalty] = results["objective_value"]
 
-    plt.figure()
-    plt.plot(
-        list(objective_values.keys()),
-        list(objective_values.values()),
-        label="Objective Value vs Diff Penalty",
+    # The objective is piecewise linear in the penalty, trace it exactly
+    model = Optimization_model()
+    model.load_data("question_1c")
+    curve = model.parametric("diff_penalty", 0, 5)
+    objective_values = dict(zip(curve["breakpoints"], curve["objective_value"]))
+
+    report.curves(
+        {
+            "Objective Value vs Diff Penalty": (
+                list(objective_values.keys()),
+                list(objective_values.values()),
+            )
+        },
+        "Deviation Penalty",
+        "Objective Value",
+        "Objective Value vs Differentiation Penalty",
+        "penalty_objective",
     )
-    plt.xlabel("Deviation Penalty")
-    plt.ylabel("Objective Value")
-    plt.title("Objective Value vs Differentiation Penalty")
-    plt.grid()
-    plt.legend()
-    plt.show()
 
     model = Optimization_model()
     model.load_data("question_1c")
     model.parameters.diff_penalty = 1.75
     model.create_model()
     model.optimize()
-    model.plot_results()
+    model.plot_results(report)
 
-    results = model.get_results()
     # Extract duals for pos_diff_load and neg_diff_load constraints
-    pos_diff_duals = [v for k, v in results["duals"].items() if "pos_diff_load" in k]
-    neg_diff_duals = [v for k, v in results["duals"].items() if "neg_diff_load" in k]
-    plt.figure()
-    plt.plot(pos_diff_duals, label="positive_diff_load duals")
-    plt.plot(neg_diff_duals, label="negative_diff_load duals")
-    plt.xlabel("Time (hours)")
-    plt.ylabel("Shadow Price (DKK/kWh)")
-    plt.title("Dual variables of the desired load constraints")
-    plt.grid()
-    plt.legend()
-    plt.show()
+    duals = model.get_duals(["pos_diff_load", "neg_diff_load"])
+    pos_diff_duals = duals["pos_diff_load"]
+    neg_diff_duals = duals["neg_diff_load"]
+    report.hourly(
+        {
+            "positive_diff_load duals": pos_diff_duals,
+            "negative_diff_load duals": neg_diff_duals,
+        },
+        "Shadow Price (DKK/kWh)",
+        "Dual variables of the desired load constraints",
+        "desired_load_duals",
+    )
 
 # %% Question 2b
 if question == "2b":
@@ -309,90 +291,35 @@ if question == "2b":
     model.parameters.battery_cost = 5  # DKK/kWh
     model.create_model()
     model.optimize()
-    model.plot_results()
+    model.plot_results(report)
 
     # Battery Size and Objective Value vs Battery Price
-    battery_prices = np.arange(3, 10, 0.01)
-    battery_size = {}
-    objective_value = {}
-    for battery_cost in battery_prices:
-        model = Optimization_model()
-        model.load_data("question_2b")
-        model.set_battery_size_as_variable()
-        model.parameters.battery_cost = battery_cost
-        model.create_model()
-        model.optimize()
-        results = model.get_results()
-        battery_size[battery_cost] = results["battery_size"]
-        objective_value[battery_cost] = results["objective_value"]
-
-    fig, ax1 = plt.subplots()
-
-    color = "tab:blue"
-    ax1.set_xlabel("Battery Price")
-    ax1.set_ylabel("Battery Size", color=color)
-    ax1.plot(
-        battery_size.keys(), battery_size.values(), color=color, label="Battery Size"
+    # Exact piecewise linear curves, the battery size is constant per piece
+    model = Optimization_model()
+    model.load_data("question_2b")
+    model.set_battery_size_as_variable()
+    curve = model.parametric(
+        "battery_cost", 3, 10, columns=("objective_value", "battery_size")
     )
-    ax1.tick_params(axis="y", labelcolor=color)
-
-    ax2 = ax1.twinx()
-    color = "tab:red"
-    ax2.set_ylabel("Objective Value", color=color)
-    ax2.plot(
-        objective_value.keys(),
-        objective_value.values(),
-        color=color,
-        label="Objective Value",
+    report.battery_curve(
+        curve, "Battery Size and Objective Value vs Battery Price", "battery_price"
     )
-    ax2.tick_params(axis="y", labelcolor=color)
-
-    fig.tight_layout()
-    plt.title("Battery Size and Objective Value vs Battery Price")
-    plt.show()
 
     # Battery Size and Objective Value vs Battery Price with flat prices
-    battery_prices = np.arange(3, 10, 0.01)
-    battery_size = {}
-    objective_value = {}
-    for battery_cost in battery_prices:
-        model = Optimization_model()
-        model.load_data("question_2b")
-        model.set_battery_size_as_variable()
-        model.parameters.export_price = np.ones(model.parameters.T) * np.mean(
-            model.parameters.export_price
-        )
-        model.parameters.import_price = np.ones(model.parameters.T) * np.mean(
-            model.parameters.import_price
-        )
-        model.parameters.battery_cost = battery_cost
-        model.create_model()
-        model.optimize()
-        results = model.get_results()
-        battery_size[battery_cost] = results["battery_size"]
-        objective_value[battery_cost] = results["objective_value"]
-
-    fig, ax1 = plt.subplots()
-
-    color = "tab:blue"
-    ax1.set_xlabel("Battery Price")
-    ax1.set_ylabel("Battery Size", color=color)
-    ax1.plot(
-        battery_size.keys(), battery_size.values(), color=color, label="Battery Size"
+    model = Optimization_model()
+    model.load_data("question_2b")
+    model.set_battery_size_as_variable()
+    model.parameters.export_price = np.ones(model.parameters.T) * np.mean(
+        model.parameters.export_price
     )
-    ax1.tick_params(axis="y", labelcolor=color)
-
-    ax2 = ax1.twinx()
-    color = "tab:red"
-    ax2.set_ylabel("Objective Value", color=color)
-    ax2.plot(
-        objective_value.keys(),
-        objective_value.values(),
-        color=color,
-        label="Objective Value",
+    model.parameters.import_price = np.ones(model.parameters.T) * np.mean(
+        model.parameters.import_price
+    )
+    curve = model.parametric(
+        "battery_cost", 3, 10, columns=("objective_value", "battery_size")
+    )
+    report.battery_curve(
+        curve,
+        "Battery Size and Objective Value vs Battery Price",
+        "flat_price_battery_price",
     )
-    ax2.tick_params(axis="y", labelcolor=color)
-
-    fig.tight_layout()
-    plt.title("Battery Size and Objective Value vs Battery Price")
-    plt.show()